@@ -0,0 +1,261 @@
+import os
+import time
+import sqlite3
+import argparse
+import numpy as np
+import pandas as pd
+from storage import file_digest, find_table, read_table
+from profiling import profiled
+
+# Materialized aggregates of the combined table over year x genre x IMDb rating bucket x
+# platform. Each cell holds the row count and, per measure, the count of present values,
+# their sum, sum of squares, min and max, so means, standard deviations and extremes of any
+# slice or roll-up come from the cells instead of a scan of the table. Cells keep a movie's
+# genre combination ('Crime, Drama'); queries by genre explode the cells, so a movie counts
+# once in each of its genres and once in roll-ups over genre. A genre filter without
+# grouping by genre keeps a movie once if it has any of the listed genres.
+#
+# The cube lives in a SQLite file with a hash of every source row. When the combined table
+# changes, only added rows are aggregated and folded in; cells that lost rows are
+# recomputed from their current rows, since min and max cannot be subtracted.
+DIMENSIONS = ['year', 'genres', 'rating_bucket', 'platform']
+MEASURES = ['IMDB_Rating', 'Meta_score', 'tomatometer_rating', 'audience_rating', 'Gross_imdb']
+# IMDb rating bands of the combined table (ratings are out of 100 there)
+RATING_BINS = [75, 80, 85, 90, 100]
+RATING_LABELS = ['76 to 80', '81 to 85', '86 to 90', 'Above 90']
+GENRE_SEPARATOR = ', '
+PLATFORM_SEPARATOR = ' & '
+
+
+def default_cube_path(data_dir):
+    """Location of the cube next to the combined data."""
+    return os.path.join(data_dir, 'aggregate_cube.sqlite')
+
+
+def _typed(dims):
+    """Dimension columns in fixed types, so cell keys hash the same after a round trip."""
+    dims = dims.copy()
+    dims['year'] = pd.to_numeric(dims['year'], errors='coerce').astype('Int16')
+    for column in DIMENSIONS[1:]:
+        dims[column] = dims[column].astype('str')
+    return dims
+
+
+def _keys(dims):
+    return pd.util.hash_pandas_object(dims[DIMENSIONS], index=False).to_numpy()
+
+
+def cube_rows(data):
+    """Dimensions, measures and a content hash of every row of the combined table."""
+    platforms = data[['platform_imdb', 'platform_rt']].astype('str')
+    platform = platforms['platform_imdb'].str.cat(platforms['platform_rt'], sep=PLATFORM_SEPARATOR, na_rep='')
+    rows = _typed(pd.DataFrame({
+        'year': data['Released_Year'],
+        'genres': data['Genre'],
+        'rating_bucket': pd.cut(data['IMDB_Rating'], bins=RATING_BINS, labels=RATING_LABELS).astype('str'),
+        'platform': platform.str.strip(PLATFORM_SEPARATOR).replace('', np.nan),
+    }))
+    for measure in MEASURES:
+        rows[measure] = pd.to_numeric(data[measure], errors='coerce').astype('float64')
+    rows['hash'] = pd.util.hash_pandas_object(data, index=False).to_numpy().view(np.int64)
+    return rows
+
+
+def aggregate(rows):
+    """Cells of a set of rows: one row per dimension combination, indexed by DIMENSIONS."""
+    squares = rows[MEASURES] ** 2
+    grouped = rows.assign(**{f'{measure}_sq': squares[measure] for measure in MEASURES}) \
+        .groupby(DIMENSIONS, dropna=False, sort=False)
+    parts = {'rows': grouped.size()}
+    for measure in MEASURES:
+        parts[f'{measure}_count'] = grouped[measure].count()
+        parts[f'{measure}_sum'] = grouped[measure].sum()
+        parts[f'{measure}_sumsq'] = grouped[f'{measure}_sq'].sum()
+        parts[f'{measure}_min'] = grouped[measure].min()
+        parts[f'{measure}_max'] = grouped[measure].max()
+    return pd.DataFrame(parts)
+
+
+def combine(cells, by):
+    """Roll cells up to the `by` columns (none: one total row) by adding counts and sums."""
+    how = {column: ('min' if column.endswith('_min') else 'max' if column.endswith('_max') else 'sum')
+           for column in cells.columns if column not in DIMENSIONS + ['genre', 'decade']}
+    if not by:
+        return cells.agg(how).to_frame('total').T
+    return cells.groupby(by, dropna=False, sort=True).agg(how)
+
+
+def statistics(cells, measures):
+    """count, mean, std, min and max of each measure from rolled-up cells."""
+    result = {}
+    for measure in measures:
+        n, total = cells[f'{measure}_count'], cells[f'{measure}_sum']
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = total / n
+            variance = (cells[f'{measure}_sumsq'] - total * mean) / (n - 1)
+        result[(measure, 'count')] = n.astype('int64')
+        result[(measure, 'mean')] = mean.where(n > 0)
+        result[(measure, 'std')] = np.sqrt(variance.clip(lower=0)).where(n > 1)
+        result[(measure, 'min')] = cells[f'{measure}_min']
+        result[(measure, 'max')] = cells[f'{measure}_max']
+    return pd.DataFrame(result)
+
+
+class AggregateCube:
+    """Cells of the combined table plus the row hashes needed to refresh them incrementally."""
+
+    def __init__(self, cells=None, rows=None, source_digest=None):
+        self.cells = cells if cells is not None else aggregate(cube_rows(_empty_table()))
+        self.rows = rows if rows is not None else pd.DataFrame(columns=['hash'] + DIMENSIONS)
+        self.source_digest = source_digest
+
+    @classmethod
+    def build(cls, data, source_digest=None):
+        rows = cube_rows(data)
+        return cls(aggregate(rows), rows[['hash'] + DIMENSIONS], source_digest)
+
+    @profiled(rows=lambda change: sum(change))
+    def refresh(self, data, source_digest=None):
+        """Bring the cube up to date with the current table; returns (rows added, rows removed)."""
+        rows = cube_rows(data)
+        change = rows['hash'].value_counts().sub(self.rows['hash'].value_counts(), fill_value=0)
+        added, removed = change[change > 0], -change[change < 0]
+        self.source_digest = source_digest
+        if not len(added) and not len(removed):
+            return 0, 0
+        # Cells that lost rows are recomputed from all of their current rows
+        dirty = np.unique(_keys(self.rows[self.rows['hash'].isin(removed.index)]))
+        in_dirty = np.isin(_keys(rows), dirty)
+        # Identical rows share a hash: only the copies beyond the old count are new
+        is_added = rows.groupby('hash').cumcount() < rows['hash'].map(added).fillna(0)
+        kept = self.cells[~np.isin(_keys(self.cells.index.to_frame(index=False)), dirty)]
+        delta = aggregate(rows[in_dirty | is_added.to_numpy()])
+        self.cells = combine(pd.concat([kept, delta]), DIMENSIONS) if len(kept) else delta
+        self.rows = rows[['hash'] + DIMENSIONS]
+        return int(added.sum()), int(removed.sum())
+
+    def query(self, by=(), measures=MEASURES, where=None):
+        """Statistics of measures per combination of the `by` dimensions, from the cells.
+
+        by takes 'year', 'decade', 'genre', 'genres', 'rating_bucket' and 'platform'; where
+        maps a dimension to a value or a list of values. Missing dimension values are left out
+        of the groups.
+        """
+        by = list(by)
+        where = {dimension: list(value) if isinstance(value, (list, tuple, set, range)) else [value]
+                 for dimension, value in (where or {}).items()}
+        cells = self.cells.reset_index()
+        if 'genre' in by:
+            cells = cells.assign(genre=cells['genres'].str.split(GENRE_SEPARATOR)).explode('genre')
+        elif 'genre' in where:
+            # Not grouped by genre: keep each cell once if it has any of the genres
+            wanted = set(where.pop('genre'))
+            cells = cells[cells['genres'].str.split(GENRE_SEPARATOR)
+                          .map(lambda genres: isinstance(genres, list) and not wanted.isdisjoint(genres))]
+        if 'decade' in by or 'decade' in where:
+            cells = cells.assign(decade=cells['year'] // 10 * 10)
+        for dimension, values in where.items():
+            cells = cells[cells[dimension].isin(values)]
+        rolled = combine(cells.dropna(subset=by), by)
+        return statistics(rolled, list(measures))
+
+    def verify(self, data):
+        """True when the cells equal those of a full rebuild from data."""
+        def ordered(cells):
+            return cells.reset_index().sort_values(DIMENSIONS, na_position='first').reset_index(drop=True)
+        mine, rebuilt = ordered(self.cells), ordered(aggregate(cube_rows(data)))
+        if mine.shape != rebuilt.shape:
+            return False
+        try:
+            pd.testing.assert_frame_equal(mine, rebuilt[mine.columns], check_dtype=False, rtol=1e-9)
+        except AssertionError:
+            return False
+        return True
+
+    def save(self, path):
+        """Write the cube to a new file and move it into place, so readers never see half of it."""
+        partial = f'{path}.{os.getpid()}.tmp'
+        if os.path.exists(partial):
+            os.remove(partial)
+        connection = sqlite3.connect(partial)
+        with connection:
+            self.cells.reset_index().to_sql('cells', connection, index=False)
+            self.rows.to_sql('rows', connection, index=False)
+            pd.DataFrame({'source_digest': [self.source_digest]}).to_sql('meta', connection, index=False)
+        connection.close()
+        os.replace(partial, path)
+
+    @classmethod
+    def load(cls, path):
+        """The cube saved at path, or None if there is none."""
+        if not os.path.exists(path):
+            return None
+        connection = sqlite3.connect(path)
+        try:
+            cells = pd.read_sql_query('SELECT * FROM cells', connection)
+            rows = pd.read_sql_query('SELECT * FROM rows', connection)
+            digest = pd.read_sql_query('SELECT source_digest FROM meta', connection)['source_digest'][0]
+        except (sqlite3.Error, pd.errors.DatabaseError):
+            return None
+        finally:
+            connection.close()
+        cells = pd.concat([_typed(cells[DIMENSIONS]), cells.drop(columns=DIMENSIONS)], axis=1)
+        rows = pd.concat([rows[['hash']], _typed(rows[DIMENSIONS])], axis=1)
+        return cls(cells.set_index(DIMENSIONS), rows, digest)
+
+
+def _empty_table():
+    return pd.DataFrame({column: pd.Series(dtype='float64') for column in
+                         ['Released_Year', 'Genre', 'IMDB_Rating', 'platform_imdb', 'platform_rt'] + MEASURES[1:]})
+
+
+@profiled
+def load_cube(path, cube_path=None, rebuild=False):
+    """The cube of a combined table file, kept in cube_path: refreshed (and saved) if the table
+    changed since the last use. Without a cube_path it is built in memory and not saved."""
+    digest = file_digest(path)
+    cube = None if rebuild or cube_path is None else AggregateCube.load(cube_path)
+    if cube is not None and cube.source_digest == digest:
+        return cube
+    data = read_table(path)
+    if cube is None:
+        cube = AggregateCube.build(data, digest)
+    else:
+        cube.refresh(data, digest)
+    if cube_path is not None:
+        cube.save(cube_path)
+    return cube
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Aggregate cube of the combined data: slices and roll-ups.')
+    parser.add_argument('--by', default='decade,genre', help='comma-separated dimensions to group by '
+                        '(year, decade, genre, genres, rating_bucket, platform; empty for a total)')
+    parser.add_argument('--measure', action='append', choices=MEASURES, help='measures to report (default: all)')
+    parser.add_argument('--where', action='append', default=[], metavar='DIMENSION=VALUE',
+                        help='keep cells with this dimension value; repeat for more filters')
+    parser.add_argument('--rebuild', action='store_true', help='build the cube from scratch')
+    args = parser.parse_args()
+
+    where = {}
+    for condition in args.where:
+        dimension, _, value = condition.partition('=')
+        value = int(value) if dimension in ('year', 'decade') else value
+        where.setdefault(dimension, []).append(value)
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    data_dir = os.path.join(script_dir, '../data')
+
+    start = time.perf_counter()
+    cube = load_cube(find_table(data_dir, 'cleaned_combined_data'), default_cube_path(data_dir), args.rebuild)
+    loaded = time.perf_counter()
+    result = cube.query([column for column in args.by.split(',') if column], args.measure or MEASURES, where)
+    done = time.perf_counter()
+    pd.set_option('display.width', 200)
+    pd.set_option('display.max_rows', 200)
+    print(result.round(2))
+    print(f"\n{len(cube.cells)} cells; cube loaded in {(loaded - start) * 1000:.1f} ms, "
+          f"query answered in {(done - loaded) * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
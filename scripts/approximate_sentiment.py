@@ -0,0 +1,162 @@
+import os
+import time
+import argparse
+from statistics import NormalDist
+import numpy as np
+import pandas as pd
+from polarity_engine import SENTIMENT_LABELS, classify, get_engine
+from profiling import profiled
+from storage import find_table, read_table
+
+# Approximate sentiment mix and mean polarity of a movie's reviews from a stratified random
+# sample. Reviews are stratified by rating and review year, the sample grows geometrically,
+# and scoring stops as soon as every confidence interval is narrower than its target.
+DEFAULT_SHARE_WIDTH = 0.05
+DEFAULT_POLARITY_WIDTH = 0.02
+DEFAULT_CONFIDENCE = 0.95
+INITIAL_SAMPLE = 500
+GROWTH = 1.5
+STRATA_COLUMNS = ['Rating', 'Date']
+
+
+def review_strata(reviews, columns=STRATA_COLUMNS):
+    """Stratum number of every review: rounded rating x year of the review (missing values form their own)."""
+    keys = {}
+    if 'Rating' in columns:
+        keys['rating'] = pd.to_numeric(reviews['Rating'], errors='coerce').round()
+    if 'Date' in columns:
+        keys['year'] = pd.to_datetime(reviews['Date'], format='%d %B %Y', errors='coerce').dt.year
+    if not keys:
+        return np.zeros(len(reviews), dtype=np.int64)
+    return pd.DataFrame(keys).groupby(list(keys), dropna=False, sort=False).ngroup().to_numpy()
+
+
+def allocate(sample_size, stratum_sizes):
+    """Reviews to score per stratum: proportional to its size, at least two (for a variance) where possible.
+
+    Allocations only grow with sample_size, so each round's sample contains the previous one.
+    """
+    proportional = np.round(sample_size * stratum_sizes / stratum_sizes.sum()).astype(np.int64)
+    return np.minimum(stratum_sizes, np.maximum(proportional, np.minimum(2, stratum_sizes)))
+
+
+def stratified_mean(values, strata, sampled, stratum_sizes, proportion=False):
+    """Stratified estimate of a population mean and its variance (with finite population correction)."""
+    sums = np.bincount(strata, weights=values, minlength=len(stratum_sizes))
+    if proportion:
+        # Shrink toward 1/2 so a share not seen in a stratum yet still has some variance
+        shrunk = (sums + 0.5) / (sampled + 1)
+        variance = shrunk * (1 - shrunk)
+    else:
+        squares = np.bincount(strata, weights=values ** 2, minlength=len(stratum_sizes))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            variance = np.where(sampled > 1, (squares - sums ** 2 / sampled) / (sampled - 1), 0.0)
+    weights = stratum_sizes / stratum_sizes.sum()
+    means = sums / np.maximum(sampled, 1)
+    fpc = 1 - sampled / stratum_sizes
+    return float(weights @ means), float((weights ** 2 * fpc * variance / np.maximum(sampled, 1)).sum())
+
+
+@profiled(rows=lambda result: result['scored'])
+def approximate_sentiment(reviews, share_width=DEFAULT_SHARE_WIDTH, polarity_width=DEFAULT_POLARITY_WIDTH,
+                          confidence=DEFAULT_CONFIDENCE, seed=0, strata_columns=STRATA_COLUMNS, score=None):
+    """Estimate sentiment shares and mean polarity, scoring only as many reviews as the targets need.
+
+    share_width and polarity_width are the full widths the confidence intervals must reach.
+    Returns a dict with an 'estimates' table (estimate, low, high per quantity), the number and
+    fraction of reviews scored, the rounds taken and whether the targets were met.
+    """
+    score = score or get_engine().score
+    texts = reviews['Content'].astype(str).to_numpy(dtype=object)
+    strata = review_strata(reviews, strata_columns)
+    stratum_sizes = np.bincount(strata)
+    # Reviews grouped by stratum in random order: a stratum's sample is a prefix of its group
+    rng = np.random.default_rng(seed)
+    order = np.lexsort((rng.random(len(texts)), strata))
+    starts = np.cumsum(stratum_sizes) - stratum_sizes
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    if not len(texts):
+        # Nothing to sample: every estimate is unknown
+        estimates = pd.DataFrame(np.nan, index=list(SENTIMENT_LABELS[::-1]) + ['mean_polarity'],
+                                 columns=['estimate', 'low', 'high', 'width'])
+        return {'estimates': estimates, 'reviews': 0, 'scored': 0, 'fraction_scored': 0.0, 'rounds': 0,
+                'strata': 0, 'converged': False, 'mean_rating': float('nan')}
+
+    scored = np.zeros(len(stratum_sizes), dtype=np.int64)
+    polarity = np.zeros(len(texts))
+    rounds, sample_size = 0, INITIAL_SAMPLE
+    while True:
+        target = allocate(sample_size, stratum_sizes)
+        # Score the reviews each stratum gained this round
+        new = np.concatenate([order[start + done:start + goal] for start, done, goal in zip(starts, scored, target)])
+        if len(new):
+            polarity[new] = score(texts[new].tolist())
+        scored = target
+        rounds += 1
+
+        picked = np.concatenate([order[start:start + n] for start, n in zip(starts, scored)])
+        labels = classify(polarity[picked])
+        rows = {}
+        for label in SENTIMENT_LABELS[::-1]:
+            rows[label] = stratified_mean((labels == label).astype(float), strata[picked], scored, stratum_sizes,
+                                          proportion=True)
+        rows['mean_polarity'] = stratified_mean(polarity[picked], strata[picked], scored, stratum_sizes)
+        estimates = pd.DataFrame(rows, index=['estimate', 'variance']).T
+        half = z * np.sqrt(estimates['variance'])
+        # Shares lie in [0, 1] and polarity in [-1, 1]
+        floor = pd.Series([0.0] * len(SENTIMENT_LABELS) + [-1.0], index=estimates.index)
+        low = (estimates['estimate'] - half).clip(lower=floor)
+        high = (estimates['estimate'] + half).clip(upper=1.0)
+        estimates = pd.DataFrame({'estimate': estimates['estimate'], 'low': low, 'high': high, 'width': high - low})
+        widths = estimates['width'].to_numpy()
+        converged = bool((widths[:-1] <= share_width).all() and widths[-1] <= polarity_width)
+        if converged or (scored == stratum_sizes).all():
+            break
+        sample_size = int(sample_size * GROWTH)
+
+    return {
+        'estimates': estimates, 'reviews': len(texts), 'scored': int(scored.sum()),
+        'fraction_scored': scored.sum() / len(texts) if len(texts) else 0.0,
+        'rounds': rounds, 'strata': len(stratum_sizes), 'converged': converged,
+        # Ratings need no scoring, so their mean is exact
+        'mean_rating': float(pd.to_numeric(reviews['Rating'], errors='coerce').mean()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Approximate sentiment mix and mean polarity from a stratified sample.')
+    parser.add_argument('files', nargs='*', help='review files (default: the cleaned review files in data/)')
+    parser.add_argument('--share-width', type=float, default=DEFAULT_SHARE_WIDTH,
+                        help='target full width of the sentiment share intervals')
+    parser.add_argument('--polarity-width', type=float, default=DEFAULT_POLARITY_WIDTH,
+                        help='target full width of the mean polarity interval')
+    parser.add_argument('--confidence', type=float, default=DEFAULT_CONFIDENCE)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--exact', action='store_true', help='also score every review to check the estimates')
+    args = parser.parse_args()
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    data_dir = os.path.join(script_dir, '../data')
+    files = args.files or [find_table(data_dir, stem) for stem in
+                           ['cleaned_imdbreviews_thelionking1994', 'cleaned_imdbreviews_saw2004',
+                            'cleaned_imdbreviews_3idiots2009']]
+    pd.set_option('display.width', 160)
+    for path in files:
+        reviews = read_table(path, columns=['Rating', 'Date', 'Content'])
+        start = time.perf_counter()
+        result = approximate_sentiment(reviews, args.share_width, args.polarity_width, args.confidence, args.seed)
+        elapsed = time.perf_counter() - start
+        estimates = result['estimates']
+        if args.exact:
+            polarity = get_engine().score(reviews['Content'].astype(str).tolist())
+            labels = classify(polarity)
+            estimates['exact'] = [(labels == label).mean() for label in SENTIMENT_LABELS[::-1]] + [polarity.mean()]
+        print(f"\n{os.path.basename(path)}: scored {result['scored']} of {result['reviews']} reviews "
+              f"({result['fraction_scored']:.1%}) in {result['rounds']} rounds over {result['strata']} strata, "
+              f"{elapsed:.2f}s{'' if result['converged'] else ' (targets not reached: every review scored)'}")
+        print(estimates.round(4))
+        print(f"Average rating (exact): {result['mean_rating']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
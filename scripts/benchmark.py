@@ -0,0 +1,276 @@
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import resource
+import tempfile
+import contextlib
+import subprocess
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from storage import find_table, read_table, read_table_chunks
+from synthetic_data import SyntheticCorpus, generate_datasets
+
+# Benchmarks of every pipeline stage on synthetic data of growing size. Each measurement
+# runs in a fresh process, so peak memory belongs to that stage alone and no stage warms
+# caches for the next one. Results are written as JSON; `compare` checks two result files
+# for regressions and exits with status 1 when it finds any.
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+DEFAULT_THRESHOLD = 0.10
+# Differences smaller than this are timer noise, whatever their ratio
+MIN_DIFFERENCE_S = 0.05
+BOOTSTRAP_RESAMPLES = 200
+
+
+def _require(data_dir, stem, stage, workers):
+    """Path of a table a benchmark reads, producing it (untimed) with `stage` if it is missing."""
+    # find_table falls back to the CSV path when no file exists, so check the path it returns
+    path = find_table(data_dir, stem)
+    if not os.path.exists(path):
+        BENCHMARKS[stage](data_dir, workers)()
+        path = find_table(data_dir, stem)
+    return path
+
+
+# Each benchmark does its setup and returns the timed work, which returns the rows it processed.
+
+def bench_clean_imdb(data_dir, workers):
+    import data_cleaning
+    path = os.path.join(data_dir, 'imdb_top_1000.csv')
+    return lambda: len(data_cleaning.clean_dataset(path, output_dir=data_dir))
+
+
+def bench_clean_rt(data_dir, workers):
+    import data_cleaning
+    path = os.path.join(data_dir, 'rotten_tomatoes_movies_1.csv')
+    return lambda: len(data_cleaning.clean_dataset(path, output_dir=data_dir))
+
+
+def bench_clean_reviews(data_dir, workers):
+    from data_cleaning_reviews import clean_and_process_data
+    return lambda: sum(clean_and_process_data(data_dir=data_dir, workers=workers).values())
+
+
+def bench_join(data_dir, workers):
+    from data_prepration import DataPreparer
+    _require(data_dir, 'cleaned_imdb_top_1000', 'clean_imdb', workers)
+    _require(data_dir, 'cleaned_rotten_tomatoes_movies_1', 'clean_rt', workers)
+
+    def work():
+        # DataPreparer finds the data directory from its base (scripts) directory
+        preparer = DataPreparer(os.path.join(os.path.dirname(data_dir), 'scripts'))
+        preparer.load_data()
+        preparer.normalize_and_prepare_data()
+        preparer.clean_and_save_data()
+        return len(preparer.imdb_data) + len(preparer.rotten_tomatoes_data)
+    return work
+
+
+def bench_sentiment(data_dir, workers):
+    from polarity_engine import get_engine, score_in_parallel
+    path = _require(data_dir, 'cleaned_imdbreviews_synthetic', 'clean_reviews', workers)
+    # Load the lexicon before timing; pool workers load their own
+    get_engine()
+
+    def work():
+        rows = 0
+        for chunk in read_table_chunks(path, columns=['Content'], chunk_size=100000):
+            rows += len(score_in_parallel(chunk['Content'].astype(str).tolist(), workers=workers))
+        return rows
+    return work
+
+
+def bench_stats(data_dir, workers):
+    from rating_stats import RatingStats
+    path = _require(data_dir, 'cleaned_combined_data', 'join', workers)
+
+    def work():
+        rating_stats = RatingStats.from_file(path)
+        rating_stats.correlation()
+        rating_stats.ttest()
+        return int(rating_stats.counts().to_numpy().diagonal().max())
+    return work
+
+
+def bench_bootstrap(data_dir, workers):
+    from rating_stats import RATING_COLUMNS, bootstrap_intervals
+    data = read_table(_require(data_dir, 'cleaned_combined_data', 'join', workers), columns=RATING_COLUMNS)
+
+    def work():
+        bootstrap_intervals(data, n_resamples=BOOTSTRAP_RESAMPLES)
+        return len(data)
+    return work
+
+
+def bench_regression(data_dir, workers):
+    from revenue_model import FEATURES, TARGET, train_revenue_model
+    columns = FEATURES + [TARGET]
+    path = _require(data_dir, 'cleaned_combined_data', 'join', workers)
+    data = read_table(path, columns=columns).dropna(subset=columns)
+
+    def work():
+        train_revenue_model(data, workers=workers)
+        return len(data)
+    return work
+
+
+BENCHMARKS = {
+    'clean_imdb': bench_clean_imdb,
+    'clean_rt': bench_clean_rt,
+    'clean_reviews': bench_clean_reviews,
+    'join': bench_join,
+    'sentiment': bench_sentiment,
+    'stats': bench_stats,
+    'bootstrap': bench_bootstrap,
+    'regression': bench_regression,
+}
+
+
+def run_benchmark(name, data_dir, workers):
+    """Run one benchmark (in a worker process); returns its timing and memory."""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        work = BENCHMARKS[name](data_dir, workers)
+        start = time.perf_counter()
+        rows = work()
+        seconds = time.perf_counter() - start
+    # ru_maxrss is in KiB on Linux; stages with their own process pools report their largest worker too
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) / 1024
+    return {'seconds': seconds, 'rows': int(rows), 'peak_rss_mb': round(peak, 1)}
+
+
+def prepare_size(work_dir, rows, seed, corpus):
+    """Directory layout DataPreparer expects (<dir>/scripts, <dir>/data), with generated raw files."""
+    size_dir = os.path.join(work_dir, f'rows_{rows}')
+    data_dir = os.path.join(size_dir, 'data')
+    os.makedirs(os.path.join(size_dir, 'scripts'), exist_ok=True)
+    if not os.path.exists(os.path.join(data_dir, 'imdbreviews_synthetic.csv')):
+        generate_datasets(data_dir, rows, seed, corpus=corpus)
+    return data_dir
+
+
+def environment():
+    """What the numbers depend on besides the code: interpreter, libraries, machine and commit."""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=script_dir, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': commit, 'python': platform.python_version(), 'numpy': np.__version__,
+        'pandas': pd.__version__, 'platform': platform.platform(), 'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def run_suite(stages, sizes, work_dir, repeat=3, workers=1, seed=0):
+    """Run every stage at every size `repeat` times; returns one result per (stage, size)."""
+    corpus = SyntheticCorpus()
+    results = []
+    for rows in sizes:
+        start = time.perf_counter()
+        data_dir = prepare_size(work_dir, rows, seed, corpus)
+        print(f"Synthetic data with {rows} rows ready in {time.perf_counter() - start:.1f} s")
+        for stage in stages:
+            runs = []
+            for _ in range(repeat):
+                # A new process per run: memory is measured per stage and nothing stays warm
+                with ProcessPoolExecutor(max_workers=1, max_tasks_per_child=1) as pool:
+                    runs.append(pool.submit(run_benchmark, stage, data_dir, workers).result())
+            seconds = float(np.median([run['seconds'] for run in runs]))
+            result = {
+                'stage': stage, 'size': rows, 'rows': runs[0]['rows'], 'seconds': round(seconds, 6),
+                'runs': [round(run['seconds'], 6) for run in runs],
+                'rows_per_s': round(runs[0]['rows'] / seconds, 1) if seconds else None,
+                'peak_rss_mb': max(run['peak_rss_mb'] for run in runs),
+            }
+            results.append(result)
+            print(f"  {stage:<14} {result['rows']:>10} rows {seconds:10.3f} s "
+                  f"{result['rows_per_s'] or 0:>14,.0f} rows/s {result['peak_rss_mb']:>9.1f} MB")
+    return results
+
+
+def compare_results(base, new, threshold=DEFAULT_THRESHOLD, min_difference=MIN_DIFFERENCE_S):
+    """Median times of two result files side by side, with each (stage, size) classified."""
+    base_times = {(r['stage'], r['size']): r['seconds'] for r in base['results']}
+    rows = []
+    for result in new['results']:
+        key = (result['stage'], result['size'])
+        if key not in base_times:
+            continue
+        before, after = base_times[key], result['seconds']
+        ratio = after / before if before else float('inf')
+        if ratio > 1 + threshold and after - before > min_difference:
+            status = 'regression'
+        elif ratio < 1 / (1 + threshold) and before - after > min_difference:
+            status = 'improvement'
+        else:
+            status = 'unchanged'
+        rows.append({'stage': key[0], 'size': key[1], 'base_s': before, 'new_s': after,
+                     'ratio': round(ratio, 3), 'status': status})
+    return pd.DataFrame(rows, columns=['stage', 'size', 'base_s', 'new_s', 'ratio', 'status'])
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the pipeline stages on synthetic data.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    run = commands.add_parser('run', help='run the benchmarks and write a JSON result file')
+    run.add_argument('stages', nargs='*', help=f"stages to run (default: all of {', '.join(BENCHMARKS)})")
+    run.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='rows of synthetic data')
+    run.add_argument('--repeat', type=int, default=3, help='runs per stage and size (the median is reported)')
+    run.add_argument('--workers', type=int, default=1, help='workers of stages with process pools')
+    run.add_argument('--seed', type=int, default=0, help='seed of the synthetic data')
+    run.add_argument('--work-dir', help='keep (and reuse) the synthetic data here instead of a temporary directory')
+    run.add_argument('--output', default='benchmark_results.json', help='JSON result file')
+    compare = commands.add_parser('compare', help='flag regressions between two result files')
+    compare.add_argument('base', help='result file of the reference run')
+    compare.add_argument('new', help='result file of the run to check')
+    compare.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                         help='relative slowdown counted as a regression (0.1 = 10%%)')
+    args = parser.parse_args()
+
+    if args.command == 'compare':
+        base, new = load_results(args.base), load_results(args.new)
+        for field in ('cpu_count', 'python', 'processor'):
+            if base['environment'].get(field) != new['environment'].get(field):
+                print(f"Warning: runs differ in {field} ({base['environment'].get(field)} vs "
+                      f"{new['environment'].get(field)})")
+        table = compare_results(base, new, args.threshold)
+        pd.set_option('display.width', 160)
+        print(table.to_string(index=False))
+        regressions = table[table['status'] == 'regression']
+        print(f"\n{len(regressions)} regression(s) over {args.threshold:.0%} "
+              f"({base['environment'].get('commit')} -> {new['environment'].get('commit')})")
+        sys.exit(1 if len(regressions) else 0)
+
+    unknown = [stage for stage in args.stages if stage not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown stage(s): {', '.join(unknown)}")
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix='movie_benchmark_')
+    try:
+        results = run_suite(args.stages or list(BENCHMARKS), args.sizes, work_dir, args.repeat, args.workers,
+                            args.seed)
+    finally:
+        if not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    with open(args.output, 'w') as f:
+        json.dump({'environment': environment(), 'repeat': args.repeat, 'seed': args.seed, 'results': results},
+                  f, indent=1)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
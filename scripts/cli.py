@@ -0,0 +1,135 @@
+import os
+import sys
+import json
+import argparse
+import importlib
+import subprocess
+
+# Single entry point for the project: `python cli.py <command> [options]`. Each command
+# imports its module only when it runs, and the analysis modules import matplotlib,
+# seaborn, scipy and TextBlob only inside the functions that use them, so a command pays
+# for the libraries it needs and nothing else. `python cli.py imports` shows the cost.
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.normpath(os.path.join(SCRIPT_DIR, '../data'))
+
+# Command -> (modules whose main() it runs, description)
+COMMANDS = {
+    'clean': (['data_cleaning', 'data_cleaning_reviews'], 'clean the IMDb, Rotten Tomatoes and review files'),
+    'prepare': (['data_prepration'], 'join the cleaned IMDb and Rotten Tomatoes datasets'),
+    'sentiment': (['sentiment_analysis'], 'sentiment analysis of the IMDb reviews'),
+    'approximate': (['approximate_sentiment'], 'sentiment mix estimated from a stratified sample of reviews'),
+    'compare': (['comparative_analysis'], 'compare ratings across platforms'),
+    'revenue': (['revenue_analysis'], 'relate ratings to gross revenue'),
+    'profitability': (['contentRating_Profitability'], 'gross revenue per rating category'),
+    'describe': (['descriptive_analysis'], 'distributions and trends of all ratings'),
+    'reviews': (['review_store'], 'incremental review store with running per-movie sentiment'),
+    'cube': (['aggregate_cube'], 'slices and roll-ups of the combined data from the aggregate cube'),
+    'stats': (['rating_stats'], 'correlation, covariance and t-test matrices'),
+    'model': (['revenue_model'], 'select and save the gross revenue model'),
+    'figures': (['figures'], 'render every figure to plots/'),
+    'pipeline': (['pipeline'], 'run all stages, rebuilding only stale ones'),
+    'serve': (['scoring_server'], 'sentiment scoring server'),
+    'benchmark': (['benchmark'], 'benchmarks on synthetic data'),
+}
+# Libraries whose import time the report attributes to a command
+HEAVY_LIBRARIES = ['numpy', 'pandas', 'pyarrow', 'scipy', 'sklearn', 'matplotlib', 'seaborn', 'textblob']
+
+
+def run_clean(argv):
+    """'clean' combines the dataset and review cleaners, so it has its own options."""
+    from storage import FORMATS, STORAGE_FORMAT
+    parser = argparse.ArgumentParser(prog='cli.py clean', description=COMMANDS['clean'][1])
+    parser.add_argument('--workers', type=int, default=None, help='files cleaned concurrently')
+    parser.add_argument('--chunk-size', type=int, default=None, help='review rows read per chunk')
+    parser.add_argument('--format', choices=FORMATS, default=STORAGE_FORMAT, help='storage format of the output')
+    parser.add_argument('--dedupe-threshold', type=float, default=None,
+                        help='similarity from which reviews are duplicates (0 to 1)')
+    parser.add_argument('--keep-duplicates', action='store_true', help='do not remove duplicate reviews')
+    args = parser.parse_args(argv)
+
+    from data_cleaning import clean_datasets, files, print_cleaning_summary
+    from data_cleaning_reviews import DEFAULT_CHUNK_SIZE, clean_and_process_data
+    from review_dedup import DEFAULT_THRESHOLD
+    paths = []
+    for file in files:
+        path = os.path.join(DATA_DIR, file)
+        if os.path.exists(path):
+            paths.append(path)
+        else:
+            print(f"Skipping {file}: not found in {DATA_DIR}")
+    for summary in clean_datasets(paths, fmt=args.format, workers=args.workers):
+        print_cleaning_summary(summary)
+    # A threshold of 0 is a valid choice, so only a missing one falls back to the default
+    threshold = DEFAULT_THRESHOLD if args.dedupe_threshold is None else args.dedupe_threshold
+    if args.keep_duplicates:
+        threshold = None
+    counts = clean_and_process_data(workers=args.workers, chunk_size=args.chunk_size or DEFAULT_CHUNK_SIZE,
+                                    fmt=args.format, dedupe_threshold=threshold)
+    for filename, rows in counts.items():
+        print(f"{filename}: {rows} entries.")
+
+
+def run_module(command, argv):
+    """Run the module's own main() with the remaining arguments."""
+    sys.argv = [f'cli.py {command}'] + argv
+    for module in COMMANDS[command][0]:
+        importlib.import_module(module).main()
+
+
+def import_report(commands):
+    """Import each command's modules in a fresh interpreter; returns seconds and libraries loaded."""
+    probe = ("import sys, json, time\n"
+             "start = time.perf_counter()\n"
+             "for module in sys.argv[2:]:\n"
+             "    __import__(module)\n"
+             "print(json.dumps({'seconds': time.perf_counter() - start,\n"
+             "                  'libraries': [lib for lib in json.loads(sys.argv[1]) if lib in sys.modules]}))\n")
+    report = {}
+    for command in commands:
+        output = subprocess.run([sys.executable, '-c', probe, json.dumps(HEAVY_LIBRARIES)] + COMMANDS[command][0],
+                                cwd=SCRIPT_DIR, capture_output=True, text=True, check=True).stdout
+        report[command] = json.loads(output)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Movie review and rating analysis.',
+                                     epilog='Run `cli.py <command> --help` for the options of a command.')
+    parser.add_argument('--profile', choices=['trace', 'cprofile'], default=None,
+                        help='record a per-stage profile of the command (see profiling.py)')
+    parser.add_argument('command', choices=list(COMMANDS) + ['imports'],
+                        help=', '.join(f'{name}: {help}' for name, (_, help) in COMMANDS.items()) +
+                             ', imports: import time of every command')
+    parser.add_argument('args', nargs=argparse.REMAINDER, help='options of the command')
+    args = parser.parse_args()
+
+    if args.command == 'imports':
+        unknown = [command for command in args.args if command not in COMMANDS]
+        if unknown:
+            parser.error(f"unknown command(s): {', '.join(unknown)}")
+        print(f"{'command':<14} {'import ms':>10}  libraries loaded")
+        for command, result in import_report(args.args or list(COMMANDS)).items():
+            print(f"{command:<14} {result['seconds'] * 1000:>10.0f}  {', '.join(result['libraries'])}")
+        return
+
+    profile_dir = None
+    if args.profile:
+        from profiling import clear_traces, enable
+        profile_dir = enable(args.profile)
+        clear_traces(profile_dir)
+    try:
+        if args.command == 'clean':
+            run_clean(args.args)
+        else:
+            run_module(args.command, args.args)
+    finally:
+        if profile_dir:
+            from profiling import merge_traces, print_summary
+            path, events = merge_traces(profile_dir)
+            print()
+            print_summary(events)
+            print(f"\nTrace written to {path}")
+
+
+if __name__ == "__main__":
+    main()
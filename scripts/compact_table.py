@@ -0,0 +1,105 @@
+import os
+import argparse
+import numpy as np
+import pandas as pd
+from storage import find_table, read_table
+
+# In-memory types of the combined table. The outer merge leaves most rows with only the
+# IMDb or only the Rotten Tomatoes side filled in, the platform columns repeat one string
+# and ratings need far less than float64. Gross stays float64: revenues reach 1e9, beyond
+# float32's exact integer range.
+COMPACT_SCHEMAS = {
+    'combined_data': {
+        'movie_title_imdb': 'category', 'Released_Year': 'Int16', 'Genre': 'category',
+        'IMDB_Rating': 'float32', 'Meta_score': 'float32', 'platform_imdb': 'category',
+        'movie_title_rt': 'category', 'tomatometer_rating': 'float32', 'audience_rating': 'float32',
+        'platform_rt': 'category', 'Gross_imdb': 'float64', 'title_match_score': 'float32',
+    },
+}
+# Numeric columns with at most this share of rows present are stored sparse: a sparse value
+# costs its index on top of the value, so below half the rows sparse storage is smaller.
+SPARSE_DENSITY = 0.5
+GENRE_SEPARATOR = ', '
+
+
+def compact_schema_for(name):
+    """Compact column types of a dataset from its file or stem name."""
+    stem = os.path.splitext(os.path.basename(name))[0]
+    for dataset, schema in COMPACT_SCHEMAS.items():
+        if dataset in stem:
+            return schema
+    return {}
+
+
+def compact_column(values, dtype):
+    """values in the compact dtype; categoricals only where they take less memory."""
+    if dtype == 'category':
+        converted = values.astype('category')
+        return converted if converted.memory_usage(deep=True) < values.memory_usage(deep=True) else values
+    if dtype.startswith('Int'):
+        converted = pd.to_numeric(values, errors='coerce').astype(dtype)
+    else:
+        converted = values.astype(dtype)
+    if converted.notna().mean() <= SPARSE_DENSITY and not dtype.startswith('Int'):
+        converted = converted.astype(pd.SparseDtype(dtype, np.nan))
+    return converted
+
+
+def compact_frame(data, schema):
+    """A copy of data with the columns listed in schema in their compact (and sparse) types."""
+    return data.assign(**{column: compact_column(data[column], dtype)
+                          for column, dtype in schema.items() if column in data})
+
+
+def dense(data):
+    """data with sparse columns expanded, for code that expects ordinary columns."""
+    sparse = [column for column, dtype in data.dtypes.items() if isinstance(dtype, pd.SparseDtype)]
+    if not sparse:
+        return data
+    return data.assign(**{column: data[column].sparse.to_dense() for column in sparse})
+
+
+def genre_matrix(genres):
+    """Sparse multi-hot encoding of comma-joined genres: one boolean column per genre.
+
+    Distinct genre combinations are split once and the rows pick theirs by category code.
+    """
+    genres = genres if isinstance(genres.dtype, pd.CategoricalDtype) else genres.astype('category')
+    combinations = pd.Series(genres.cat.categories).str.get_dummies(sep=GENRE_SEPARATOR).astype(bool)
+    codes = genres.cat.codes.to_numpy()
+    present = codes >= 0
+    hot = combinations.to_numpy()[np.where(present, codes, 0)] & present[:, None]
+    return pd.DataFrame({genre: pd.arrays.SparseArray(hot[:, i], fill_value=False)
+                         for i, genre in enumerate(combinations.columns)}, index=genres.index)
+
+
+def memory_report(frames):
+    """Deep memory use in bytes of every column of each named frame, with a total row."""
+    report = pd.DataFrame({name: frame.memory_usage(deep=True, index=False) for name, frame in frames.items()})
+    report.loc['total'] = report.sum()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Memory footprint of the combined table before and after compaction.')
+    parser.add_argument('--stem', default='cleaned_combined_data', help='dataset in the data directory')
+    args = parser.parse_args()
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    path = find_table(os.path.join(script_dir, '../data'), args.stem)
+    data = read_table(path)
+    compact = compact_frame(data, compact_schema_for(path))
+    report = memory_report({'before': data, 'after': compact})
+    report['dtype after'] = compact.dtypes.astype(str)
+    if 'Genre' in compact:
+        genres = genre_matrix(compact['Genre'])
+        report.loc['genre matrix', 'after'] = genres.memory_usage(index=False).sum()
+        report.loc['genre matrix', 'dtype after'] = f'{genres.shape[1]} x Sparse[bool]'
+    pd.set_option('display.width', 160)
+    print(report.fillna(''))
+    before, after = report.loc['total', 'before'], report.loc['total', 'after']
+    print(f"\n{len(data)} rows: {before / 1e6:.2f} MB -> {after / 1e6:.2f} MB ({before / after:.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,14 @@
 import os
+import argparse
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-from scipy.stats import ttest_ind, pearsonr, linregress
+from dataset_loader import load_dataset
+from figures import show_figure
+from storage import table_filename
+from rating_stats import RatingStats, bootstrap_intervals
+from profiling import profiled_class
 
 
+@profiled_class
 class ComparativeAnalysis:
     def __init__(self, filename):
         script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -12,10 +16,13 @@ class ComparativeAnalysis:
         self.filepath = os.path.join(data_dir, filename)
 
     def load_data(self):
-        self.data = pd.read_csv(self.filepath)
-        self.data.dropna(subset=['IMDB_Rating', 'tomatometer_rating', 'audience_rating'], inplace=True)
+        self.data = load_dataset(self.filepath,
+                                 columns=['IMDB_Rating', 'Meta_score', 'tomatometer_rating', 'audience_rating'],
+                                 dropna=['IMDB_Rating', 'tomatometer_rating', 'audience_rating'])
 
     def plot_average_ratings(self):
+        import matplotlib.pyplot as plt
+        import seaborn as sns
         rating_comparison_data = self.data[['IMDB_Rating', 'Meta_score', 'tomatometer_rating', 'audience_rating']]
         rating_comparison_data.columns = ['IMDb Rating', 'IMDb Meta Score', 'Tomatometer Rating', 'Audience Rating']
         # Define Custom Colors
@@ -35,12 +42,19 @@ class ComparativeAnalysis:
         plt.ylabel('Average Score')
         plt.xticks(rotation=45, ha="right")
         plt.tight_layout()
-        plt.show()
+        show_figure('ratingcomparison')
 
     def perform_statistical_tests(self):
-        t_stat, p_value = ttest_ind(self.data['Meta_score'], self.data['tomatometer_rating'])
-        imdb_rt_correlation, _ = pearsonr(self.data['IMDB_Rating'], self.data['audience_rating'])
-        meta_tomato_correlation, _ = pearsonr(self.data['Meta_score'], self.data['tomatometer_rating'])
+        import matplotlib.pyplot as plt
+        import seaborn as sns
+        # Every pair of rating columns at once, with bootstrap intervals for the correlations
+        rating_stats = RatingStats.from_frame(self.data)
+        t_matrix, p_matrix = rating_stats.ttest()
+        correlation = rating_stats.correlation()
+        low, high = bootstrap_intervals(self.data)['correlation']
+        t_stat, p_value = t_matrix.loc['Meta_score', 'tomatometer_rating'], p_matrix.loc['Meta_score', 'tomatometer_rating']
+        imdb_rt_correlation = correlation.loc['IMDB_Rating', 'audience_rating']
+        meta_tomato_correlation = correlation.loc['Meta_score', 'tomatometer_rating']
 
         means = self.data[['Meta_score', 'tomatometer_rating']].mean()
         errors = self.data[['Meta_score', 'tomatometer_rating']].std()
@@ -53,7 +67,7 @@ class ComparativeAnalysis:
         plt.xticks(rotation=0, ha="center")
         plt.tight_layout()  # Adjust layout to prevent overlapping
 
-        plt.show()
+        show_figure('errorbars')
 
         fig, ax = plt.subplots(1, 2, figsize=(16, 6))
         # Customize Colors
@@ -64,15 +78,19 @@ class ComparativeAnalysis:
         sns.regplot(x='Meta_score', y='tomatometer_rating', data=self.data, ax=ax[1], scatter_kws={'color': meta_color}, line_kws={'color': meta_color})  # Added color arguments
         ax[1].set_title('Correlation between IMDb Meta Scores and RT Tomatometer Ratings')
         plt.tight_layout()
-        plt.show()
+        show_figure('correlations')
 
         print(f"T-statistic: {t_stat}, P-value: {p_value}")
-        print(f"Correlation between IMDb Ratings and RT Audience Ratings: {imdb_rt_correlation}")
-        print(f"Correlation between IMDb Meta Scores and RT Tomatometer Ratings: {meta_tomato_correlation}")
+        print(f"Correlation between IMDb Ratings and RT Audience Ratings: {imdb_rt_correlation} "
+              f"(95% CI {low.loc['IMDB_Rating', 'audience_rating']:.3f} to {high.loc['IMDB_Rating', 'audience_rating']:.3f})")
+        print(f"Correlation between IMDb Meta Scores and RT Tomatometer Ratings: {meta_tomato_correlation} "
+              f"(95% CI {low.loc['Meta_score', 'tomatometer_rating']:.3f} to {high.loc['Meta_score', 'tomatometer_rating']:.3f})")
 
 
 def main():
-    analysis = ComparativeAnalysis('cleaned_combined_data.csv')
+    argparse.ArgumentParser(description='Compare IMDb and Rotten Tomatoes ratings with statistical tests.').parse_args()
+
+    analysis = ComparativeAnalysis(table_filename('cleaned_combined_data'))
     analysis.load_data()
     analysis.plot_average_ratings()
     analysis.perform_statistical_tests()
@@ -1,42 +1,54 @@
 import os
+import argparse
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+from aggregate_cube import RATING_LABELS, load_cube
+from figures import show_figure
+from storage import table_filename
+from profiling import profiled_class
 
+@profiled_class
 class ContentRatingProfitability:
-    def __init__(self, filename):
+    def __init__(self, filename, cube_path=None):
         # Define the data directory relative to the script location
         script_dir = os.path.dirname(os.path.abspath(__file__))
         data_dir = os.path.join(script_dir, '../data')
         self.filepath = os.path.join(data_dir, filename)
+        # SQLite file keeping the aggregate cube of the dataset between runs (None: in memory only)
+        self.cube_path = cube_path
 
     def load_data(self):
-        """Load the dataset and ensure necessary data is present."""
-        self.data = pd.read_csv(self.filepath)
-        self.data.dropna(subset=['Gross_imdb', 'IMDB_Rating'], inplace=True)
+        """Load the aggregate cube of the dataset."""
+        self.cube = load_cube(self.filepath, self.cube_path)
 
     def categorize_and_analyze(self):
         """Categorize IMDb ratings and calculate average gross revenue for each category."""
-        # Define rating categories based on the distribution of IMDb ratings
-        self.data['Rating_Category'] = pd.cut(self.data['IMDB_Rating'],
-                                              bins=[75, 80, 85, 90, 100],
-                                              labels=['76 to 80', '81 to 85', '86 to 90', 'Above 90'])
-        # Calculate average gross revenue per rating category
-        profitability = self.data.groupby('Rating_Category')['Gross_imdb'].mean().sort_values(ascending=False)
-        return profitability
+        # Served from the aggregate cube's rating buckets (76 to 80, 81 to 85, 86 to 90, Above 90)
+        # instead of binning and grouping the table on every call
+        gross = self.cube.query(['rating_bucket'], ['Gross_imdb'])[('Gross_imdb', 'mean')]
+        profitability = pd.Series(gross.to_numpy(), name='Gross_imdb',
+                                  index=pd.CategoricalIndex(gross.index, categories=RATING_LABELS,
+                                                            ordered=True, name='Rating_Category'))
+        return profitability.sort_values(ascending=False)
 
     def plot_profitability(self, profitability):
         """Visualize the average gross revenue across different IMDb rating categories."""
+        import matplotlib.pyplot as plt
+        import seaborn as sns
         plt.figure(figsize=(10, 6))
         sns.barplot(x=profitability.index, y=profitability.values, palette='viridis')
         plt.title('Average Gross Revenue by IMDb Rating Category')
         plt.xlabel('IMDb Rating Category')
         plt.ylabel('Average Gross Revenue ($)')
-        plt.show()
+        show_figure('grossrevenue')
 
 def main():
+    parser = argparse.ArgumentParser(description='Average gross revenue per IMDb rating category.')
+    parser.add_argument('--cube', default=None,
+                        help='SQLite file to keep the aggregate cube in between runs (default: build it in memory)')
+    args = parser.parse_args()
+
     # Initialize the analysis with the path to the dataset
-    analysis = ContentRatingProfitability('cleaned_combined_data.csv')
+    analysis = ContentRatingProfitability(table_filename('cleaned_combined_data'), args.cube)
     analysis.load_data()
     profitability = analysis.categorize_and_analyze()
     analysis.plot_profitability(profitability)
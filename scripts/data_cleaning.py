@@ -1,58 +1,211 @@
 import os
+import json
+import time
+import argparse
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from storage import FORMATS, STORAGE_FORMAT, write_table
+from profiling import profiled
 
 # Define the data directory relative to the script location
 script_dir = os.path.dirname(os.path.abspath(__file__))
 data_dir = os.path.join(script_dir, '../data')
 
-# Print the current working directory
-print("Current Working Directory:", os.getcwd())
+# Cleaning rules per source, matched against the file name like the storage schemas (a
+# source equal to the file's stem first, then the longest one it contains). Each listed
+# column is, in this order:
+#   strip   regex removed from the values ('$1,234' -> '1234')
+#   type    parsed to a numeric dtype ('float64', 'Int16', ...), 'datetime' (with an
+#           optional 'format') or 'string'/'category'; unparseable values, and fractional
+#           ones for integer dtypes, become missing
+#   impute  missing values filled with the column's 'median', 'mean' or 'mode', or with
+#           a constant given as {'value': ...}
+# Columns not listed are kept as read. A new source needs only an entry here, or in a
+# JSON file of the same shape passed with --rules.
+CLEANING_RULES = {
+    'imdb_top_1000': {
+        'Meta_score': {'impute': 'median'},
+        'Certificate': {'impute': 'mode'},
+        'Gross': {'strip': r'[\$,]', 'type': 'float64', 'impute': 'median'},
+        'IMDB_Rating': {'type': 'float64'},
+    },
+    'rotten_tomatoes_movies_1': {
+        'tomatometer_rating': {'impute': 'median'},
+        'audience_rating': {'impute': 'median'},
+        'original_release_date': {'type': 'datetime'},
+        'streaming_release_date': {'type': 'datetime'},
+    },
+}
 
-# Function to Clean and Preprocess 'imdb_top_1000.csv' & 'rotten_tomatoes_movies_1.csv'
-def clean_dataset(file_path):
-    # Load the dataset
+
+def load_rules(path=None):
+    """The built-in cleaning rules, extended (or overridden per source) by a JSON rules file."""
+    rules = dict(CLEANING_RULES)
+    if path:
+        with open(path) as f:
+            rules.update(json.load(f))
+    return rules
+
+
+def rules_for(name, rules=None):
+    """Cleaning rules of a dataset from its file or stem name."""
+    stem = os.path.splitext(os.path.basename(name))[0]
+    rules = rules or CLEANING_RULES
+    if stem in rules:
+        return rules[stem]
+    # Otherwise the most specific source contained in the name, so 'imdb_top_1000_2024'
+    # rules win over 'imdb_top_1000' whatever their order
+    matches = [source for source in rules if source in stem]
+    return rules[max(matches, key=len)] if matches else {}
+
+
+def parse_column(values, dtype, fmt=None):
+    """values converted to dtype, with values that do not parse set to missing."""
+    if dtype == 'datetime':
+        return pd.to_datetime(values, errors='coerce', format=fmt)
+    if dtype in ('string', 'category', 'object'):
+        return values.astype(dtype)
+    numbers = pd.to_numeric(values, errors='coerce')
+    if pd.api.types.is_integer_dtype(dtype):
+        # Fractional values do not fit an integer column: they count as unparseable
+        numbers = numbers.where(numbers % 1 == 0)
+    return numbers.astype(dtype)
+
+
+def impute_value(values, strategy):
+    """Value that fills the missing entries of a column under an imputation strategy."""
+    if isinstance(strategy, dict):
+        return strategy['value']
+    if strategy == 'median':
+        return values.median()
+    if strategy == 'mean':
+        return values.mean()
+    if strategy == 'mode':
+        modes = values.mode()
+        return modes[0] if len(modes) else None
+    raise ValueError(f"Unknown imputation strategy: {strategy!r}")
+
+
+def clean_frame(data, columns):
+    """Apply a source's column rules in one pass over the listed columns.
+
+    Returns the cleaned frame and a report of missing values per column as read, values that
+    failed to parse, values imputed and values still missing.
+    """
+    missing = data.isna().sum()
+    failures = pd.Series(0, index=data.columns)
+    imputed = pd.Series(0, index=data.columns)
+    cleaned = {}
+    for column, rule in columns.items():
+        if column not in data:
+            continue
+        values = data[column]
+        if 'strip' in rule:
+            values = values.replace(rule['strip'], '', regex=True)
+        if 'type' in rule:
+            present = values.notna()
+            values = parse_column(values, rule['type'], rule.get('format'))
+            failures[column] = int((present & values.isna()).sum())
+        if 'impute' in rule:
+            gaps = int(values.isna().sum())
+            if gaps:
+                fill = impute_value(values, rule['impute'])
+                if fill is not None and not pd.isna(fill):
+                    values = values.fillna(fill)
+                    imputed[column] = gaps
+        cleaned[column] = values
+    data = data.assign(**cleaned)
+    report = pd.DataFrame({'missing': missing, 'parse_failures': failures, 'imputed': imputed,
+                           'missing_after': data.isna().sum()})
+    return data, report
+
+
+def _clean(file_path, output_dir=None, fmt=None, rules=None):
+    """Read, clean and save one source file; returns (cleaned frame, summary)."""
+    start = time.perf_counter()
     try:
         data = pd.read_csv(file_path)
-        print(f"Loaded dataset: {file_path}")
     except FileNotFoundError:
         print(f"File not found: {file_path}")
         # List files in the data directory
         print("Files in the data directory:", os.listdir(data_dir))
         raise
+    data, report = clean_frame(data, rules_for(file_path, rules))
 
-    # Specific cleaning steps for each dataset based on known structure
-    if 'imdb_top_1000.csv' in file_path:
-        # Fill missing 'Meta_score' with the median of the column
-        data['Meta_score'].fillna(data['Meta_score'].median(), inplace=True)
-        # For 'Certificate', use the most common certificate if not specified
-        data['Certificate'].fillna(data['Certificate'].mode()[0], inplace=True)
-        # Convert 'Gross' to numeric, removing non-numeric characters
-        data['Gross'] = data['Gross'].replace(r'[\$,]', '', regex=True).astype(float)
-        data['Gross'].fillna(data['Gross'].median(), inplace=True)
-        data['IMDB_Rating'] = data['IMDB_Rating'].astype(float)
-
-    elif 'rotten_tomatoes_movies_1.csv' in file_path:
-        # Fill missing values in 'tomatometer_rating' and 'audience_rating'
-        data['tomatometer_rating'].fillna(data['tomatometer_rating'].median(), inplace=True)
-        data['audience_rating'].fillna(data['audience_rating'].median(), inplace=True)
-        # Convert date fields to datetime
-        data['original_release_date'] = pd.to_datetime(data['original_release_date'], errors='coerce')
-        data['streaming_release_date'] = pd.to_datetime(data['streaming_release_date'], errors='coerce')
-
-    # Save cleaned dataset
-    cleaned_path = os.path.join(data_dir, 'cleaned_' + os.path.basename(file_path))
-    data.to_csv(cleaned_path, index=False)
-    print(f"Cleaned data saved to: {cleaned_path}")
+    # Save cleaned dataset (CSV, or Parquet/Feather when MOVIE_DATA_FORMAT is set) to the data directory
+    # unless another output directory is given
+    stem = os.path.splitext(os.path.basename(file_path))[0]
+    cleaned_path = write_table(data, output_dir or data_dir, 'cleaned_' + stem, fmt)
+    summary = {'source': file_path, 'output': cleaned_path, 'rows': len(data),
+               'seconds': time.perf_counter() - start, 'columns': report}
+    return data, summary
 
+
+def print_cleaning_summary(summary):
+    """Throughput of one cleaned file and the columns that had missing or unparseable values."""
+    rate = summary['rows'] / summary['seconds'] if summary['seconds'] > 0 else float('inf')
+    print(f"Cleaned {summary['source']}: {summary['rows']} rows in {summary['seconds']:.2f}s "
+          f"({rate:,.0f} rows/s) -> {summary['output']}")
+    report = summary['columns']
+    report = report[report.any(axis=1)]
+    if len(report):
+        print(report.to_string())
+
+
+# Function to Clean and Preprocess 'imdb_top_1000.csv' & 'rotten_tomatoes_movies_1.csv'
+@profiled
+def clean_dataset(file_path, output_dir=None, fmt=None, rules=None):
+    """Clean one source file by its rules and save it; returns the cleaned frame."""
+    data, summary = _clean(file_path, output_dir, fmt, rules)
+    print_cleaning_summary(summary)
     return data
 
+
+def clean_file(file_path, output_dir=None, fmt=None, rules=None):
+    """Worker for clean_datasets: the summary only, so the frame does not travel back."""
+    return _clean(file_path, output_dir, fmt, rules)[1]
+
+
+@profiled(rows=lambda summaries: sum(summary['rows'] for summary in summaries))
+def clean_datasets(file_paths, output_dir=None, fmt=None, rules=None, workers=None):
+    """Clean several source files concurrently; returns their summaries in order."""
+    if not file_paths:
+        return []
+    n = len(file_paths)
+    with ProcessPoolExecutor(max_workers=min(workers or n, n)) as pool:
+        return list(pool.map(clean_file, file_paths, [output_dir] * n, [fmt] * n, [rules] * n))
+
+
 # List of files to clean
 files = [
     'imdb_top_1000.csv',
     'rotten_tomatoes_movies_1.csv',
 ]
 
-# Apply cleaning to all datasets
-for file in files:
-    file_path = os.path.join(data_dir, file)
-    clean_dataset(file_path)
+def main():
+    parser = argparse.ArgumentParser(description='Clean the catalog datasets by their declared column rules.')
+    parser.add_argument('files', nargs='*', help=f"source files (default: {', '.join(files)} in data/)")
+    parser.add_argument('--rules', default=None, help='JSON file of extra or overriding cleaning rules per source')
+    parser.add_argument('--workers', type=int, default=None, help='files cleaned concurrently (default: one per file)')
+    parser.add_argument('--format', choices=FORMATS, default=STORAGE_FORMAT, help='storage format of the output')
+    args = parser.parse_args()
+
+    # Print the current working directory
+    print("Current Working Directory:", os.getcwd())
+
+    # Apply cleaning to all datasets
+    file_paths = args.files or [os.path.join(data_dir, file) for file in files]
+    missing = [path for path in file_paths if not os.path.exists(path)]
+    for path in missing:
+        print(f"Skipping {path}: not found")
+    start = time.perf_counter()
+    summaries = clean_datasets([path for path in file_paths if path not in missing], fmt=args.format,
+                               rules=load_rules(args.rules), workers=args.workers)
+    for summary in summaries:
+        print_cleaning_summary(summary)
+    rows = sum(summary['rows'] for summary in summaries)
+    elapsed = time.perf_counter() - start
+    print(f"{len(summaries)} files, {rows} rows in {elapsed:.2f}s ({rows / elapsed:,.0f} rows/s)")
+
+if __name__ == "__main__":
+    main()
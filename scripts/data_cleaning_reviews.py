@@ -1,41 +1,83 @@
 import os
+import glob
+import argparse
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from review_dedup import DEFAULT_THRESHOLD, dedupe_review_file
+from storage import FORMATS, STORAGE_FORMAT, TableWriter, schema_for, table_path
+from profiling import profiled
 
-def clean_and_process_data():
-    # Define the data directory relative to the script location
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    data_dir = os.path.join(script_dir, '../data')
+# Rows read per chunk; peak memory per worker is bounded by this, not by the file size.
+DEFAULT_CHUNK_SIZE = 10000
 
-    # Paths to the data files
-    path_saw = os.path.join(data_dir, 'imdbreviews_saw2004.csv')
-    path_3idiots = os.path.join(data_dir, 'imdbreviews_3idiots2009.csv')
-    path_lionking = os.path.join(data_dir, 'imdbreviews_thelionking1994.csv')
 
-    # Load the datasets
-    data_saw = pd.read_csv(path_saw)
-    data_3idiots = pd.read_csv(path_3idiots)
-    data_lionking = pd.read_csv(path_lionking)
+def normalize_rating(ratings):
+    """Convert 'Rating' values such as '9/10', '9' or 9.0 to a numeric score out of 10."""
+    # Always float64, so the stored format does not depend on whether a chunk had missing ratings
+    return pd.to_numeric(ratings.astype(str).str.split('/').str[0], errors='coerce').astype('float64')
 
-    # Convert 'Rating' from '9/10' format to numeric for The Lion King 1994 dataset
-    data_lionking['Rating'] = data_lionking['Rating'].str.split('/').str[0].astype(float)
 
-    # Remove rows with missing values from all datasets
-    data_saw_clean = data_saw.dropna()
-    data_3idiots_clean = data_3idiots.dropna()
-    data_lionking_clean = data_lionking.dropna()
+@profiled(rows=lambda rows: rows)
+def clean_review_file(input_path, output_path, chunk_size=DEFAULT_CHUNK_SIZE, dedupe_threshold=DEFAULT_THRESHOLD):
+    """Stream one review file through the cleaning steps, writing cleaned chunks as they are ready.
 
-    # Write the cleaned data back to new CSV files
-    data_saw_clean.to_csv(os.path.join(data_dir, 'cleaned_imdbreviews_saw2004.csv'), index=False)
-    data_3idiots_clean.to_csv(os.path.join(data_dir, 'cleaned_imdbreviews_3idiots2009.csv'), index=False)
-    data_lionking_clean.to_csv(os.path.join(data_dir, 'cleaned_imdbreviews_thelionking1994.csv'), index=False)
+    Duplicate reviews (similarity >= dedupe_threshold, see review_dedup.py) are then removed;
+    a threshold of None keeps them. Returns the number of reviews kept.
+    """
+    with TableWriter(output_path, schema_for(output_path)) as output:
+        for chunk in pd.read_csv(input_path, chunksize=chunk_size):
+            chunk['Rating'] = normalize_rating(chunk['Rating'])
+            # Remove rows with missing values
+            output.write(chunk.dropna())
+    if dedupe_threshold is None:
+        return output.rows
+    # Only canonical reviews go on to sentiment scoring
+    return dedupe_review_file(output_path, dedupe_threshold)[0]
 
-    # Return the cleaned data
-    return data_saw_clean, data_3idiots_clean, data_lionking_clean
 
-# Clean the data
-cleaned_data_saw, cleaned_data_3idiots, cleaned_data_lionking = clean_and_process_data()
+def find_review_files(data_dir):
+    """Discover raw review files (imdbreviews_*.csv) in the data directory."""
+    return sorted(glob.glob(os.path.join(data_dir, 'imdbreviews_*.csv')))
 
-# Print the number of entries for each dataset
-print(f"Saw (2004): {cleaned_data_saw.shape[0]} entries.")
-print(f"3 Idiots (2009): {cleaned_data_3idiots.shape[0]} entries.")
-print(f"The Lion King (1994): {cleaned_data_lionking.shape[0]} entries.")
+
+@profiled(rows=lambda counts: sum(counts.values()))
+def clean_and_process_data(data_dir=None, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, fmt=STORAGE_FORMAT,
+                           dedupe_threshold=DEFAULT_THRESHOLD):
+    """Clean every review file concurrently; returns the number of cleaned rows per file."""
+    if data_dir is None:
+        # Define the data directory relative to the script location
+        script_dir = os.path.dirname(os.path.abspath(__file__))
+        data_dir = os.path.join(script_dir, '../data')
+
+    input_paths = find_review_files(data_dir)
+    output_paths = [table_path(data_dir, 'cleaned_' + os.path.splitext(os.path.basename(path))[0], fmt)
+                    for path in input_paths]
+    if not input_paths:
+        return {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        counts = pool.map(clean_review_file, input_paths, output_paths, [chunk_size] * len(input_paths),
+                          [dedupe_threshold] * len(input_paths))
+        return dict(zip((os.path.basename(path) for path in output_paths), counts))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Clean raw IMDb review files (imdbreviews_*.csv).')
+    parser.add_argument('--workers', type=int, default=None, help='files cleaned concurrently (default: CPU cores)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='rows read per chunk')
+    parser.add_argument('--format', choices=FORMATS, default=STORAGE_FORMAT, help='storage format of the output')
+    parser.add_argument('--dedupe-threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='similarity from which reviews are duplicates (0 to 1)')
+    parser.add_argument('--keep-duplicates', action='store_true', help='do not remove duplicate reviews')
+    args = parser.parse_args()
+
+    # Clean the data
+    counts = clean_and_process_data(workers=args.workers, chunk_size=args.chunk_size, fmt=args.format,
+                                    dedupe_threshold=None if args.keep_duplicates else args.dedupe_threshold)
+
+    # Print the number of entries for each dataset
+    for filename, rows in counts.items():
+        print(f"{filename}: {rows} entries.")
+
+
+if __name__ == "__main__":
+    main()
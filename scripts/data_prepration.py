@@ -1,46 +1,70 @@
 import os
+import argparse
 import pandas as pd
+from storage import find_table, read_table, table_path, write_table
+from title_matching import TitleMatcher
+from profiling import profiled_class
 
+@profiled_class
 class DataPreparer:
-    def __init__(self, base_directory):
+    def __init__(self, base_directory, how='outer'):
         self.base_directory = base_directory
-        data_dir = os.path.join(base_directory, '../data')
-        self.imdb_data_path = os.path.join(data_dir, 'cleaned_imdb_top_1000.csv')
-        self.rotten_tomatoes_data_path = os.path.join(data_dir, 'cleaned_rotten_tomatoes_movies_1.csv')
-        self.output_data_path = os.path.join(data_dir, 'cleaned_combined_data.csv')
+        # 'outer' keeps unmatched titles from both catalogs, 'left' only the IMDb titles
+        self.how = how
+        self.data_dir = os.path.join(base_directory, '../data')
+        self.imdb_data_path = find_table(self.data_dir, 'cleaned_imdb_top_1000')
+        self.rotten_tomatoes_data_path = find_table(self.data_dir, 'cleaned_rotten_tomatoes_movies_1')
+        self.output_data_path = table_path(self.data_dir, 'cleaned_combined_data')
 
     def load_data(self):
-        """Load datasets from CSV files."""
-        self.imdb_data = pd.read_csv(self.imdb_data_path)
-        self.rotten_tomatoes_data = pd.read_csv(self.rotten_tomatoes_data_path)
+        """Load datasets from CSV or columnar files."""
+        self.imdb_data = read_table(self.imdb_data_path)
+        self.rotten_tomatoes_data = read_table(self.rotten_tomatoes_data_path)
         print("Data loaded successfully.")
 
+    def match_titles(self):
+        """Match each IMDb title to at most one Rotten Tomatoes title, using release years to block candidates."""
+        matcher = TitleMatcher(self.rotten_tomatoes_data['movie_title'],
+                               self.rotten_tomatoes_data.get('original_release_date'))
+        matches = matcher.match(self.imdb_data['movie_title'], self.imdb_data['Released_Year'])
+        matcher.report()
+        return matches
+
     def normalize_and_prepare_data(self):
-        """Normalize IMDb ratings and prepare data by merging datasets."""
+        """Normalize IMDb ratings and prepare data by joining datasets on matched titles."""
         self.imdb_data['IMDB_Rating'] = self.imdb_data['IMDB_Rating'] * 10
         self.imdb_data['platform'] = 'IMDb'
         self.rotten_tomatoes_data['platform'] = 'Rotten Tomatoes'
         self.imdb_data.rename(columns={'Series_Title': 'movie_title'}, inplace=True)
-        self.imdb_data['movie_title_lower'] = self.imdb_data['movie_title'].str.lower()
-        self.rotten_tomatoes_data['movie_title_lower'] = self.rotten_tomatoes_data['movie_title'].str.lower()
-        self.combined_data = pd.merge(self.imdb_data, self.rotten_tomatoes_data, on='movie_title_lower', how='outer', suffixes=('_imdb', '_rt'))
+        self.imdb_data = self.imdb_data.reset_index(drop=True)
+        self.rotten_tomatoes_data = self.rotten_tomatoes_data.reset_index(drop=True)
+        matches = self.match_titles()
+        self.imdb_data['rt_row'] = matches['right']
+        self.imdb_data['title_match_score'] = matches['score']
+        self.rotten_tomatoes_data['rt_row'] = pd.array(self.rotten_tomatoes_data.index, dtype='Int64')
+        self.combined_data = pd.merge(self.imdb_data, self.rotten_tomatoes_data, on='rt_row', how=self.how, suffixes=('_imdb', '_rt'))
         self.combined_data.rename(columns={'Gross': 'Gross_imdb'}, inplace=True)
         print("Data normalized and prepared.")
 
     def clean_and_save_data(self):
         """Clean the dataset by removing unnecessary columns and save the cleaned data."""
         columns_to_drop = ['Poster_Link', 'Certificate', 'Runtime', 'Overview', 'Star1', 'Star2', 'Star3', 'Star4',
-                           'No_of_Votes', 'movie_title_lower', 'original_release_date', 'actors', 'streaming_release_date']
+                           'No_of_Votes', 'rt_row', 'original_release_date', 'actors', 'streaming_release_date']
         cleaned_data = self.combined_data.drop(columns=columns_to_drop)
         simplified_data = cleaned_data[['movie_title_imdb', 'Released_Year', 'Genre', 'IMDB_Rating', 'Meta_score',
                                         'platform_imdb', 'movie_title_rt', 'tomatometer_rating', 'audience_rating',
-                                        'platform_rt', 'Gross_imdb']]
-        simplified_data.to_csv(self.output_data_path, index=False)
+                                        'platform_rt', 'Gross_imdb', 'title_match_score']]
+        write_table(simplified_data, self.data_dir, 'cleaned_combined_data')
         print("Data cleaned and saved successfully.")
 
 def main():
+    parser = argparse.ArgumentParser(description='Join the cleaned IMDb and Rotten Tomatoes datasets.')
+    parser.add_argument('--join', choices=['outer', 'left'], default='outer',
+                        help="'left' keeps only IMDb titles instead of both catalogs")
+    args = parser.parse_args()
+
     script_directory = os.path.dirname(os.path.abspath(__file__))
-    data_preparer = DataPreparer(script_directory)
+    data_preparer = DataPreparer(script_directory, how=args.join)
     data_preparer.load_data()
     data_preparer.normalize_and_prepare_data()
     data_preparer.clean_and_save_data()
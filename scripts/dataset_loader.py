@@ -0,0 +1,76 @@
+import os
+import threading
+import pandas as pd
+from compact_table import compact_frame, compact_schema_for, dense
+from storage import file_digest, read_table
+from profiling import profiled
+
+# In-process cache shared by all analysis classes: one entry per dataset path holding the
+# columns parsed so far plus memoized NA-filtered views. Returned frames are shared, so
+# callers must treat them as read-only. Cached columns are kept in compact types (see
+# compact_table.py); views are handed out with sparse columns expanded.
+_cache = {}
+_lock = threading.Lock()
+
+
+class _Entry:
+    def __init__(self, stat, digest):
+        self.stat = stat
+        self.digest = digest
+        self.frame = None
+        self.complete = False
+        self.views = {}
+
+
+def _stat(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def _entry(path):
+    """Cache entry for path, invalidated when the file's content changes."""
+    stat = _stat(path)
+    entry = _cache.get(path)
+    if entry is not None and entry.stat != stat:
+        # mtime or size moved: only drop the parsed data if the content really changed
+        digest = file_digest(path)
+        if digest == entry.digest:
+            entry.stat = stat
+        else:
+            entry = None
+    if entry is None:
+        entry = _cache[path] = _Entry(stat, file_digest(path))
+    return entry
+
+
+@profiled
+def load_dataset(path, columns=None, dropna=None):
+    """Load only the requested columns of a dataset, parsing each column at most once.
+
+    dropna lists columns whose missing rows are dropped; the filtered view is
+    computed once and reused by every caller asking for the same columns.
+    """
+    with _lock:
+        entry = _entry(path)
+        if columns is None:
+            if not entry.complete:
+                entry.frame, entry.complete = compact_frame(read_table(path), compact_schema_for(path)), True
+                entry.views.clear()
+            columns = list(entry.frame.columns)
+        missing = [column for column in columns if entry.frame is None or column not in entry.frame]
+        if missing:
+            # Parse only the columns not seen before and add them to the cached frame
+            new = compact_frame(read_table(path, columns=missing), compact_schema_for(path))
+            entry.frame = new if entry.frame is None else pd.concat([entry.frame, new[missing]], axis=1)
+            entry.views.clear()
+        key = (tuple(columns), tuple(dropna or ()))
+        if key not in entry.views:
+            view = entry.frame[list(columns)]
+            entry.views[key] = dense(view.dropna(subset=list(dropna)) if dropna else view)
+        return entry.views[key]
+
+
+def clear_cache():
+    """Forget every cached dataset."""
+    with _lock:
+        _cache.clear()
@@ -1,8 +1,16 @@
 import os
+import argparse
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
+from dataset_loader import load_dataset
+from distributions import Distribution, plot_ecdf, plot_histogram, plot_violins
+from figures import show_figure
+from storage import table_filename
+from rating_stats import RatingStats
+from profiling import profiled_class
 
+RATING_COLUMNS = ['IMDB_Rating', 'Meta_score', 'tomatometer_rating', 'audience_rating']
+
+@profiled_class
 class DataAnalysis:
     def __init__(self, filename):
         # Define the data directory relative to the script location
@@ -11,50 +19,62 @@ class DataAnalysis:
         self.data_path = os.path.join(data_dir, filename)
 
     def load_data(self):
-        """ Load data from a CSV file """
-        return pd.read_csv(self.data_path)
+        """ Load the rating columns through the shared dataset loader """
+        return load_dataset(self.data_path, columns=['Released_Year', 'IMDB_Rating', 'Meta_score',
+                                                     'tomatometer_rating', 'audience_rating'])
+
+    def summarize(self, data, columns=RATING_COLUMNS):
+        """ Binned summaries of the rating columns (see distributions.py) the distribution plots draw from """
+        return {column: Distribution.of(data[column]) for column in columns}
 
     def plot_histograms(self, data):
         """ Plot histograms with KDE for all ratings """
+        import matplotlib.pyplot as plt
+        summaries = self.summarize(data)
         fig, axes = plt.subplots(2, 2, figsize=(14, 10))
-        sns.histplot(data['IMDB_Rating'], kde=True, color='blue', bins=20, ax=axes[0, 0])
+        plot_histogram(summaries['IMDB_Rating'], color='blue', bins=20, ax=axes[0, 0])
         axes[0, 0].set_title('Histogram of IMDb Ratings')
-        sns.histplot(data['Meta_score'], kde=True, color='green', bins=20, ax=axes[0, 1])
+        plot_histogram(summaries['Meta_score'], color='green', bins=20, ax=axes[0, 1])
         axes[0, 1].set_title('Histogram of IMDb Meta Scores')
-        sns.histplot(data['tomatometer_rating'], kde=True, color='red', bins=20, ax=axes[1, 0])
+        plot_histogram(summaries['tomatometer_rating'], color='red', bins=20, ax=axes[1, 0])
         axes[1, 0].set_title('Histogram of Tomatometer Ratings')
-        sns.histplot(data['audience_rating'], kde=True, color='orange', bins=20, ax=axes[1, 1])
+        plot_histogram(summaries['audience_rating'], color='orange', bins=20, ax=axes[1, 1])
         axes[1, 1].set_title('Histogram of Audience Ratings')
         plt.tight_layout()
-        plt.show()
+        show_figure('histogram')
 
     def plot_cdf(self, data):
         """ Plot CDF for all types of ratings """
+        import matplotlib.pyplot as plt
+        summaries = self.summarize(data)
         plt.figure(figsize=(14, 7))
-        sns.ecdfplot(data['IMDB_Rating'], label='IMDb Rating', color='blue')
-        sns.ecdfplot(data['Meta_score'], label='Meta Score', color='green')
-        sns.ecdfplot(data['tomatometer_rating'], label='Tomatometer Rating', color='red')
-        sns.ecdfplot(data['audience_rating'], label='Audience Rating', color='orange')
+        plot_ecdf(summaries['IMDB_Rating'], label='IMDb Rating', color='blue')
+        plot_ecdf(summaries['Meta_score'], label='Meta Score', color='green')
+        plot_ecdf(summaries['tomatometer_rating'], label='Tomatometer Rating', color='red')
+        plot_ecdf(summaries['audience_rating'], label='Audience Rating', color='orange')
         plt.title('CDF of All Ratings')
         plt.xlabel('Rating')
         plt.ylabel('Cumulative Probability')
         plt.legend()
-        plt.show()
+        show_figure('cdf')
 
     def plot_violin(self, data):
         """ Plot violin plots for all ratings """
+        import matplotlib.pyplot as plt
         plt.figure(figsize=(12, 6))
-        ratings_data = data[['IMDB_Rating', 'Meta_score', 'tomatometer_rating', 'audience_rating']].dropna()
-        sns.violinplot(data=ratings_data)
+        ratings_data = data[RATING_COLUMNS].dropna()
+        plot_violins(list(self.summarize(ratings_data).values()))
         plt.title('Violin Plots of All Ratings')
         plt.ylabel('Rating')
-        plt.show()
+        show_figure('violinplot')
 
     def plot_yearly_trends(self, data):
         """ Plot the yearly trends for all types of ratings """
+        import matplotlib.pyplot as plt
+        import seaborn as sns
         plt.figure(figsize=(14, 7))
-        data['Released_Year'] = pd.to_numeric(data['Released_Year'], errors='coerce')
-        yearly_data = data.groupby('Released_Year').agg({
+        released_year = pd.to_numeric(data['Released_Year'], errors='coerce')
+        yearly_data = data.groupby(released_year).agg({
             'IMDB_Rating': 'mean',
             'Meta_score': 'mean',
             'tomatometer_rating': 'mean',
@@ -65,38 +85,44 @@ class DataAnalysis:
         plt.xlabel('Year')
         plt.ylabel('Average Rating')
         plt.legend(['IMDb Rating', 'Meta Score', 'Tomatometer Rating', 'Audience Rating'])
-        plt.show()
+        show_figure('yearlytrends')
 
     def plot_pairwise_comparisons(self, data):
         """ Plot pairwise ratings comparisons for all combinations """
+        import matplotlib.pyplot as plt
+        import seaborn as sns
         fig, axes = plt.subplots(2, 3, figsize=(18, 10))
+        # Correlations of all six pairs, computed in one pass
+        correlation = RatingStats.from_frame(data).correlation()
 
         # IMDb Rating vs. Other Scores
         sns.scatterplot(x='IMDB_Rating', y='Meta_score', data=data, ax=axes[0, 0], alpha=0.6)
-        axes[0, 0].set_title('IMDb Ratings vs. Meta Scores')
+        axes[0, 0].set_title(f"IMDb Ratings vs. Meta Scores (r = {correlation.loc['IMDB_Rating', 'Meta_score']:.2f})")
 
         sns.scatterplot(x='IMDB_Rating', y='tomatometer_rating', data=data, ax=axes[0, 1], alpha=0.6)
-        axes[0, 1].set_title('IMDb Ratings vs. Tomatometer Ratings')
+        axes[0, 1].set_title(f"IMDb Ratings vs. Tomatometer Ratings (r = {correlation.loc['IMDB_Rating', 'tomatometer_rating']:.2f})")
 
         sns.scatterplot(x='IMDB_Rating', y='audience_rating', data=data, ax=axes[0, 2], alpha=0.6)
-        axes[0, 2].set_title('IMDb Ratings vs. Audience Ratings')
+        axes[0, 2].set_title(f"IMDb Ratings vs. Audience Ratings (r = {correlation.loc['IMDB_Rating', 'audience_rating']:.2f})")
 
         # Meta Score vs. Other Ratings
         sns.scatterplot(x='Meta_score', y='tomatometer_rating', data=data, ax=axes[1, 0], alpha=0.6)
-        axes[1, 0].set_title('Meta Scores vs. Tomatometer Ratings')
+        axes[1, 0].set_title(f"Meta Scores vs. Tomatometer Ratings (r = {correlation.loc['Meta_score', 'tomatometer_rating']:.2f})")
 
         sns.scatterplot(x='Meta_score', y='audience_rating', data=data, ax=axes[1, 1], alpha=0.6)
-        axes[1, 1].set_title('Meta Scores vs. Audience Ratings')
+        axes[1, 1].set_title(f"Meta Scores vs. Audience Ratings (r = {correlation.loc['Meta_score', 'audience_rating']:.2f})")
 
         # Tomatometer Rating vs. Audience Rating
         sns.scatterplot(x='tomatometer_rating', y='audience_rating', data=data, ax=axes[1, 2], alpha=0.6)
-        axes[1, 2].set_title('Tomatometer Ratings vs. Audience Ratings')
+        axes[1, 2].set_title(f"Tomatometer Ratings vs. Audience Ratings (r = {correlation.loc['tomatometer_rating', 'audience_rating']:.2f})")
 
         plt.tight_layout()
-        plt.show()
+        show_figure('pairwise')
 
 def main():
-    analysis = DataAnalysis('cleaned_combined_data.csv')
+    argparse.ArgumentParser(description='Distributions, trends and pairwise comparisons of all ratings.').parse_args()
+
+    analysis = DataAnalysis(table_filename('cleaned_combined_data'))
     data = analysis.load_data()
     analysis.plot_histograms(data)
     analysis.plot_cdf(data)
@@ -0,0 +1,224 @@
+import os
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from storage import read_table_chunks
+from profiling import profiled
+
+# Distribution summaries for the histogram, KDE, ECDF and violin figures. A Distribution
+# counts a variable on a fixed fine grid in one vectorized pass (np.bincount) and keeps its
+# exact count, sum, sum of squares and extremes; summaries of chunks merge by addition. The
+# figures are drawn from the summaries: histograms rebin the grid, KDEs are the grid counts
+# convolved with a Gaussian by FFT, ECDFs are cumulative counts and violins combine the
+# KDE with grid quantiles. Cost is linear in the rows plus O(grid log grid) per curve,
+# instead of seaborn's kernel evaluated at every row. Grid-based results are exact to
+# within one grid cell: (high - low) / GRID_BINS.
+GRID_BINS = 2048
+# Value range of each variable; values outside are counted in the edge cells
+VALUE_RANGES = {
+    'IMDB_Rating': (0, 100), 'Meta_score': (0, 100), 'tomatometer_rating': (0, 100),
+    'audience_rating': (0, 100), 'Polarity': (-1, 1), 'Rating': (0, 10),
+}
+# Kernel support in bandwidths, and how far violins extend past the extremes (seaborn's cut)
+KERNEL_REACH = 4
+VIOLIN_CUT = 2
+
+
+class Distribution:
+    """Counts of one variable on a fixed grid, with its exact count, moments and extremes."""
+
+    def __init__(self, low, high, bins=GRID_BINS, name=None):
+        self.low, self.high, self.bins, self.name = float(low), float(high), bins, name
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.n = self.missing = 0
+        self.total = self.total_sq = 0.0
+        self.min, self.max = np.inf, -np.inf
+
+    @classmethod
+    def of(cls, values, low=None, high=None, bins=GRID_BINS, name=None):
+        """Summary of values, on the range VALUE_RANGES gives for its name unless low/high are given."""
+        name = name if name is not None else getattr(values, 'name', None)
+        if low is None or high is None:
+            low, high = VALUE_RANGES[name]
+        return cls(low, high, bins, name).add(values)
+
+    @property
+    def width(self):
+        return (self.high - self.low) / self.bins
+
+    @property
+    def centers(self):
+        return self.low + (np.arange(self.bins) + 0.5) * self.width
+
+    def add(self, values):
+        """Count a chunk of values; missing values are only counted as missing."""
+        values = pd.to_numeric(pd.Series(values), errors='coerce').to_numpy(dtype=float)
+        present = values[~np.isnan(values)]
+        self.missing += len(values) - len(present)
+        if len(present):
+            cells = np.clip(((present - self.low) / self.width).astype(np.int64), 0, self.bins - 1)
+            self.counts += np.bincount(cells, minlength=self.bins)
+            self.n += len(present)
+            self.total += float(present.sum())
+            self.total_sq += float((present ** 2).sum())
+            self.min, self.max = min(self.min, present.min()), max(self.max, present.max())
+        return self
+
+    def merge(self, other):
+        """Add another summary on the same grid, e.g. of another chunk."""
+        if (self.low, self.high, self.bins) != (other.low, other.high, other.bins):
+            raise ValueError("Distributions on different grids cannot be merged.")
+        self.counts += other.counts
+        self.n += other.n
+        self.missing += other.missing
+        self.total += other.total
+        self.total_sq += other.total_sq
+        self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+        return self
+
+    def mean(self):
+        return self.total / self.n if self.n else float('nan')
+
+    def std(self):
+        """Sample standard deviation (ddof=1)."""
+        if self.n < 2:
+            return float('nan')
+        return max((self.total_sq - self.total ** 2 / self.n) / (self.n - 1), 0.0) ** 0.5
+
+    def histogram(self, bins=20):
+        """(edges, counts) of `bins` equal bins from the minimum to the maximum, like numpy/seaborn."""
+        edges = np.linspace(self.min, self.max, bins + 1) if self.n else np.linspace(self.low, self.high, bins + 1)
+        # Cells are assigned by their center, kept inside the data range
+        centers = np.clip(self.centers, edges[0], edges[-1])
+        counts, _ = np.histogram(centers, bins=edges, weights=self.counts)
+        return edges, counts
+
+    def bandwidth(self, adjust=1.0):
+        """Gaussian kernel bandwidth by Scott's rule, as scipy's gaussian_kde (and seaborn) use."""
+        return self.std() * self.n ** (-1 / 5) * adjust if self.n > 1 else 0.0
+
+    def kde(self, bandwidth=None):
+        """Gaussian kernel density at the grid centers, by FFT convolution of the grid counts."""
+        if not self.n:
+            return np.zeros(self.bins)
+        bandwidth = self.bandwidth() if bandwidth is None else bandwidth
+        if not bandwidth > 0:
+            # A constant variable: no spread to smooth over
+            return self.counts / (self.n * self.width)
+        reach = min(self.bins, int(np.ceil(KERNEL_REACH * bandwidth / self.width)))
+        offsets = np.arange(-reach, reach + 1) * self.width
+        kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2) / (bandwidth * np.sqrt(2 * np.pi))
+        size = 1 << (self.bins + 2 * reach).bit_length()
+        smoothed = np.fft.irfft(np.fft.rfft(self.counts, size) * np.fft.rfft(kernel, size), size)
+        return np.clip(smoothed[reach:reach + self.bins], 0, None) / self.n
+
+    def ecdf(self):
+        """(values, cumulative proportions) at the occupied grid cells, starting at (minimum, 0)."""
+        occupied = np.flatnonzero(self.counts)
+        values = np.clip(self.centers[occupied], self.min, self.max)
+        proportions = np.cumsum(self.counts[occupied]) / self.n
+        return np.r_[values[:1], values], np.r_[0.0, proportions]
+
+    def quantile(self, q):
+        """Quantile(s) from the cumulative grid counts, interpolated within a cell."""
+        q = np.asarray(q, dtype=float)
+        cumulative = np.cumsum(self.counts)
+        target = q * self.n
+        cell = np.clip(np.searchsorted(cumulative, target), 0, self.bins - 1)
+        before = np.where(cell > 0, cumulative[cell - 1], 0)
+        within = (target - before) / np.maximum(self.counts[cell], 1)
+        return np.clip(self.low + (cell + within) * self.width, self.min, self.max)
+
+
+def summarize(chunks, columns, bins=GRID_BINS):
+    """Distributions of columns over an iterable of DataFrame chunks, merged as they arrive."""
+    summaries = {column: Distribution(*VALUE_RANGES[column], bins=bins, name=column) for column in columns}
+    for chunk in chunks:
+        for column, summary in summaries.items():
+            summary.add(chunk[column])
+    return summaries
+
+
+@profiled(rows=lambda summaries: sum(summary.n + summary.missing for summary in summaries.values()) // max(len(summaries), 1))
+def summarize_table(path, columns, chunk_size=100000, bins=GRID_BINS):
+    """Distributions of columns of a dataset, read chunk by chunk."""
+    return summarize(read_table_chunks(path, columns=columns, chunk_size=chunk_size), columns, bins)
+
+
+def plot_histogram(summary, ax=None, bins=20, kde=True, color=None, label=None):
+    """Histogram of a summary with its KDE scaled to counts (seaborn's histplot(kde=True) look)."""
+    import matplotlib.pyplot as plt
+    ax = ax or plt.gca()
+    color = color or 'C0'
+    edges, counts = summary.histogram(bins)
+    ax.bar(edges[:-1], counts, width=np.diff(edges), align='edge', color=color, alpha=0.5, edgecolor=color,
+           label=label)
+    if kde and summary.n:
+        inside = (summary.centers >= summary.min) & (summary.centers <= summary.max)
+        x = np.clip(summary.centers[inside], summary.min, summary.max)
+        ax.plot(x, summary.kde()[inside] * summary.n * (edges[1] - edges[0]), color=color)
+    ax.set_xlabel(summary.name or '')
+    ax.set_ylabel('Count')
+    return ax
+
+
+def plot_ecdf(summary, ax=None, color=None, label=None):
+    """Empirical CDF of a summary as a step line."""
+    import matplotlib.pyplot as plt
+    ax = ax or plt.gca()
+    values, proportions = summary.ecdf()
+    ax.step(values, proportions, where='post', color=color, label=label)
+    ax.set_ylabel('Proportion')
+    return ax
+
+
+def plot_violins(summaries, ax=None, width=0.8):
+    """Violins of several summaries side by side: KDE outline (cut at VIOLIN_CUT bandwidths past
+    the extremes) with the quartile box, 1.5 IQR whiskers and median; equal areas, as seaborn."""
+    import matplotlib.pyplot as plt
+    ax = ax or plt.gca()
+    shapes = []
+    for summary in summaries:
+        bandwidth = summary.bandwidth()
+        keep = ((summary.centers >= summary.min - VIOLIN_CUT * bandwidth) &
+                (summary.centers <= summary.max + VIOLIN_CUT * bandwidth))
+        shapes.append((summary.centers[keep], summary.kde(bandwidth)[keep]))
+    peak = max((density.max() for _, density in shapes if len(density)), default=1.0) or 1.0
+    for position, (summary, (y, density)) in enumerate(zip(summaries, shapes)):
+        half = density / peak * width / 2
+        ax.fill_betweenx(y, position - half, position + half, color=f'C{position}', alpha=0.8, edgecolor='0.25')
+        q1, median, q3 = summary.quantile([0.25, 0.5, 0.75])
+        low, high = max(summary.min, q1 - 1.5 * (q3 - q1)), min(summary.max, q3 + 1.5 * (q3 - q1))
+        ax.plot([position, position], [low, high], color='0.25', linewidth=1.5)
+        ax.plot([position, position], [q1, q3], color='0.25', linewidth=5)
+        ax.scatter([position], [median], color='white', s=12, zorder=3)
+    ax.set_xticks(range(len(summaries)), [summary.name or '' for summary in summaries])
+    return ax
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Binned distribution summaries of dataset columns.')
+    parser.add_argument('path', help='dataset (CSV, Parquet or Feather)')
+    parser.add_argument('columns', nargs='+', choices=list(VALUE_RANGES), metavar='column',
+                        help=f"columns to summarize ({', '.join(VALUE_RANGES)})")
+    parser.add_argument('--chunk-size', type=int, default=100000, help='rows read per chunk')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    summaries = summarize_table(args.path, args.columns, args.chunk_size)
+    elapsed = time.perf_counter() - start
+    rows = []
+    for column, summary in summaries.items():
+        q1, median, q3 = summary.quantile([0.25, 0.5, 0.75])
+        rows.append({'column': column, 'count': summary.n, 'missing': summary.missing, 'mean': summary.mean(),
+                     'std': summary.std(), 'min': summary.min, 'q1': q1, 'median': median, 'q3': q3,
+                     'max': summary.max, 'bandwidth': summary.bandwidth()})
+    pd.set_option('display.width', 160)
+    print(pd.DataFrame(rows).set_index('column').round(4))
+    print(f"\nSummarized in {elapsed:.2f}s ({GRID_BINS}-cell grid, cell width "
+          f"{', '.join(f'{summary.width:.4g}' for summary in summaries.values())})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+from profiling import profiled
+
+# When this environment variable names a directory, show_figure() saves figures there
+# instead of opening a window. `python figures.py` sets it to render every figure in batch.
+OUTPUT_DIR_VARIABLE = 'MOVIE_PLOTS_DIR'
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PLOTS_DIR = os.path.normpath(os.path.join(SCRIPT_DIR, '../plots'))
+MANIFEST_NAME = '.render_manifest.json'
+
+
+def show_figure(name):
+    """Show the current figure, or save it as <name>.png when rendering to a directory."""
+    import matplotlib.pyplot as plt
+    output_dir = os.environ.get(OUTPUT_DIR_VARIABLE)
+    if not output_dir:
+        plt.show()
+        return
+    os.makedirs(output_dir, exist_ok=True)
+    plt.savefig(os.path.join(output_dir, name + '.png'))
+    plt.close('all')
+
+
+# Loaders return (data, draw): the data a figure is drawn from, hashed to decide whether
+# the figure is stale, and a callable drawing it. They run inside the worker processes.
+def _combined_data_path():
+    from storage import table_filename
+    return table_filename('cleaned_combined_data')
+
+
+def load_descriptive(method):
+    from descriptive_analysis import DataAnalysis
+    analysis = DataAnalysis(_combined_data_path())
+    data = analysis.load_data()
+    return data, partial(getattr(analysis, method), data)
+
+
+def load_comparative(method):
+    from comparative_analysis import ComparativeAnalysis
+    analysis = ComparativeAnalysis(_combined_data_path())
+    analysis.load_data()
+    return analysis.data, getattr(analysis, method)
+
+
+def load_revenue(method, color):
+    from revenue_analysis import RevenueAnalysis
+    analysis = RevenueAnalysis(_combined_data_path())
+    analysis.load_data()
+    return analysis.data, partial(getattr(analysis, method), color=color)
+
+
+def load_profitability():
+    from contentRating_Profitability import ContentRatingProfitability
+    analysis = ContentRatingProfitability(_combined_data_path())
+    analysis.load_data()
+    profitability = analysis.categorize_and_analyze()
+    return profitability, partial(analysis.plot_profitability, profitability)
+
+
+def load_sentiment(filename, title):
+    import sentiment_analysis as sa
+    reviews = sa.read_review_file(sa.data_dir, filename)
+
+    def draw():
+        from polarity_cache import PolarityCache, default_cache_path
+        from polarity_engine import analyzer_version
+        cache = PolarityCache(default_cache_path(sa.data_dir), analyzer_version())
+        scored = sa.analyze_sentiment_textblob(reviews.copy(), cache=cache)
+        cache.close()
+        suffix = sa.figure_suffixes.get(filename, '')
+        sa.visualize_sentiment_analysis(scored, title, suffix)
+        sa.plot_sentiment_vs_ratings(scored, title, suffix)
+    return reviews, draw
+
+
+class FigureJob:
+    """Independent unit of rendering: one loader call producing one or more figures."""
+
+    def __init__(self, name, outputs, loader, args=(), sources=()):
+        self.name = name
+        self.outputs = outputs
+        self.loader = loader
+        self.args = args
+        # Scripts whose code draws the figures; editing them re-renders the job
+        self.sources = [os.path.join(SCRIPT_DIR, source) for source in sources]
+
+
+def figure_jobs():
+    """Every figure of the project, grouped by the method that draws it."""
+    jobs = [
+        FigureJob('histogram', ['histogram'], load_descriptive, ('plot_histograms',), ['descriptive_analysis.py']),
+        FigureJob('cdf', ['cdf'], load_descriptive, ('plot_cdf',), ['descriptive_analysis.py']),
+        FigureJob('violinplot', ['violinplot'], load_descriptive, ('plot_violin',), ['descriptive_analysis.py']),
+        FigureJob('yearlytrends', ['yearlytrends'], load_descriptive, ('plot_yearly_trends',), ['descriptive_analysis.py']),
+        FigureJob('pairwise', ['pairwise'], load_descriptive, ('plot_pairwise_comparisons',),
+                  ['descriptive_analysis.py', 'rating_stats.py']),
+        FigureJob('ratingcomparison', ['ratingcomparison'], load_comparative, ('plot_average_ratings',),
+                  ['comparative_analysis.py']),
+        FigureJob('statistical_tests', ['errorbars', 'correlations'], load_comparative, ('perform_statistical_tests',),
+                  ['comparative_analysis.py', 'rating_stats.py']),
+        FigureJob('revenue', ['revenue'], load_revenue,
+                  ('plot_correlations_with_regression', 'green'), ['revenue_analysis.py']),
+        FigureJob('residual', ['residual'], load_revenue, ('perform_and_plot_regression', 'orange'), ['revenue_analysis.py']),
+        FigureJob('grossrevenue', ['grossrevenue'], load_profitability, (), ['contentRating_Profitability.py']),
+    ]
+    from sentiment_analysis import figure_suffixes, file_paths_and_titles
+    for filename, title in file_paths_and_titles:
+        suffix = figure_suffixes.get(filename, '')
+        jobs.append(FigureJob(f'sentiment{suffix}', [f'sentiment{suffix}', f'sentimentscore{suffix}',
+                                                     f'sentimentvsrating{suffix}'],
+                              load_sentiment, (filename, title), ['sentiment_analysis.py', 'polarity_engine.py']))
+    return jobs
+
+
+def data_hash(data, sources):
+    """Hash of a figure's input data (values, index and column names) and of the code drawing it."""
+    import pandas as pd
+    from storage import file_digest
+    h = hashlib.blake2b(digest_size=16)
+    h.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+    columns = list(data.columns) if isinstance(data, pd.DataFrame) else [data.name]
+    h.update(repr(columns).encode('utf-8'))
+    for source in sources:
+        h.update(file_digest(source).encode('ascii'))
+    return h.hexdigest()
+
+
+@profiled
+def render_job(job, output_dir, previous_hash=None):
+    """Render one job unless its data hash matches the last render; returns (status, hash, seconds)."""
+    import matplotlib
+    matplotlib.use('Agg')
+    os.environ[OUTPUT_DIR_VARIABLE] = output_dir
+    start = time.perf_counter()
+    data, draw = job.loader(*job.args)
+    digest = data_hash(data, job.sources)
+    outputs_exist = all(os.path.exists(os.path.join(output_dir, name + '.png')) for name in job.outputs)
+    if digest == previous_hash and outputs_exist:
+        return 'up to date', digest, time.perf_counter() - start
+    draw()
+    return 'rendered', digest, time.perf_counter() - start
+
+
+def render_figures(output_dir=PLOTS_DIR, workers=None, force=False, names=None):
+    """Render stale figures in parallel worker processes; returns {job name: (status, seconds)}."""
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    jobs = [job for job in figure_jobs() if not names or job.name in names]
+    previous = [None if force else manifest.get(job.name) for job in jobs]
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(render_job, job, output_dir, digest) for job, digest in zip(jobs, previous)]
+        for job, future in zip(jobs, futures):
+            try:
+                status, digest, seconds = future.result()
+                manifest[job.name] = digest
+                results[job.name] = (status, seconds)
+            except Exception as e:
+                results[job.name] = ('failed', 0.0)
+                print(f"[{job.name}] failed: {e!r}")
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Render every figure to PNG files without opening windows.')
+    parser.add_argument('names', nargs='*', help='figure jobs to render (default: all)')
+    parser.add_argument('--output-dir', default=PLOTS_DIR, help='directory the PNG files are written to')
+    parser.add_argument('--workers', type=int, default=None, help='figures rendered in parallel (default: CPU cores)')
+    parser.add_argument('--force', action='store_true', help='re-render figures whose data has not changed')
+    args = parser.parse_args()
+
+    # Workers inherit the non-interactive backend
+    os.environ['MPLBACKEND'] = 'Agg'
+    start = time.perf_counter()
+    results = render_figures(os.path.abspath(args.output_dir), args.workers, args.force, args.names)
+    for name, (status, seconds) in results.items():
+        print(f"{name:<20} {status:<12} {seconds:>7.2f}s")
+    rendered = sum(status == 'rendered' for status, _ in results.values())
+    print(f"{rendered} of {len(results)} figure jobs rendered in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+import os
+import ast
+import sys
+import json
+import time
+import argparse
+import importlib
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from figures import OUTPUT_DIR_VARIABLE, PLOTS_DIR, figure_jobs
+from storage import file_digest, table_path
+from profiling import MODES, clear_traces, enable, merge_traces, print_summary as print_profile, profiled
+
+# Define the data directory relative to the script location
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.normpath(os.path.join(SCRIPT_DIR, '../data'))
+STATE_PATH = os.path.join(DATA_DIR, '.pipeline_state.json')
+
+# Analysis stages that only read the combined dataset; they run in parallel after 'prepare'
+ANALYSES = [
+    ('describe', 'descriptive_analysis'),
+    ('compare', 'comparative_analysis'),
+    ('revenue', 'revenue_analysis'),
+    ('profitability', 'contentRating_Profitability'),
+]
+
+
+class Stage:
+    """A pipeline step: a module-level function plus the files it reads and writes."""
+
+    def __init__(self, name, func, inputs, outputs=(), args=()):
+        self.name = name
+        self.func = func
+        self.inputs = [os.path.normpath(path) for path in inputs]
+        self.outputs = [os.path.normpath(path) for path in outputs]
+        self.args = args
+
+
+class FingerprintStore:
+    """Content fingerprints of stage inputs and outputs from the last successful run."""
+
+    def __init__(self, path=STATE_PATH):
+        self.path = path
+        state = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                state = json.load(f)
+        self.files = state.get('files', {})
+        self.stages = state.get('stages', {})
+
+    def digest(self, path):
+        """Content hash of a file; only re-hashed when its mtime or size changed."""
+        st = os.stat(path)
+        cached = self.files.get(path)
+        if cached and cached[:2] == [st.st_mtime_ns, st.st_size]:
+            return cached[2]
+        digest = file_digest(path)
+        self.files[path] = [st.st_mtime_ns, st.st_size, digest]
+        return digest
+
+    def fingerprint(self, paths):
+        return {path: self.digest(path) if os.path.exists(path) else None for path in paths}
+
+    def is_fresh(self, stage):
+        """True if the inputs are unchanged and the outputs are still the ones we wrote."""
+        record = self.stages.get(stage.name)
+        return (record is not None
+                and record['inputs'] == self.fingerprint(stage.inputs)
+                and record['outputs'] == self.fingerprint(stage.outputs))
+
+    def record(self, stage):
+        self.stages[stage.name] = {'inputs': self.fingerprint(stage.inputs),
+                                   'outputs': self.fingerprint(stage.outputs)}
+
+    def save(self):
+        with open(self.path, 'w') as f:
+            json.dump({'files': self.files, 'stages': self.stages}, f, indent=1)
+
+
+# Stage functions run in worker processes, so each imports what it needs.
+@profiled
+def run_clean_dataset(file_path):
+    import data_cleaning
+    data_cleaning.clean_dataset(file_path)
+
+
+@profiled
+def run_clean_reviews(input_path, output_path):
+    from data_cleaning_reviews import clean_review_file
+    rows = clean_review_file(input_path, output_path)
+    print(f"{os.path.basename(output_path)}: {rows} entries.")
+
+
+@profiled
+def run_prepare():
+    from data_prepration import DataPreparer
+    data_preparer = DataPreparer(SCRIPT_DIR)
+    data_preparer.load_data()
+    data_preparer.normalize_and_prepare_data()
+    data_preparer.clean_and_save_data()
+
+
+@profiled
+def run_analysis(module_name):
+    # The analysis parses its own (empty) command line, not the pipeline's
+    sys.argv = [module_name + '.py']
+    importlib.import_module(module_name).main()
+
+
+@profiled
+def run_sentiment():
+    import sentiment_analysis as sa
+    from polarity_cache import PolarityCache, default_cache_path
+    from polarity_engine import analyzer_version
+    cache = PolarityCache(default_cache_path(sa.data_dir), analyzer_version())
+    for filename, title in sa.file_paths_and_titles:
+        sa.process_movie_reviews(sa.data_dir, filename, title, cache=cache)
+    cache.close()
+
+
+def _timed(func, args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+def module_sources(*modules):
+    """Script files of the modules and of every project module they import, directly or not.
+
+    The modules' own imports inside functions count too; of the helpers they import only the
+    module-level imports are followed (figures.py, for one, lazily imports every analysis).
+    """
+    sources, queue = set(), [(module, True) for module in modules]
+    while queue:
+        module, entry = queue.pop()
+        path = os.path.join(SCRIPT_DIR, module + '.py')
+        if path in sources or not os.path.exists(path):
+            continue
+        sources.add(path)
+        with open(path, encoding='utf-8') as f:
+            tree = ast.parse(f.read(), path)
+        imported = []
+        for node in (ast.walk(tree) if entry else tree.body):
+            if isinstance(node, ast.Import):
+                imported.extend(alias.name.split('.')[0] for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                imported.append(node.module.split('.')[0])
+        queue.extend((name, False) for name in imported)
+    return sorted(sources)
+
+
+def figure_outputs(module):
+    """PNG files the module's figures are saved to (see figures.figure_jobs)."""
+    output_dir = os.environ.get(OUTPUT_DIR_VARIABLE) or PLOTS_DIR
+    return [os.path.join(output_dir, name + '.png') for job in figure_jobs()
+            if os.path.basename(job.sources[0]) == module + '.py' for name in job.outputs]
+
+
+def build_stages(data_dir=DATA_DIR):
+    """Declare every stage of the project with its inputs and outputs."""
+    from data_cleaning_reviews import find_review_files
+    from sentiment_analysis import file_paths_and_titles
+
+    cleaned_imdb = table_path(data_dir, 'cleaned_imdb_top_1000')
+    cleaned_rt = table_path(data_dir, 'cleaned_rotten_tomatoes_movies_1')
+    combined = table_path(data_dir, 'cleaned_combined_data')
+    stages = [
+        Stage('clean_imdb', run_clean_dataset, [os.path.join(data_dir, 'imdb_top_1000.csv')]
+              + module_sources('data_cleaning'),
+              [cleaned_imdb], args=(os.path.join(data_dir, 'imdb_top_1000.csv'),)),
+        Stage('clean_rt', run_clean_dataset, [os.path.join(data_dir, 'rotten_tomatoes_movies_1.csv')]
+              + module_sources('data_cleaning'),
+              [cleaned_rt], args=(os.path.join(data_dir, 'rotten_tomatoes_movies_1.csv'),)),
+    ]
+    # One stage per review file, so a change to one file only re-cleans that file
+    cleaned_reviews = []
+    for path in find_review_files(data_dir):
+        stem = os.path.splitext(os.path.basename(path))[0]
+        output = table_path(data_dir, 'cleaned_' + stem)
+        cleaned_reviews.append(output)
+        stages.append(Stage(f'clean_reviews:{stem}', run_clean_reviews,
+                            [path] + module_sources('data_cleaning_reviews'), [output],
+                            args=(path, output)))
+    stages.append(Stage('prepare', run_prepare, [cleaned_imdb, cleaned_rt] + module_sources('data_prepration'),
+                        [combined]))
+    # Analyses and sentiment list every project module they import, and their figures as outputs
+    for name, module in ANALYSES:
+        stages.append(Stage(name, run_analysis, [combined] + module_sources(module), figure_outputs(module),
+                            args=(module,)))
+    sentiment_inputs = [table_path(data_dir, os.path.splitext(filename)[0]) for filename, _ in file_paths_and_titles]
+    stages.append(Stage('sentiment', run_sentiment,
+                        sentiment_inputs + module_sources('sentiment_analysis', 'polarity_cache', 'polarity_engine'),
+                        figure_outputs('sentiment_analysis')))
+    return stages
+
+
+def run_pipeline(stages, workers=None, force=False, store=None):
+    """Run stale stages in dependency order, independent ones in parallel; returns per-stage results."""
+    store = store or FingerprintStore()
+    producers = {output: stage.name for stage in stages for output in stage.outputs}
+    depends_on = {stage.name: {producers[path] for path in stage.inputs if path in producers} for stage in stages}
+    results = {}
+    pending = list(stages)
+    running = {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        while pending or running:
+            for stage in list(pending):
+                if not depends_on[stage.name] <= results.keys():
+                    continue
+                pending.remove(stage)
+                failed = [dep for dep in depends_on[stage.name] if results[dep][0] == 'failed']
+                missing = [path for path in stage.inputs if not os.path.exists(path)]
+                if failed:
+                    results[stage.name] = ('blocked', 0.0)
+                elif missing:
+                    results[stage.name] = ('missing input', 0.0)
+                    print(f"[{stage.name}] skipped, missing: {', '.join(map(os.path.basename, missing))}")
+                elif not force and store.is_fresh(stage):
+                    results[stage.name] = ('up to date', 0.0)
+                else:
+                    running[pool.submit(_timed, stage.func, stage.args)] = stage
+            if not running:
+                continue
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                stage = running.pop(future)
+                try:
+                    results[stage.name] = ('ran', future.result())
+                    store.record(stage)
+                except Exception as e:
+                    results[stage.name] = ('failed', 0.0)
+                    print(f"[{stage.name}] failed: {e!r}")
+            store.save()
+    return {stage.name: results[stage.name] for stage in stages}
+
+
+def print_summary(results, elapsed):
+    """Per-stage timing summary."""
+    print(f"\n{'Stage':<40} {'Status':<14} {'Time (s)':>9}")
+    for name, (status, seconds) in results.items():
+        print(f"{name:<40} {status:<14} {seconds:>9.2f}")
+    ran = sum(status == 'ran' for status, _ in results.values())
+    print(f"{ran} of {len(results)} stages ran, total wall time {elapsed:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the project pipeline, rebuilding only stale stages.')
+    parser.add_argument('--workers', type=int, default=None, help='stages run in parallel (default: CPU cores)')
+    parser.add_argument('--force', action='store_true', help='run every stage even if its inputs are unchanged')
+    parser.add_argument('--profile', choices=MODES, default=None,
+                        help='record a per-stage trace (and cProfile dumps) in profiles/')
+    args = parser.parse_args()
+
+    # Figures are rendered off-screen and saved to plots/ so stages can run unattended and in parallel
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+    os.environ.setdefault(OUTPUT_DIR_VARIABLE, PLOTS_DIR)
+    start = time.perf_counter()
+    if args.profile:
+        # Set before the pool starts, so every stage's worker records its own trace
+        profile_dir = enable(args.profile)
+        clear_traces(profile_dir)
+    results = run_pipeline(build_stages(), workers=args.workers, force=args.force)
+    print_summary(results, time.perf_counter() - start)
+    if args.profile:
+        path, events = merge_traces(profile_dir)
+        print()
+        print_profile(events)
+        print(f"\nTrace written to {path}")
+
+
+if __name__ == "__main__":
+    main()
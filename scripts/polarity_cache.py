@@ -0,0 +1,114 @@
+import hashlib
+import os
+import sqlite3
+import numpy as np
+
+# Default cap on cached reviews; least recently used entries are evicted beyond it.
+DEFAULT_MAX_ENTRIES = 1_000_000
+# SQLite limits the number of parameters per statement, so keys are queried in batches.
+BATCH_SIZE = 500
+
+
+def version_family(version):
+    """Scoring method of an analyzer version, e.g. 'batch-1' -> 'batch', 'textblob-0.18.0' -> 'textblob'."""
+    return version.split('-', 1)[0]
+
+
+class PolarityCache:
+    """On-disk polarity cache keyed by a hash of the review text and the analyzer version."""
+
+    def __init__(self, path, version, max_entries=DEFAULT_MAX_ENTRIES):
+        self.path = path
+        self.version = version
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS polarity '
+                                '(key BLOB PRIMARY KEY, polarity REAL, version TEXT, last_used INTEGER)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS polarity_last_used ON polarity (last_used)')
+        self.invalidate()
+        self.clock = self.connection.execute('SELECT COALESCE(MAX(last_used), 0) FROM polarity').fetchone()[0]
+
+    def key(self, text):
+        """Content hash of a review together with the analyzer version, so the scores of
+        different methods (e.g. batch and textblob) live side by side in one cache file."""
+        return hashlib.blake2b(f'{self.version}\0{text}'.encode('utf-8'), digest_size=16).digest()
+
+    def invalidate(self):
+        """Drop entries of out-of-date versions of this scoring method; other methods keep theirs."""
+        family = version_family(self.version)
+        removed = self.connection.execute(
+            "SELECT version FROM polarity WHERE version != ? GROUP BY version", (self.version,)).fetchall()
+        stale = [version for (version,) in removed if version_family(version) == family]
+        count = 0
+        for version in stale:
+            count += self.connection.execute('DELETE FROM polarity WHERE version = ?', (version,)).rowcount
+        self.connection.commit()
+        if count:
+            print(f"Invalidated {count} cached scores from older {family} versions.")
+
+    def get_many(self, texts):
+        """Look up many reviews at once; returns scores with NaN for misses."""
+        keys = [self.key(text) for text in texts]
+        found = {}
+        for i in range(0, len(keys), BATCH_SIZE):
+            batch = keys[i:i + BATCH_SIZE]
+            placeholders = ','.join('?' * len(batch))
+            found.update(self.connection.execute(
+                f'SELECT key, polarity FROM polarity WHERE key IN ({placeholders})', batch))
+        if found:
+            self.clock += 1
+            self.connection.executemany('UPDATE polarity SET last_used = ? WHERE key = ?',
+                                        ((self.clock, key) for key in found))
+            self.connection.commit()
+        scores = np.array([found.get(key, np.nan) for key in keys], dtype=float)
+        hits = int((~np.isnan(scores)).sum())
+        self.hits += hits
+        self.misses += len(keys) - hits
+        return scores
+
+    def put_many(self, texts, scores):
+        """Insert many scores at once, then evict the least recently used beyond the size cap."""
+        self.clock += 1
+        self.connection.executemany(
+            'INSERT OR REPLACE INTO polarity (key, polarity, version, last_used) VALUES (?, ?, ?, ?)',
+            ((self.key(text), float(score), self.version, self.clock) for text, score in zip(texts, scores)))
+        self.evict()
+        self.connection.commit()
+
+    def evict(self):
+        """Remove least recently used entries beyond max_entries."""
+        excess = len(self) - self.max_entries
+        if excess > 0:
+            self.connection.execute('DELETE FROM polarity WHERE key IN '
+                                    '(SELECT key FROM polarity ORDER BY last_used LIMIT ?)', (excess,))
+
+    def stats(self):
+        """Hit and miss counts since the cache was opened."""
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self),
+                'hit_rate': self.hits / total if total else 0.0}
+
+    def close(self):
+        self.connection.close()
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM polarity').fetchone()[0]
+
+
+def cached_scores(texts, score, cache):
+    """Score reviews through the cache: only misses are passed to score(texts)."""
+    texts = ['' if not isinstance(text, str) else text for text in texts]
+    scores = cache.get_many(texts)
+    missing = np.flatnonzero(np.isnan(scores))
+    if len(missing):
+        new_texts = [texts[i] for i in missing]
+        scores[missing] = score(new_texts)
+        cache.put_many(new_texts, scores[missing])
+    return scores
+
+
+def default_cache_path(data_dir):
+    """Location of the polarity cache next to the review data."""
+    return os.path.join(data_dir, 'polarity_cache.sqlite')
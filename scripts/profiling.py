@@ -0,0 +1,239 @@
+import os
+import sys
+import glob
+import json
+import time
+import runpy
+import argparse
+import functools
+
+# Per-stage instrumentation. Functions decorated with @profiled (and the public methods of
+# classes decorated with @profiled_class) record wall time, CPU time, peak memory and rows
+# processed when profiling is on:
+#
+#   MOVIE_PROFILE=trace     write a JSON trace of every instrumented call
+#   MOVIE_PROFILE=cprofile  the trace, plus a cProfile dump of each outermost call
+#   MOVIE_PROFILE_DIR       where traces go (default: profiles/ next to the scripts)
+#
+# or run a script with `python profiling.py [--cprofile] script.py [args]`. Traces use the
+# Chrome trace-event format, so chrome://tracing or ui.perfetto.dev shows them as a flame
+# chart across processes. When profiling is off a wrapper only checks one flag.
+PROFILE_VARIABLE = 'MOVIE_PROFILE'
+PROFILE_DIR_VARIABLE = 'MOVIE_PROFILE_DIR'
+MODES = ['trace', 'cprofile']
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROFILE_DIR = os.path.normpath(os.path.join(SCRIPT_DIR, '../profiles'))
+MERGED_TRACE = 'trace.json'
+
+
+def _read_peak_kib():
+    """Peak resident memory of this process (VmHWM) in KiB, or None where /proc is unavailable."""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+
+
+def _reset_peak():
+    """Start a new peak memory measurement; False when the kernel does not allow it."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def count_rows(result, args):
+    """Rows processed by a call: the length of a returned table or array, else of the first one
+    passed in, else of the instance's `data` attribute (for methods that load into self.data)."""
+    for value in (result,) + tuple(args):
+        if getattr(value, 'ndim', 0) >= 1 or isinstance(value, list):
+            return len(value)
+    data = getattr(args[0], 'data', None) if args else None
+    return len(data) if getattr(data, 'ndim', 0) >= 1 else None
+
+
+class _Frame:
+    def __init__(self, name):
+        self.name = name
+        self.child_peak = 0
+        self.timestamp = time.time()
+        self.start = time.perf_counter()
+        self.cpu_start = time.process_time()
+
+
+class Profiler:
+    """Trace of the instrumented calls in this process, written after each outermost call."""
+
+    def __init__(self):
+        self.configure()
+
+    def configure(self):
+        mode = os.environ.get(PROFILE_VARIABLE, '').lower()
+        self.enabled = mode not in ('', '0', 'off', 'false', 'no')
+        self.cprofile = mode == 'cprofile'
+        self.output_dir = os.environ.get(PROFILE_DIR_VARIABLE) or PROFILE_DIR
+        self.pid = os.getpid()
+        self.events = []
+        self.stack = []
+        self.dumps = 0
+
+    def call(self, name, func, args, kwargs, rows=None):
+        if os.getpid() != self.pid:
+            # A forked worker inherits the parent's trace; it keeps its own
+            self.configure()
+        outer = self.stack[-1] if self.stack else None
+        if outer is not None:
+            # The reset below would forget the caller's peak so far; keep it in the caller's frame
+            outer.child_peak = max(outer.child_peak, _read_peak_kib() or 0)
+        measured = _reset_peak()
+        frame = _Frame(name)
+        self.stack.append(frame)
+        profile = None
+        if self.cprofile and outer is None:
+            import cProfile
+            profile = cProfile.Profile()
+            profile.enable()
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            if profile is not None:
+                profile.disable()
+            wall = time.perf_counter() - frame.start
+            cpu = time.process_time() - frame.cpu_start
+            self.stack.pop()
+            peak = max(_read_peak_kib() or 0, frame.child_peak)
+            if outer is not None:
+                outer.child_peak = max(outer.child_peak, peak)
+        count = rows(result) if rows is not None else count_rows(result, args)
+        self.events.append({
+            'name': name, 'cat': 'stage', 'ph': 'X', 'pid': self.pid, 'tid': 0,
+            'ts': round(frame.timestamp * 1e6), 'dur': round(wall * 1e6),
+            'args': {
+                'wall_s': round(wall, 6), 'cpu_s': round(cpu, 6),
+                # Without a per-call reset this is the process peak so far
+                'peak_rss_mb': round(peak / 1024, 1) if peak else None, 'peak_is_per_call': measured,
+                'rows': count, 'rows_per_s': round(count / wall, 1) if count and wall > 0 else None,
+                'depth': len(self.stack),
+            },
+        })
+        if outer is None:
+            if profile is not None:
+                self.dumps += 1
+                os.makedirs(self.output_dir, exist_ok=True)
+                safe = ''.join(c if c.isalnum() else '_' for c in name)
+                profile.dump_stats(os.path.join(self.output_dir, f'{safe}-{self.pid}-{self.dumps}.prof'))
+            self.flush()
+        return result
+
+    def flush(self):
+        """Write this process's trace; worker processes may exit without running atexit hooks."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        with open(os.path.join(self.output_dir, f'trace-{self.pid}.json'), 'w') as f:
+            json.dump({'traceEvents': self.events}, f)
+
+
+profiler = Profiler()
+
+
+def profiled(func=None, name=None, rows=None):
+    """Instrument a function; rows(result) overrides how processed rows are counted."""
+    if func is None:
+        return functools.partial(profiled, name=name, rows=rows)
+    label = name or func.__qualname__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not profiler.enabled:
+            return func(*args, **kwargs)
+        return profiler.call(label, func, args, kwargs, rows)
+    return wrapper
+
+
+def profiled_class(cls):
+    """Instrument every public method defined on a class."""
+    for attribute, value in list(vars(cls).items()):
+        if callable(value) and not attribute.startswith('_'):
+            setattr(cls, attribute, profiled(value))
+    return cls
+
+
+def enable(mode='trace', output_dir=None):
+    """Turn profiling on for this process and the worker processes it starts afterwards."""
+    os.environ[PROFILE_VARIABLE] = mode
+    if output_dir:
+        os.environ[PROFILE_DIR_VARIABLE] = output_dir
+    profiler.configure()
+    return profiler.output_dir
+
+
+def clear_traces(output_dir):
+    """Remove traces and cProfile dumps of earlier runs."""
+    for path in glob.glob(os.path.join(output_dir, 'trace*.json')) + glob.glob(os.path.join(output_dir, '*.prof')):
+        os.remove(path)
+
+
+def merge_traces(output_dir):
+    """Combine the per-process traces into one trace file; returns (path, events)."""
+    events = []
+    for path in sorted(glob.glob(os.path.join(output_dir, 'trace-*.json'))):
+        with open(path) as f:
+            events.extend(json.load(f)['traceEvents'])
+    events.sort(key=lambda event: event['ts'])
+    path = os.path.join(output_dir, MERGED_TRACE)
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+    return path, events
+
+
+def print_summary(events):
+    """Calls, time, memory and throughput per instrumented function, slowest first."""
+    totals = {}
+    for event in events:
+        args = event['args']
+        total = totals.setdefault(event['name'], {'calls': 0, 'wall': 0.0, 'cpu': 0.0, 'peak': 0.0, 'rows': 0})
+        total['calls'] += 1
+        total['wall'] += args['wall_s']
+        total['cpu'] += args['cpu_s']
+        total['peak'] = max(total['peak'], args['peak_rss_mb'] or 0)
+        total['rows'] += args['rows'] or 0
+    print(f"{'stage':<52} {'calls':>5} {'wall s':>9} {'cpu s':>9} {'peak MB':>8} {'rows':>10} {'rows/s':>12}")
+    for name, total in sorted(totals.items(), key=lambda item: -item[1]['wall']):
+        rate = f"{total['rows'] / total['wall']:,.0f}" if total['rows'] and total['wall'] > 0 else ''
+        print(f"{name[:52]:<52} {total['calls']:>5} {total['wall']:>9.3f} {total['cpu']:>9.3f} "
+              f"{total['peak']:>8.1f} {total['rows'] or '':>10} {rate:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a script with per-stage profiling, or summarize a trace.')
+    parser.add_argument('script', nargs='?', help='script to run (omit to summarize the existing traces)')
+    parser.add_argument('script_args', nargs=argparse.REMAINDER, help='arguments of the script')
+    parser.add_argument('--cprofile', action='store_true', help='also write cProfile dumps of the outermost calls')
+    parser.add_argument('--output-dir', default=None, help=f'trace directory (default: {PROFILE_DIR})')
+    args = parser.parse_args()
+
+    output_dir = args.output_dir or os.environ.get(PROFILE_DIR_VARIABLE) or PROFILE_DIR
+    if args.script:
+        output_dir = enable('cprofile' if args.cprofile else 'trace', os.path.abspath(output_dir))
+        clear_traces(output_dir)
+        sys.argv = [args.script] + args.script_args
+        sys.path.insert(0, os.path.dirname(os.path.abspath(args.script)))
+        try:
+            runpy.run_path(args.script, run_name='__main__')
+        finally:
+            path, events = merge_traces(output_dir)
+            print()
+            print_summary(events)
+            print(f"\nTrace written to {path} (open in ui.perfetto.dev or chrome://tracing)")
+    else:
+        path, events = merge_traces(output_dir)
+        print_summary(events)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+import os
+import argparse
+import numpy as np
+import pandas as pd
+from storage import find_table, read_table, read_table_chunks
+from profiling import profiled
+
+RATING_COLUMNS = ['IMDB_Rating', 'Meta_score', 'tomatometer_rating', 'audience_rating']
+DEFAULT_RESAMPLES = 1000
+# Bootstrap resamples drawn at once; bounds memory to batch x rows weights.
+BOOTSTRAP_BATCH = 100
+# Upper bound on the weights of one batch, so large datasets use smaller batches
+BOOTSTRAP_BATCH_WEIGHTS = 20000000
+
+
+def _centered(values, shift):
+    """Shifted values with missing ones set to zero, and the 0/1 mask of present values."""
+    present = ~np.isnan(values)
+    return np.where(present, values - shift, 0.0), present.astype(float)
+
+
+def _pairwise_sums(x, m, weights=None):
+    """Pairwise sums (4, k, k) of the rows, each counted `weights` times (default once).
+
+    For columns i and j the sums are: rows where both are present, x_i where j is present,
+    x_i ** 2 where j is present and x_i * x_j. Missing values contribute zero, so every pair
+    uses its own complete rows (as pearsonr on the pair with missing rows dropped would).
+    Each sum is one k x k matrix product, so memory stays at the size of the rows.
+    """
+    wm, wx = (m, x) if weights is None else (m * weights[:, None], x * weights[:, None])
+    return np.stack([wm.T @ m, wx.T @ m, (wx * x).T @ m, wx.T @ x])
+
+
+def _moments(sums, shift):
+    """Means, covariances and correlations from (..., 4, k, k) pairwise sums."""
+    count, sx, sxx, sxy = (sums[..., i, :, :] for i in range(4))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = sx / count
+        cov = (sxy - sx * np.swapaxes(sx, -1, -2) / count) / (count - 1)
+        var = (sxx - sx * sx / count) / (count - 1)
+        corr = cov / np.sqrt(var * np.swapaxes(var, -1, -2))
+    return count, mean + shift[:, None], cov, corr
+
+
+class RatingStats:
+    """Pairwise statistics of rating columns, from sufficient statistics gathered in one pass.
+
+    Use from_frame() for data in memory, or update() chunk by chunk (from_file() does this)
+    for data larger than memory; both give the same results.
+    """
+
+    def __init__(self, columns=RATING_COLUMNS):
+        self.columns = list(columns)
+        self.sums = np.zeros((4, len(self.columns), len(self.columns)))
+        self.shift = None
+
+    def update(self, chunk):
+        """Add a chunk of rows to the running sums."""
+        values = chunk[self.columns].to_numpy(dtype=float, na_value=np.nan)
+        if not len(values):
+            # An empty chunk adds nothing and must not fix the shift
+            return self
+        if self.shift is None:
+            # Sums are taken around the first non-empty chunk's means to avoid cancellation in the variances
+            self.shift = np.nan_to_num(np.nanmean(values, axis=0))
+        self.sums += _pairwise_sums(*_centered(values, self.shift))
+        return self
+
+    @classmethod
+    def from_frame(cls, data, columns=RATING_COLUMNS):
+        return cls(columns).update(data)
+
+    @classmethod
+    def from_file(cls, path, columns=RATING_COLUMNS, chunk_size=100000):
+        """Accumulate statistics over a dataset read chunk by chunk."""
+        accumulator = cls(columns)
+        for chunk in read_table_chunks(path, columns=list(columns), chunk_size=chunk_size):
+            accumulator.update(chunk)
+        return accumulator
+
+    def _frame(self, matrix):
+        return pd.DataFrame(matrix, index=self.columns, columns=self.columns)
+
+    def moments(self):
+        return _moments(self.sums, self.shift if self.shift is not None else np.zeros(len(self.columns)))
+
+    def counts(self):
+        """Rows where both columns are present."""
+        return self._frame(self.sums[0])
+
+    def means(self):
+        return pd.Series(np.diagonal(self.moments()[1]), index=self.columns)
+
+    def covariance(self):
+        return self._frame(self.moments()[2])
+
+    def correlation(self):
+        """Pearson correlation of every pair of columns."""
+        return self._frame(self.moments()[3])
+
+    def ttest(self):
+        """Two-sample Student t-test of every pair of columns (as scipy's ttest_ind); returns (t, p)."""
+        from scipy import stats
+        count, mean, cov, _ = self.moments()
+        n, mean, var = np.diagonal(count), np.diagonal(mean), np.diagonal(cov)
+        n_i, n_j = n[:, None], n[None, :]
+        df = n_i + n_j - 2
+        with np.errstate(invalid='ignore', divide='ignore'):
+            pooled = ((n_i - 1) * var[:, None] + (n_j - 1) * var[None, :]) / df
+            t = (mean[:, None] - mean[None, :]) / np.sqrt(pooled * (1 / n_i + 1 / n_j))
+        p = 2 * stats.t.sf(np.abs(t), df)
+        return self._frame(t), self._frame(p)
+
+
+def _resample_weights(rng, batch, n):
+    """Bootstrap weights: how often each row is drawn, for `batch` resamples of n rows."""
+    draws = rng.integers(0, n, size=(batch, n)) + (np.arange(batch) * n)[:, None]
+    return np.bincount(draws.ravel(), minlength=batch * n).reshape(batch, n).astype(float)
+
+
+@profiled
+def bootstrap_intervals(data, columns=RATING_COLUMNS, n_resamples=DEFAULT_RESAMPLES, confidence=0.95, seed=0):
+    """Percentile bootstrap intervals for the correlation and the mean difference of every pair.
+
+    Rows are resampled jointly as weights (how often each row is drawn), and each resample's
+    sums are weighted matrix products of the rows, so no resampled copy of the data is made.
+    Returns {'correlation': (low, high), 'mean_difference': (low, high)} of DataFrames.
+    """
+    values = data[list(columns)].to_numpy(dtype=float, na_value=np.nan)
+    shift = np.nan_to_num(np.nanmean(values, axis=0))
+    x, m = _centered(values, shift)
+    rng = np.random.default_rng(seed)
+    batch = max(1, min(BOOTSTRAP_BATCH, BOOTSTRAP_BATCH_WEIGHTS // max(len(values), 1)))
+    correlations, differences = [], []
+    for start in range(0, n_resamples, batch):
+        weights = _resample_weights(rng, min(batch, n_resamples - start), len(values))
+        sums = np.stack([_pairwise_sums(x, m, resample) for resample in weights])
+        _, mean, _, corr = _moments(sums, shift)
+        means = np.diagonal(mean, axis1=-2, axis2=-1)
+        correlations.append(corr)
+        differences.append(means[:, :, None] - means[:, None, :])
+    tail = (1 - confidence) / 2 * 100
+    intervals = {}
+    for name, samples in (('correlation', correlations), ('mean_difference', differences)):
+        low, high = np.nanpercentile(np.concatenate(samples), [tail, 100 - tail], axis=0)
+        intervals[name] = (pd.DataFrame(low, index=columns, columns=columns),
+                           pd.DataFrame(high, index=columns, columns=columns))
+    return intervals
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Correlation, covariance and t-test matrices of all rating columns.')
+    parser.add_argument('--chunk-size', type=int, default=None,
+                        help='accumulate the file chunk by chunk instead of loading it (no bootstrap)')
+    parser.add_argument('--resamples', type=int, default=DEFAULT_RESAMPLES, help='bootstrap resamples')
+    args = parser.parse_args()
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    path = find_table(os.path.join(script_dir, '../data'), 'cleaned_combined_data')
+    pd.set_option('display.width', 160)
+    pd.set_option('display.max_columns', None)
+    if args.chunk_size:
+        rating_stats = RatingStats.from_file(path, chunk_size=args.chunk_size)
+    else:
+        data = read_table(path, columns=RATING_COLUMNS)
+        rating_stats = RatingStats.from_frame(data)
+    t, p = rating_stats.ttest()
+    print("Pairwise counts:\n", rating_stats.counts().astype(int))
+    print("\nCorrelation:\n", rating_stats.correlation().round(3))
+    print("\nCovariance:\n", rating_stats.covariance().round(2))
+    print("\nT-statistic:\n", t.round(2))
+    print("\nP-value:\n", p)
+    if not args.chunk_size and args.resamples:
+        intervals = bootstrap_intervals(data, n_resamples=args.resamples)
+        low, high = intervals['correlation']
+        print(f"\n95% bootstrap interval of the correlation ({args.resamples} resamples):")
+        print(low.round(3).astype(str) + ' to ' + high.round(3).astype(str))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,13 @@
 import os
+import argparse
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-from sklearn.linear_model import LinearRegression
-from sklearn.metrics import r2_score
+from dataset_loader import load_dataset
+from figures import show_figure
+from storage import table_filename
+from revenue_model import cross_validate, fit_subsets
+from profiling import profiled_class
 
+@profiled_class
 class RevenueAnalysis:
     def __init__(self, filename):
         # Define the data directory relative to the script location
@@ -15,12 +18,13 @@ class RevenueAnalysis:
 
     def load_data(self):
         """Load and prepare the data for analysis."""
-        self.data = pd.read_csv(self.filepath)
-        self.data.dropna(subset=['Gross_imdb', 'IMDB_Rating', 'Meta_score', 'tomatometer_rating', 'audience_rating'],
-                         inplace=True)
+        columns = ['Gross_imdb', 'IMDB_Rating', 'Meta_score', 'tomatometer_rating', 'audience_rating']
+        self.data = load_dataset(self.filepath, columns=columns, dropna=columns)
 
     def plot_correlations_with_regression(self, color='blue'):
         """Visualize correlations with regression lines for enhanced impact."""
+        import matplotlib.pyplot as plt
+        import seaborn as sns
         fig, axs = plt.subplots(1, 2, figsize=(14, 6))
         features = ['IMDB_Rating', 'Meta_score']
         titles = ['IMDb Rating', 'Meta Score']
@@ -34,10 +38,12 @@ class RevenueAnalysis:
             ax.grid(True)
 
         plt.tight_layout()
-        plt.show()
+        show_figure('revenue')
 
     def perform_and_plot_regression(self, color='blue'):
         """Perform regression and plot results with optional lowess smoothing."""
+        import matplotlib.pyplot as plt
+        import seaborn as sns
         try:
             import statsmodels
             lowess = True
@@ -45,16 +51,19 @@ class RevenueAnalysis:
             lowess = False
             print("statsmodels is not installed. Lowess smoothing will be disabled.")
 
-        model = LinearRegression()
         features = ['IMDB_Rating', 'Meta_score']
+        subsets = [(feature,) for feature in features]
+
+        # Both single-feature models are fitted in one batched solve
+        intercepts, slopes = fit_subsets(self.data, subsets, features)
+        all_predictions = intercepts + self.data[features].to_numpy() @ slopes.T
+        cv_r2 = cross_validate(self.data, subsets, features, workers=1)['cv_r2']
 
         fig, axs = plt.subplots(1, 2, figsize=(14, 6))
 
         for i, feature in enumerate(features):
-            X = self.data[[feature]]
             y = self.data['Gross_imdb']
-            model.fit(X, y)
-            predictions = model.predict(X)
+            predictions = all_predictions[:, i]
             residuals = y - predictions
 
             sns.residplot(x=predictions, y=residuals, lowess=lowess, color=color, ax=axs[i])
@@ -64,15 +73,18 @@ class RevenueAnalysis:
             axs[i].grid(True)
 
             print(f'Regression results for {feature}:')
-            print(f'Coefficient: {model.coef_[0]:.2f}')
-            print(f'Intercept: {model.intercept_:.2f}')
-            print(f'R-squared: {r2_score(y, predictions):.4f}')
+            print(f'Coefficient: {slopes[i, i]:.2f}')
+            print(f'Intercept: {intercepts[i]:.2f}')
+            print(f'R-squared: {1 - (residuals ** 2).sum() / ((y - y.mean()) ** 2).sum():.4f}')
+            print(f'Cross-validated R-squared: {cv_r2.iloc[i]:.4f}')
 
         plt.tight_layout()
-        plt.show()
+        show_figure('residual')
 
 def main():
-    analysis = RevenueAnalysis('cleaned_combined_data.csv')
+    argparse.ArgumentParser(description='Relate IMDb ratings and Meta scores to gross revenue.').parse_args()
+
+    analysis = RevenueAnalysis(table_filename('cleaned_combined_data'))
     analysis.load_data()
     analysis.plot_correlations_with_regression(color='green')  # Change color as needed
     analysis.perform_and_plot_regression(color='orange')  # Change color as needed
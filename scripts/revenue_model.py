@@ -0,0 +1,156 @@
+import os
+import json
+import time
+import argparse
+import itertools
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from dataset_loader import load_dataset
+from revenue_predictor import RevenuePredictor
+from storage import find_table
+from profiling import profiled
+
+FEATURES = ['IMDB_Rating', 'Meta_score', 'tomatometer_rating', 'audience_rating']
+TARGET = 'Gross_imdb'
+DEFAULT_FOLDS = 5
+
+
+def feature_subsets(features=FEATURES):
+    """Every non-empty subset of the features, smallest first."""
+    return [subset for size in range(1, len(features) + 1) for subset in itertools.combinations(features, size)]
+
+
+def default_model_path(data_dir):
+    """Location of the saved revenue model next to the data."""
+    return os.path.join(data_dir, 'revenue_model.json')
+
+
+class _Design:
+    """Standardized design matrix [1, X] and the masks selecting each subset's columns."""
+
+    def __init__(self, data, features, subsets, target=TARGET):
+        values = data[features].to_numpy(dtype=float)
+        self.mean, self.scale = values.mean(axis=0), values.std(axis=0)
+        self.scale[self.scale == 0] = 1.0
+        # Standardizing keeps the normal equations well conditioned (Gross is ~1e8, ratings ~1e2)
+        self.matrix = np.column_stack([np.ones(len(values)), (values - self.mean) / self.scale])
+        self.y = data[target].to_numpy(dtype=float)
+        self.masks = np.array([[True] + [feature in subset for feature in features] for subset in subsets])
+
+    def original_units(self, coefficients):
+        """(intercepts, slopes) of standardized-space coefficients, in the data's units."""
+        slopes = coefficients[:, 1:] / self.scale
+        return coefficients[:, 0] - slopes @ self.mean, slopes
+
+
+def solve_subsets(gram, moments, masks):
+    """Least-squares coefficients of every subset in one batched solve of the normal equations.
+
+    Columns outside a subset are replaced by identity rows, so they solve to exactly zero
+    and all subsets share one (subsets, p, p) system.
+    """
+    both = masks[:, :, None] & masks[:, None, :]
+    systems = np.where(both, gram, 0.0) + np.eye(gram.shape[0]) * ~masks[:, None, :]
+    return np.linalg.solve(systems, np.where(masks, moments, 0.0)[..., None])[..., 0]
+
+
+def evaluate_fold(gram, moments, test_matrix, test_y, masks):
+    """Fit every subset on the training part of a fold; sum of squared errors on its test rows."""
+    coefficients = solve_subsets(gram, moments, masks)
+    residuals = test_y[:, None] - test_matrix @ coefficients.T
+    return (residuals ** 2).sum(axis=0)
+
+
+def fit_subsets(data, subsets, features=FEATURES, target=TARGET):
+    """Fit every subset on all rows; returns (intercepts, slopes) with a column per feature."""
+    design = _Design(data, features, subsets, target)
+    coefficients = solve_subsets(design.matrix.T @ design.matrix, design.matrix.T @ design.y, design.masks)
+    return design.original_units(coefficients)
+
+
+@profiled
+def cross_validate(data, subsets, features=FEATURES, target=TARGET, folds=DEFAULT_FOLDS, repeats=1, workers=None,
+                   seed=0):
+    """Out-of-fold R² and RMSE of every subset from repeated k-fold cross-validation.
+
+    Training systems come from subtracting a fold's Gram matrix from the full one; folds
+    are evaluated in a process pool (workers=1 runs them in this process).
+    """
+    design = _Design(data, features, subsets, target)
+    gram, moments = design.matrix.T @ design.matrix, design.matrix.T @ design.y
+    rng = np.random.default_rng(seed)
+    tasks = []
+    for _ in range(repeats):
+        for test in np.array_split(rng.permutation(len(design.y)), folds):
+            test_matrix, test_y = design.matrix[test], design.y[test]
+            tasks.append((gram - test_matrix.T @ test_matrix, moments - test_matrix.T @ test_y,
+                          test_matrix, test_y, design.masks))
+    if workers == 1:
+        errors = [evaluate_fold(*task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            errors = list(pool.map(evaluate_fold, *zip(*tasks)))
+    sse = np.sum(errors, axis=0)
+    total = repeats * ((design.y - design.y.mean()) ** 2).sum()
+    return pd.DataFrame({'cv_r2': 1 - sse / total, 'cv_rmse': np.sqrt(sse / (repeats * len(design.y)))},
+                        index=[' + '.join(subset) for subset in subsets])
+
+
+@profiled
+def train_revenue_model(data, features=FEATURES, target=TARGET, folds=DEFAULT_FOLDS, repeats=1, workers=None):
+    """Compare every feature subset and return (results table, best model as a dict)."""
+    subsets = feature_subsets(features)
+    intercepts, slopes = fit_subsets(data, subsets, features, target)
+    predictions = intercepts + data[features].to_numpy(dtype=float) @ slopes.T
+    y = data[target].to_numpy(dtype=float)
+    results = cross_validate(data, subsets, features, target, folds, repeats, workers)
+    results.insert(0, 'r2', 1 - ((y[:, None] - predictions) ** 2).sum(axis=0) / ((y - y.mean()) ** 2).sum())
+    best = int(np.argmax(results['cv_r2'].to_numpy()))
+    chosen = [features.index(feature) for feature in subsets[best]]
+    model = {
+        'target': target, 'features': list(subsets[best]),
+        'coefficients': slopes[best, chosen].tolist(), 'intercept': float(intercepts[best]),
+        'r2': float(results['r2'].iloc[best]), 'cv_r2': float(results['cv_r2'].iloc[best]),
+        'cv_rmse': float(results['cv_rmse'].iloc[best]), 'folds': folds, 'repeats': repeats, 'rows': len(data),
+    }
+    return results, model
+
+
+def save_model(model, path):
+    with open(path, 'w') as f:
+        json.dump(model, f, indent=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Select and save a gross revenue model over all rating subsets.')
+    parser.add_argument('--folds', type=int, default=DEFAULT_FOLDS, help='cross-validation folds')
+    parser.add_argument('--repeats', type=int, default=1, help='repetitions of k-fold with new shuffles')
+    parser.add_argument('--workers', type=int, default=None, help='folds evaluated in parallel (default: CPU cores)')
+    args = parser.parse_args()
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    data_dir = os.path.normpath(os.path.join(script_dir, '../data'))
+    columns = FEATURES + [TARGET]
+    data = load_dataset(find_table(data_dir, 'cleaned_combined_data'), columns=columns, dropna=columns)
+
+    results, model = train_revenue_model(data, folds=args.folds, repeats=args.repeats, workers=args.workers)
+    pd.set_option('display.width', 160)
+    pd.set_option('display.max_columns', None)
+    print(results.sort_values('cv_r2', ascending=False).round(4))
+    path = default_model_path(data_dir)
+    save_model(model, path)
+    print(f"\nSaved {' + '.join(model['features'])} (cross-validated R-squared {model['cv_r2']:.4f}) to {path}")
+
+    # Score the whole dataset with the standalone predictor to report its throughput
+    predictor = RevenuePredictor.load(path)
+    ratings = data[predictor.features].to_numpy(dtype=float)
+    start = time.perf_counter()
+    predictor.predict(ratings)
+    elapsed = time.perf_counter() - start
+    print(f"Predictor scored {len(ratings)} movies in {elapsed * 1000:.3f} ms "
+          f"({len(ratings) / max(elapsed * 1000, 1e-9):.0f} movies/ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+import json
+import numpy as np
+
+# Loading and scoring need only numpy and json, so forecasts can be served without
+# importing pandas, scipy or sklearn. The model is written by revenue_model.py.
+
+
+class RevenuePredictor:
+    """Gross revenue forecasts from a saved linear model."""
+
+    def __init__(self, features, coefficients, intercept, metadata=None):
+        self.features = list(features)
+        self.coefficients = np.asarray(coefficients, dtype=float)
+        self.intercept = float(intercept)
+        self.metadata = metadata or {}
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            model = json.load(f)
+        return cls(model['features'], model['coefficients'], model['intercept'], model)
+
+    def predict(self, ratings):
+        """Forecast gross revenue for many movies at once.
+
+        ratings is a 2-D array with the model's features as columns (in order), or a
+        mapping such as a DataFrame or dict of arrays keyed by feature name.
+        """
+        if isinstance(ratings, np.ndarray):
+            values = ratings
+        else:
+            values = np.column_stack([np.asarray(ratings[feature], dtype=float) for feature in self.features])
+        return values @ self.coefficients + self.intercept
+
+    def predict_one(self, **ratings):
+        """Forecast for a single movie, e.g. predict_one(IMDB_Rating=85, Meta_score=90)."""
+        return self.intercept + sum(c * ratings[f] for f, c in zip(self.features, self.coefficients.tolist()))
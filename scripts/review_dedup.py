@@ -0,0 +1,208 @@
+import os
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from storage import TableWriter, read_table_chunks, schema_for, table_path
+from profiling import profiled
+
+# Duplicate reviews in scraped dumps: reposts (identical once case, punctuation and spacing
+# are normalized), edited reposts and truncated copies. Each review gets a MinHash signature
+# of its word 3-grams. Candidate pairs come from identical normalized text, from LSH buckets
+# (signature bands) and from a shared opening (truncated copies), and are checked against the
+# signatures. Bucket members are only compared to the bucket's first review and clusters are
+# the connected components of the confirmed pairs, so the work grows with the number of
+# reviews rather than its square, and only signatures are kept in memory.
+DEFAULT_THRESHOLD = 0.8
+NUM_PERM = 64
+SHINGLE_WORDS = 3
+# Truncated copies share their opening; this many normalized characters of it
+PREFIX_CHARS = 50
+_SENTINEL = '\x00'
+_MASK32 = np.uint64(0xFFFFFFFF)
+_rng = np.random.default_rng(20240601)
+# Multiply-shift hash functions, one per signature position (odd multipliers)
+_MULTIPLIERS = _rng.integers(1, 2 ** 63, NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_INCREMENTS = _rng.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64)
+_SHINGLE_PRIME = np.uint64(1099511628211)
+
+
+def normalize_text(texts):
+    """Lower-cased words of each review joined by single spaces, without punctuation."""
+    return (texts.astype('str').fillna('').str.lower().str.replace(r'[^\w\s]+', ' ', regex=True)
+            .str.split().str.join(' '))
+
+
+def lsh_bands(threshold, num_perm=NUM_PERM):
+    """(bands, rows per band) whose collision curve turns up at just below the threshold."""
+    options = [(num_perm // rows, rows) for rows in range(1, num_perm + 1) if num_perm % rows == 0]
+    # Prefer the option whose threshold (1/b)^(1/r) is closest below the target: recall first
+    below = [option for option in options if (1 / option[0]) ** (1 / option[1]) <= threshold]
+    return min(below or options, key=lambda option: abs((1 / option[0]) ** (1 / option[1]) - threshold))
+
+
+def signatures(normalized):
+    """MinHash signatures (uint32, NUM_PERM per review) and shingle counts of normalized reviews."""
+    padded = normalized + (' ' + _SENTINEL) * SHINGLE_WORDS
+    words = padded.str.split()
+    lengths = words.str.len().to_numpy()
+    tokens = pd.util.hash_array(np.asarray(words.explode().to_numpy(), dtype=object))
+    doc = np.repeat(np.arange(len(normalized)), lengths)
+    # Word 3-grams within one review, hashed from the hashes of their words
+    last = len(tokens) - SHINGLE_WORDS + 1
+    valid = doc[:last] == doc[SHINGLE_WORDS - 1:]
+    shingles = tokens[:last].copy()
+    for offset in range(1, SHINGLE_WORDS):
+        shingles = shingles * _SHINGLE_PRIME + tokens[offset:offset + last]
+    shingles, owner = shingles[valid], doc[:last][valid]
+    starts = np.searchsorted(owner, np.arange(len(normalized)))
+    signature = np.empty((len(normalized), NUM_PERM), dtype=np.uint32)
+    for i in range(NUM_PERM):
+        hashed = ((shingles * _MULTIPLIERS[i] + _INCREMENTS[i]) >> np.uint64(32)) & _MASK32
+        signature[:, i] = np.minimum.reduceat(hashed, starts)
+    return signature, lengths - SHINGLE_WORDS + 1
+
+
+def review_keys(reviews):
+    """Exact-duplicate key, opening key, text length, shingle count and signature of each review."""
+    normalized = normalize_text(reviews['Content'])
+    signature, shingles = signatures(normalized)
+    length = normalized.str.len().to_numpy()
+    prefix = pd.util.hash_array(np.asarray(normalized.str[:PREFIX_CHARS].to_numpy(), dtype=object))
+    return {
+        'exact': pd.util.hash_array(np.asarray(normalized.to_numpy(), dtype=object)),
+        # Reviews shorter than the opening cannot be told from a coincidental one
+        'prefix': np.where(length >= PREFIX_CHARS, prefix, 0),
+        'length': length, 'shingles': shingles, 'signature': signature,
+    }
+
+
+def similarity(keys, left, right):
+    """Similarity of review pairs from their signatures: their Jaccard similarity, or for a
+    truncated copy the share of the shorter review's 3-grams found in the longer one."""
+    jaccard = (keys['signature'][left] == keys['signature'][right]).mean(axis=1)
+    n_left, n_right = keys['shingles'][left], keys['shingles'][right]
+    common = jaccard * (n_left + n_right) / (1 + jaccard)
+    containment = np.minimum(common / np.minimum(n_left, n_right), 1.0)
+    return np.maximum(jaccard, containment)
+
+
+def band_keys(signature, threshold=DEFAULT_THRESHOLD):
+    """LSH bucket of each review in every band: (reviews, bands) hashes of the signature bands."""
+    bands, rows = lsh_bands(threshold)
+    signature = signature.astype(np.uint64).reshape(len(signature), bands, rows)
+    # One hash per band; identical band values land in the same bucket
+    return (signature * (np.uint64(2) ** np.arange(rows, dtype=np.uint64) * _SHINGLE_PRIME)).sum(axis=2)
+
+
+def _bucket_pairs(bucket_keys, skip=None):
+    """(member, first member) pairs of every bucket with more than one review."""
+    order = np.argsort(bucket_keys, kind='stable')
+    keys = bucket_keys[order]
+    first = np.r_[True, keys[1:] != keys[:-1]]
+    leader = order[np.maximum.accumulate(np.where(first, np.arange(len(keys)), 0))]
+    pairs = ~first if skip is None else ~first & (keys != skip)
+    return order[pairs], leader[pairs]
+
+
+@profiled(rows=lambda clusters: len(clusters))
+def find_duplicates(keys, threshold=DEFAULT_THRESHOLD):
+    """Duplicate clusters: a frame indexed by review with its cluster, canonical review,
+    kind ('canonical', 'exact' or 'near') and similarity to the canonical review.
+    Reviews without duplicates are not listed. The canonical review of a cluster is its
+    longest (the complete one for truncated copies), then its first."""
+    from scipy.sparse import coo_matrix
+    from scipy.sparse.csgraph import connected_components
+    n = len(keys['exact'])
+    left, right = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int64)]
+    exact_left, exact_right = _bucket_pairs(keys['exact'])
+    candidates = [_bucket_pairs(keys['prefix'], skip=0)]
+    candidates += [_bucket_pairs(band_key) for band_key in band_keys(keys['signature'], threshold).T]
+    left.append(exact_left)
+    right.append(exact_right)
+    for members, leaders in candidates:
+        confirmed = similarity(keys, members, leaders) >= threshold
+        left.append(members[confirmed])
+        right.append(leaders[confirmed])
+    left, right = np.concatenate(left), np.concatenate(right)
+    graph = coo_matrix((np.ones(len(left)), (left, right)), shape=(n, n))
+    _, labels = connected_components(graph, directed=False)
+
+    sizes = np.bincount(labels)
+    clustered = np.flatnonzero(sizes[labels] > 1)
+    if not len(clustered):
+        return pd.DataFrame(columns=['cluster', 'canonical', 'kind', 'similarity'])
+    # Longest first, then earliest: the first review of each cluster in this order is canonical
+    order = clustered[np.lexsort((clustered, -keys['length'][clustered], labels[clustered]))]
+    first = np.r_[True, labels[order][1:] != labels[order][:-1]]
+    canonical = order[np.maximum.accumulate(np.where(first, np.arange(len(order)), 0))]
+    exact = keys['exact'][order] == keys['exact'][canonical]
+    kind = np.where(first, 'canonical', np.where(exact, 'exact', 'near'))
+    clusters = pd.DataFrame({'cluster': labels[order], 'canonical': canonical, 'kind': kind,
+                             'similarity': np.where(exact, 1.0, similarity(keys, order, canonical))},
+                            index=pd.Index(order, name='row'))
+    # Number clusters 0, 1, ... in order of their canonical review
+    clusters['cluster'] = pd.factorize(clusters['canonical'], sort=True)[0]
+    return clusters.sort_index()
+
+
+def duplicates_path(path):
+    """Audit file of a cleaned review file, e.g. duplicates_imdbreviews_saw2004.csv next to it."""
+    stem = os.path.splitext(os.path.basename(path))[0]
+    stem = stem[len('cleaned_'):] if stem.startswith('cleaned_') else stem
+    return table_path(os.path.dirname(path), 'duplicates_' + stem, os.path.splitext(path)[1][1:])
+
+
+@profiled(rows=lambda counts: counts[0])
+def dedupe_review_file(path, threshold=DEFAULT_THRESHOLD, chunk_size=10000):
+    """Keep only canonical reviews in a cleaned review file; returns (reviews kept, duplicates).
+
+    The duplicate clusters, canonical reviews included, go to an audit file next to it (see
+    duplicates_path); a stale audit file is removed when there are no duplicates.
+    """
+    parts = [review_keys(chunk) for chunk in read_table_chunks(path, columns=['Content'], chunk_size=chunk_size)]
+    keys = {name: np.concatenate([part[name] for part in parts]) if parts else np.zeros(0)
+            for name in ['exact', 'prefix', 'length', 'shingles']}
+    keys['signature'] = (np.concatenate([part['signature'] for part in parts]) if parts
+                         else np.zeros((0, NUM_PERM), dtype=np.uint32))
+    clusters = find_duplicates(keys, threshold)
+    audit = duplicates_path(path)
+    dropped = clusters.index[clusters['kind'] != 'canonical']
+    if not len(dropped):
+        if os.path.exists(audit):
+            os.remove(audit)
+        return len(keys['exact']), 0
+
+    drop = np.zeros(len(keys['exact']), dtype=bool)
+    drop[dropped] = True
+    start = 0
+    with TableWriter(path, schema_for(path)) as kept, TableWriter(audit, schema_for(audit)) as duplicates:
+        for chunk in read_table_chunks(path, chunk_size=chunk_size):
+            rows = np.arange(start, start + len(chunk))
+            start += len(chunk)
+            kept.write(chunk[~drop[rows]])
+            listed = clusters.index.intersection(rows)
+            if len(listed):
+                found = clusters.loc[listed]
+                duplicates.write(pd.concat([found.reset_index(), chunk.iloc[listed - rows[0]].reset_index(drop=True)],
+                                           axis=1))
+    return kept.rows, len(dropped)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Remove exact and near-duplicate reviews from cleaned review files.')
+    parser.add_argument('files', nargs='+', help='cleaned review files, rewritten in place')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='similarity from which two reviews are duplicates (0 to 1)')
+    args = parser.parse_args()
+
+    for path in args.files:
+        start = time.perf_counter()
+        kept, dropped = dedupe_review_file(path, args.threshold)
+        elapsed = time.perf_counter() - start
+        print(f"{os.path.basename(path)}: kept {kept} reviews, removed {dropped} duplicates in {elapsed:.2f}s"
+              + (f" (clusters in {os.path.basename(duplicates_path(path))})" if dropped else ''))
+
+
+if __name__ == "__main__":
+    main()
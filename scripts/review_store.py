@@ -0,0 +1,287 @@
+import io
+import os
+import sys
+import sqlite3
+import argparse
+import numpy as np
+import pandas as pd
+from data_cleaning_reviews import find_review_files, normalize_rating
+from polarity_engine import analyzer_version, classify, score_chunk
+from review_dedup import DEFAULT_THRESHOLD, NUM_PERM, band_keys, find_duplicates, review_keys, similarity
+
+# Append-only store of scored reviews with running per-movie aggregates. Scrapers append
+# rows to the raw imdbreviews_<movie>.csv files; each movie keeps a watermark (rows and
+# bytes of its file already ingested), so an ingest reads, cleans and scores only the rows
+# appended since, and folds them into the movie's counts and sums. Summaries are one
+# primary-key lookup. verify() recomputes the aggregates from the stored reviews.
+# Appended reviews that duplicate a stored one, or each other, are not stored again (see
+# review_dedup.py), so the store scores the same reviews as the cleaned files. Each stored
+# review keeps its MinHash signature and its buckets (exact text, opening, LSH bands), so
+# new reviews are only compared with the stored reviews sharing a bucket.
+REVIEW_PREFIX = 'imdbreviews_'
+SENTIMENTS = ['positive', 'neutral', 'negative']
+# Relative difference tolerated between running and recomputed sums (floating-point order)
+SUM_TOLERANCE = 1e-9
+
+
+def movie_key(filename):
+    """Movie name of a raw or cleaned review file, e.g. 'cleaned_imdbreviews_saw2004.csv' -> 'saw2004'."""
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    return stem[stem.index(REVIEW_PREFIX) + len(REVIEW_PREFIX):] if REVIEW_PREFIX in stem else stem
+
+
+def default_store_path(data_dir):
+    """Location of the review store next to the review data."""
+    return os.path.join(data_dir, 'review_store.sqlite')
+
+
+def read_appended_rows(path, offset):
+    """Rows of a CSV file after byte offset (0 = all rows); returns (rows, end offset).
+
+    The header is read from the start of the file, so only the appended bytes are parsed.
+    """
+    with open(path, 'rb') as f:
+        header = f.readline()
+        start = max(offset, len(header))
+        f.seek(start)
+        tail = f.read()
+    rows = pd.read_csv(io.BytesIO(header + tail)) if tail.strip() else pd.read_csv(io.BytesIO(header))
+    return rows, start + len(tail)
+
+
+class ReviewStore:
+    """SQLite store of scored reviews plus one row of running aggregates per movie."""
+
+    def __init__(self, path, method='batch', dedupe_threshold=DEFAULT_THRESHOLD):
+        self.path = path
+        self.method = method
+        # None stores duplicate reviews too
+        self.dedupe_threshold = dedupe_threshold
+        # Other scores or another threshold (other reviews kept) mean a movie starts over
+        self.version = f'{analyzer_version(method)}; dedupe {dedupe_threshold}'
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS reviews (movie TEXT, seq INTEGER, title TEXT, date TEXT, '
+                                'rating REAL, content TEXT, polarity REAL, sentiment TEXT, '
+                                'PRIMARY KEY (movie, seq))')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS movies (movie TEXT PRIMARY KEY, source TEXT, '
+                                'version TEXT, watermark_rows INTEGER, watermark_bytes INTEGER, '
+                                'reviews INTEGER, positive INTEGER, neutral INTEGER, negative INTEGER, '
+                                'polarity_sum REAL, polarity_sumsq REAL, rating_sum REAL)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS review_keys (movie TEXT, seq INTEGER, exact INTEGER, '
+                                'shingles INTEGER, signature BLOB, PRIMARY KEY (movie, seq))')
+        # kind 0: exact text, 1: opening, 2 + b: LSH band b
+        self.connection.execute('CREATE TABLE IF NOT EXISTS review_buckets (movie TEXT, kind INTEGER, key INTEGER, '
+                                'seq INTEGER)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS review_buckets_key ON review_buckets (movie, kind, key)')
+        self.connection.execute('CREATE TEMP TABLE probe (row INTEGER, kind INTEGER, key INTEGER)')
+
+    def _movie(self, movie):
+        return self.connection.execute('SELECT * FROM movies WHERE movie = ?', (movie,)).fetchone()
+
+    def ingest(self, path, movie=None):
+        """Clean, score and store the rows appended to a raw review file; returns the reviews added."""
+        movie = movie or movie_key(path)
+        record = self._movie(movie)
+        if record is not None and (record[2] != self.version or os.path.getsize(path) < record[4]):
+            # Scores from another analyzer or dedupe threshold, or a rewritten file: start the movie over
+            print(f"{movie}: analyzer, dedupe threshold or source file changed since the last ingest, rebuilding.")
+            self.drop(movie)
+            record = None
+        rows_seen, offset = (record[3], record[4]) if record is not None else (0, 0)
+        stored = record[5] if record is not None else 0
+        rows, end = read_appended_rows(path, offset)
+
+        # Same cleaning and deduplication as data_cleaning_reviews.clean_review_file
+        new = rows.assign(Rating=normalize_rating(rows['Rating'])).dropna()
+        keys = None
+        if len(new) and self.dedupe_threshold is not None:
+            keys = review_keys(new)
+            keep = self._unique(movie, keys)
+            new = new[keep]
+            keys = {name: values[keep] for name, values in keys.items()}
+        polarity = score_chunk(new['Content'].astype(str).tolist(), self.method) if len(new) else np.zeros(0)
+        sentiment = classify(polarity)
+        counts = [int((sentiment == label).sum()) for label in SENTIMENTS]
+        ratings = new['Rating'].to_numpy(dtype=float)
+
+        with self.connection:
+            # Reviews, aggregates and watermark change in one transaction
+            self.connection.executemany(
+                'INSERT INTO reviews VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                zip([movie] * len(new), range(stored, stored + len(new)), new['Title'].astype(str),
+                    new['Date'].astype(str), ratings.tolist(), new['Content'].astype(str),
+                    polarity.tolist(), sentiment.tolist()))
+            if keys is not None:
+                self._store_keys(movie, range(stored, stored + len(new)), keys)
+            self.connection.execute(
+                'INSERT INTO movies VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (movie) DO UPDATE SET '
+                'source = excluded.source, watermark_rows = excluded.watermark_rows, '
+                'watermark_bytes = excluded.watermark_bytes, reviews = reviews + excluded.reviews, '
+                'positive = positive + excluded.positive, neutral = neutral + excluded.neutral, '
+                'negative = negative + excluded.negative, polarity_sum = polarity_sum + excluded.polarity_sum, '
+                'polarity_sumsq = polarity_sumsq + excluded.polarity_sumsq, '
+                'rating_sum = rating_sum + excluded.rating_sum',
+                (movie, os.path.abspath(path), self.version, rows_seen + len(rows), end, len(new), *counts,
+                 float(polarity.sum()), float((polarity ** 2).sum()), float(ratings.sum())))
+        return len(new)
+
+    def _buckets(self, keys):
+        """(row, kind, key) of every bucket of the reviews; reviews too short for an opening have none."""
+        columns = np.column_stack([keys['exact'], keys['prefix'], band_keys(keys['signature'], self.dedupe_threshold)])
+        row, kind = np.indices(columns.shape)
+        listed = (kind != 1) | (columns != 0)
+        return zip(row[listed].tolist(), kind[listed].tolist(), columns.view(np.int64)[listed].tolist())
+
+    def _store_keys(self, movie, seqs, keys):
+        self.connection.executemany(
+            'INSERT INTO review_keys VALUES (?, ?, ?, ?, ?)',
+            zip([movie] * len(seqs), seqs, keys['exact'].view(np.int64).tolist(), keys['shingles'].tolist(),
+                (signature.tobytes() for signature in keys['signature'])))
+        self.connection.executemany('INSERT INTO review_buckets VALUES (?, ?, ?, ?)',
+                                    ((movie, kind, key, seqs[row]) for row, kind, key in self._buckets(keys)))
+
+    def _stored_duplicates(self, movie, keys):
+        """Mask of the new reviews that duplicate a stored review, from the stored reviews sharing a bucket."""
+        self.connection.execute('DELETE FROM probe')
+        self.connection.executemany('INSERT INTO probe VALUES (?, ?, ?)', self._buckets(keys))
+        # CROSS JOIN keeps the new reviews' buckets as the outer loop, so each is one index lookup
+        pairs = self.connection.execute(
+            'SELECT DISTINCT p.row, k.seq, k.exact, k.shingles, k.signature FROM probe p '
+            'CROSS JOIN review_buckets b ON b.movie = ? AND b.kind = p.kind AND b.key = p.key '
+            'JOIN review_keys k ON k.movie = b.movie AND k.seq = b.seq', (movie,)).fetchall()
+        matched = np.zeros(len(keys['exact']), dtype=bool)
+        if not pairs:
+            return matched
+        row, _, exact, shingles, signature = zip(*pairs)
+        row = np.array(row)
+        stored_signature = np.frombuffer(b''.join(signature), dtype=np.uint32).reshape(len(pairs), NUM_PERM)
+        pair_keys = {'signature': np.concatenate([keys['signature'][row], stored_signature]),
+                     'shingles': np.concatenate([keys['shingles'][row], shingles])}
+        n = len(pairs)
+        duplicate = ((keys['exact'].view(np.int64)[row] == np.array(exact, dtype=np.int64))
+                     | (similarity(pair_keys, np.arange(n), np.arange(n, 2 * n)) >= self.dedupe_threshold))
+        matched[row[duplicate]] = True
+        return matched
+
+    def _unique(self, movie, keys):
+        """Mask of the new reviews to store: the canonical one of duplicates among themselves
+        (as review_dedup.find_duplicates picks), unless a stored review duplicates any of them."""
+        n = len(keys['exact'])
+        clusters = find_duplicates(keys, self.dedupe_threshold)
+        group = np.arange(n)
+        group[clusters.index.to_numpy(dtype=np.int64)] = clusters['canonical'].to_numpy(dtype=np.int64)
+        keep = group == np.arange(n)
+        # Stored reviews stay: a cluster with a duplicate of one of them keeps none of the new reviews
+        matched = self._stored_duplicates(movie, keys)
+        return keep & ~np.isin(group, group[matched])
+
+    def ingest_directory(self, data_dir):
+        """Ingest every raw review file of a data directory; returns reviews added per movie."""
+        return {movie_key(path): self.ingest(path) for path in find_review_files(data_dir)}
+
+    def summary(self, movie):
+        """Current sentiment summary of a movie from its running aggregates, or None if unknown."""
+        record = self._movie(movie)
+        if record is None:
+            return None
+        n, positive, neutral, negative, polarity_sum, polarity_sumsq, rating_sum = record[5:]
+        variance = (polarity_sumsq - polarity_sum ** 2 / n) / (n - 1) if n > 1 else 0.0
+        return {
+            'movie': movie, 'reviews': n, 'ingested_rows': record[3],
+            'sentiment_counts': dict(zip(SENTIMENTS, (positive, neutral, negative))),
+            'sentiment_share': {label: count / n if n else 0.0
+                                for label, count in zip(SENTIMENTS, (positive, neutral, negative))},
+            'mean_polarity': polarity_sum / n if n else float('nan'),
+            'polarity_std': max(variance, 0.0) ** 0.5,
+            'mean_rating': rating_sum / n if n else float('nan'),
+        }
+
+    def movies(self):
+        return [row[0] for row in self.connection.execute('SELECT movie FROM movies ORDER BY movie')]
+
+    def reviews(self, movie):
+        """Stored reviews of a movie in ingestion order, with the columns of a scored review file."""
+        return pd.read_sql_query('SELECT title AS Title, date AS Date, rating AS Rating, content AS Content, '
+                                 'polarity AS Polarity, sentiment AS Sentiment_Type FROM reviews '
+                                 'WHERE movie = ? ORDER BY seq', self.connection, params=(movie,))
+
+    def verify(self):
+        """Movies whose running aggregates disagree with the ones recomputed from their reviews."""
+        recomputed = {row[0]: row[1:] for row in self.connection.execute(
+            "SELECT movie, COUNT(*), SUM(sentiment = 'positive'), SUM(sentiment = 'neutral'), "
+            "SUM(sentiment = 'negative'), SUM(polarity), SUM(polarity * polarity), SUM(rating) "
+            "FROM reviews GROUP BY movie")}
+        mismatched = []
+        for record in self.connection.execute('SELECT * FROM movies'):
+            expected = recomputed.get(record[0], (0, 0, 0, 0, 0.0, 0.0, 0.0))
+            running = record[5:]
+            counts_match = tuple(running[:4]) == tuple(expected[:4])
+            sums_match = all(abs(a - (b or 0.0)) <= SUM_TOLERANCE * max(1.0, abs(a))
+                             for a, b in zip(running[4:], expected[4:]))
+            if not (counts_match and sums_match):
+                mismatched.append(record[0])
+        return mismatched
+
+    def drop(self, movie):
+        with self.connection:
+            self.connection.execute('DELETE FROM reviews WHERE movie = ?', (movie,))
+            self.connection.execute('DELETE FROM review_keys WHERE movie = ?', (movie,))
+            self.connection.execute('DELETE FROM review_buckets WHERE movie = ?', (movie,))
+            self.connection.execute('DELETE FROM movies WHERE movie = ?', (movie,))
+
+    def rebuild(self, movie):
+        """Drop a movie and ingest its source file again from the first row."""
+        record = self._movie(movie)
+        if record is None:
+            raise ValueError(f"{movie}: not in the store")
+        source = record[1]
+        self.drop(movie)
+        return self.ingest(source, movie)
+
+    def close(self):
+        self.connection.close()
+
+
+def print_summary(summary):
+    shares = ', '.join(f"{label} {share:.1%}" for label, share in summary['sentiment_share'].items())
+    print(f"{summary['movie']}: {summary['reviews']} reviews ({shares}); mean polarity "
+          f"{summary['mean_polarity']:.3f} (sd {summary['polarity_std']:.3f}), mean rating {summary['mean_rating']:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Incremental review store with running per-movie sentiment.')
+    parser.add_argument('command', nargs='?', default='ingest', choices=['ingest', 'summary', 'verify', 'rebuild'],
+                        help='ingest new reviews (default), print summaries, check or rebuild the aggregates')
+    parser.add_argument('movies', nargs='*', help='movies to summarize or rebuild (default: all)')
+    parser.add_argument('--method', choices=['batch', 'textblob'], default='batch', help='polarity analyzer')
+    args = parser.parse_args()
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    data_dir = os.path.normpath(os.path.join(script_dir, '../data'))
+    store = ReviewStore(default_store_path(data_dir), args.method)
+    if args.command == 'ingest':
+        for movie, added in store.ingest_directory(data_dir).items():
+            print(f"{movie}: {added} new reviews")
+    elif args.command == 'rebuild':
+        for movie in args.movies or store.movies():
+            try:
+                print(f"{movie}: rebuilt from {store.rebuild(movie)} reviews")
+            except ValueError as error:
+                print(error)
+    elif args.command == 'verify':
+        mismatched = store.verify()
+        print(f"Aggregates of {len(store.movies()) - len(mismatched)} of {len(store.movies())} movies match "
+              f"their reviews" + (f"; mismatched: {', '.join(mismatched)}" if mismatched else ''))
+        store.close()
+        sys.exit(1 if mismatched else 0)
+    for movie in args.movies or store.movies():
+        summary = store.summary(movie)
+        if summary is None:
+            print(f"{movie}: not in the store")
+        else:
+            print_summary(summary)
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import subprocess
+import numpy as np
+from scoring_server import DEFAULT_HOST, DEFAULT_PORT, read_message
+
+# Load generator for scoring_server.py: many concurrent keep-alive clients send small
+# scoring requests built from the bundled reviews, then client-side and server-side
+# throughput and latency are reported. --spawn starts a server for the run.
+
+
+def load_reviews():
+    import sentiment_analysis as sa
+    return [text for filename, _ in sa.file_paths_and_titles
+            for text in sa.read_review_file(sa.data_dir, filename)['Content'].astype(str)]
+
+
+class Client:
+    """One keep-alive HTTP connection to the scoring server."""
+
+    def __init__(self, host, port, unix_socket=None):
+        self.host, self.port, self.unix_socket = host, port, unix_socket
+
+    async def connect(self):
+        if self.unix_socket:
+            self.reader, self.writer = await asyncio.open_unix_connection(self.unix_socket)
+        else:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        return self
+
+    async def request(self, method, path, payload=None):
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        self.writer.write(f'{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Type: application/json\r\n'
+                          f'Content-Length: {len(body)}\r\n\r\n'.encode('latin-1') + body)
+        await self.writer.drain()
+        start_line, _, response = await read_message(self.reader)
+        if ' 200 ' not in start_line + ' ':
+            raise RuntimeError(f'{start_line}: {response.decode("utf-8", "replace")}')
+        return json.loads(response)
+
+    def close(self):
+        self.writer.close()
+
+
+async def run_load(host, port, unix_socket, reviews, concurrency, requests, batch, seed=0):
+    """Send `requests` requests of `batch` reviews over `concurrency` connections."""
+    rng = np.random.default_rng(seed)
+    payloads = [[reviews[i] for i in rng.integers(0, len(reviews), batch)] for _ in range(min(requests, 1000))]
+    remaining = iter(range(requests))
+    latencies = []
+
+    async def worker():
+        client = await Client(host, port, unix_socket).connect()
+        for i in remaining:
+            start = time.perf_counter()
+            response = await client.request('POST', '/score', {'texts': payloads[i % len(payloads)]})
+            latencies.append(time.perf_counter() - start)
+            assert len(response['polarity']) == batch
+        client.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    stats_client = await Client(host, port, unix_socket).connect()
+    server_stats = await stats_client.request('GET', '/stats')
+    stats_client.close()
+    p50, p99 = np.percentile(latencies, [50, 99]) * 1000
+    return {
+        'requests': requests, 'concurrency': concurrency, 'reviews_per_request': batch,
+        'seconds': round(elapsed, 3), 'requests_per_s': round(requests / elapsed, 1),
+        'reviews_per_s': round(requests * batch / elapsed, 1),
+        'client_p50_ms': round(float(p50), 3), 'client_p99_ms': round(float(p99), 3),
+        'server': server_stats,
+    }
+
+
+async def wait_until_ready(host, port, unix_socket, timeout=60):
+    deadline = time.perf_counter() + timeout
+    while True:
+        try:
+            client = await Client(host, port, unix_socket).connect()
+            await client.request('GET', '/health')
+            client.close()
+            return
+        except (ConnectionError, FileNotFoundError):
+            if time.perf_counter() > deadline:
+                raise
+            await asyncio.sleep(0.2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent load generator for scoring_server.py.')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--unix-socket', help='connect to this Unix socket instead of a TCP port')
+    parser.add_argument('--concurrency', type=int, default=32, help='concurrent client connections')
+    parser.add_argument('--requests', type=int, default=2000, help='requests to send in total')
+    parser.add_argument('--batch', type=int, default=4, help='reviews per request')
+    parser.add_argument('--spawn', action='store_true', help='start a scoring server for the run and stop it after')
+    parser.add_argument('--max-wait-ms', type=float, default=None, help='max wait of the spawned server')
+    args = parser.parse_args()
+
+    server = None
+    if args.spawn:
+        command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scoring_server.py'),
+                   '--host', args.host, '--port', str(args.port), '--no-cache']
+        if args.unix_socket:
+            command += ['--unix-socket', args.unix_socket]
+        if args.max_wait_ms is not None:
+            command += ['--max-wait-ms', str(args.max_wait_ms)]
+        server = subprocess.Popen(command)
+    try:
+        asyncio.run(wait_until_ready(args.host, args.port, args.unix_socket))
+        results = asyncio.run(run_load(args.host, args.port, args.unix_socket, load_reviews(),
+                                       args.concurrency, args.requests, args.batch))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
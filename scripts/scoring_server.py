@@ -0,0 +1,230 @@
+import os
+import json
+import time
+import asyncio
+import argparse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from polarity_cache import PolarityCache, cached_scores, default_cache_path
+from polarity_engine import analyzer_version, classify, score_chunk
+
+# Long-running sentiment scoring service. Clients POST {"texts": [...]} to /score and get
+# {"polarity": [...], "sentiment": [...]} back; GET /stats returns throughput and latency.
+# Concurrent requests are coalesced into micro-batches so the vectorized engine scores
+# many small requests in one call, while the analyzer stays loaded between requests.
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+DEFAULT_MAX_BATCH = 5000
+DEFAULT_MAX_WAIT_MS = 5.0
+# Latencies kept for the percentiles reported by /stats
+LATENCY_WINDOW = 10000
+
+
+class ScoringStats:
+    """Throughput and latency counters of the server."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.first_request = None
+        self.requests = 0
+        self.reviews = 0
+        self.batches = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+
+    def record_batch(self, reviews):
+        self.batches += 1
+        self.reviews += reviews
+
+    def record_request(self, seconds):
+        if self.first_request is None:
+            self.first_request = time.perf_counter() - seconds
+        self.requests += 1
+        self.latencies.append(seconds)
+
+    def snapshot(self):
+        now = time.perf_counter()
+        uptime = now - self.started
+        # Rates are over the time spent serving, not the idle time before the first request
+        busy = now - self.first_request if self.first_request is not None else 0.0
+        p50, p99 = np.percentile(self.latencies, [50, 99]) * 1000 if self.latencies else (0.0, 0.0)
+        return {
+            'uptime_s': round(uptime, 3), 'requests': self.requests, 'reviews': self.reviews,
+            'batches': self.batches, 'mean_batch_reviews': round(self.reviews / self.batches, 1) if self.batches else 0,
+            'reviews_per_s': round(self.reviews / busy, 1) if busy else 0.0,
+            'requests_per_s': round(self.requests / busy, 1) if busy else 0.0,
+            'p50_ms': round(float(p50), 3), 'p99_ms': round(float(p99), 3),
+        }
+
+
+class MicroBatcher:
+    """Queue of scoring requests drained in batches of up to max_batch reviews.
+
+    A batch is scored as soon as it is full, or max_wait after its first request arrived.
+    Scoring runs on one background thread, which also owns the polarity cache.
+    """
+
+    def __init__(self, method='batch', max_batch=DEFAULT_MAX_BATCH, max_wait=DEFAULT_MAX_WAIT_MS / 1000,
+                 cache_path=None):
+        self.method = method
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.cache_path = cache_path
+        self.cache = None
+        self.queue = asyncio.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.stats = ScoringStats()
+
+    def warm_up(self):
+        """Load the lexicon (and open the cache) before the first request arrives."""
+        if self.cache_path:
+            self.cache = PolarityCache(self.cache_path, analyzer_version(self.method))
+        self.score(['warm up'])
+
+    def score(self, texts):
+        if self.cache is not None:
+            return cached_scores(texts, lambda misses: score_chunk(misses, self.method), self.cache)
+        return score_chunk(texts, self.method)
+
+    async def submit(self, texts):
+        """Score a request's reviews; resolves once the batch holding them is scored."""
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((texts, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self.warm_up)
+        while True:
+            batch = [await self.queue.get()]
+            size = len(batch[0][0])
+            deadline = loop.time() + self.max_wait
+            while size < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+                size += len(batch[-1][0])
+            texts = [text for request, _ in batch for text in request]
+            try:
+                polarity = await loop.run_in_executor(self.executor, self.score, texts)
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.stats.record_batch(len(texts))
+            start = 0
+            for request, future in batch:
+                # A client that disconnected meanwhile has cancelled its future
+                if not future.done():
+                    future.set_result(polarity[start:start + len(request)])
+                start += len(request)
+
+
+async def read_message(reader):
+    """Read one HTTP/1.1 message; returns (start line, headers, body) or None at end of stream."""
+    start_line = await reader.readline()
+    if not start_line:
+        return None
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers.get('content-length', 0)))
+    return start_line.decode('latin-1').strip(), headers, body
+
+
+def encode_response(status, payload):
+    body = json.dumps(payload).encode('utf-8')
+    return (f'HTTP/1.1 {status}\r\nContent-Type: application/json\r\n'
+            f'Content-Length: {len(body)}\r\n\r\n').encode('latin-1') + body
+
+
+class ScoringServer:
+    """HTTP front end of a MicroBatcher, on a TCP port or a Unix socket."""
+
+    def __init__(self, batcher):
+        self.batcher = batcher
+
+    async def handle(self, start_line, body):
+        method, path = start_line.split()[:2]
+        if method == 'POST' and path == '/score':
+            started = time.perf_counter()
+            texts = json.loads(body)['texts']
+            texts = [text if isinstance(text, str) else '' for text in texts]
+            polarity = await self.batcher.submit(texts)
+            self.batcher.stats.record_request(time.perf_counter() - started)
+            return '200 OK', {'polarity': polarity.tolist(), 'sentiment': classify(polarity).tolist()}
+        if method == 'GET' and path == '/stats':
+            return '200 OK', self.batcher.stats.snapshot()
+        if method == 'GET' and path == '/health':
+            return '200 OK', {'status': 'ok', 'analyzer': analyzer_version(self.batcher.method)}
+        return '404 Not Found', {'error': f'no route for {method} {path}'}
+
+    async def connection(self, reader, writer):
+        """Serve requests on one keep-alive connection until the client closes it."""
+        try:
+            while True:
+                message = await read_message(reader)
+                if message is None:
+                    break
+                try:
+                    status, payload = await self.handle(message[0], message[2])
+                except (ValueError, KeyError, TypeError) as e:
+                    status, payload = '400 Bad Request', {'error': repr(e)}
+                except Exception as e:
+                    # Scoring failures still get a reply, and the connection stays usable
+                    status, payload = '500 Internal Server Error', {'error': repr(e)}
+                writer.write(encode_response(status, payload))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host=DEFAULT_HOST, port=DEFAULT_PORT, unix_socket=None):
+        self.batcher_task = asyncio.create_task(self.batcher.run())
+        if unix_socket:
+            return await asyncio.start_unix_server(self.connection, path=unix_socket)
+        return await asyncio.start_server(self.connection, host, port)
+
+
+async def serve(host, port, unix_socket, batcher):
+    server = await ScoringServer(batcher).start(host, port, unix_socket)
+    where = unix_socket or f'http://{host}:{port}'
+    print(f"Scoring server listening on {where} (max batch {batcher.max_batch}, "
+          f"max wait {batcher.max_wait * 1000:g} ms)")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local sentiment scoring server with micro-batching.')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--unix-socket', help='listen on this Unix socket path instead of a TCP port')
+    parser.add_argument('--max-batch', type=int, default=DEFAULT_MAX_BATCH, help='reviews scored per batch at most')
+    parser.add_argument('--max-wait-ms', type=float, default=DEFAULT_MAX_WAIT_MS,
+                        help='how long a request may wait for others to join its batch')
+    parser.add_argument('--method', choices=['batch', 'textblob'], default='batch', help='polarity analyzer')
+    parser.add_argument('--no-cache', action='store_true', help='do not use the persistent polarity cache')
+    args = parser.parse_args()
+
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    cache_path = None if args.no_cache else default_cache_path(os.path.join(script_dir, '../data'))
+    batcher = MicroBatcher(args.method, args.max_batch, args.max_wait_ms / 1000, cache_path)
+    try:
+        asyncio.run(serve(args.host, args.port, args.unix_socket, batcher))
+    except KeyboardInterrupt:
+        print("\nFinal stats:", json.dumps(batcher.stats.snapshot()))
+
+
+if __name__ == "__main__":
+    main()
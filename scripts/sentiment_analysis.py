@@ -1,18 +1,38 @@
 import os
+import argparse
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-from textblob import TextBlob
+from functools import partial
+from polarity_cache import PolarityCache, cached_scores, default_cache_path
+from distributions import Distribution, plot_histogram
+from figures import show_figure
+from storage import find_table, read_table
+from polarity_engine import DEFAULT_CHUNK_SIZE, analyzer_version, classify, get_engine, score_chunk, score_in_parallel
+from profiling import profiled
+from review_store import ReviewStore, default_store_path, movie_key, print_summary as print_store_summary
 
 # Function to analyze sentiment using TextBlob
-def analyze_sentiment_textblob(reviews):
-    reviews['Polarity'] = reviews['Content'].apply(lambda review: TextBlob(review).sentiment.polarity)
-    reviews['Sentiment_Type'] = reviews['Polarity'].apply(
-        lambda p: 'positive' if p > 0 else ('negative' if p < 0 else 'neutral'))
+# method='batch' scores the whole column at once with the TextBlob lexicon (see polarity_engine.py),
+# method='textblob' builds a TextBlob per review and gives the exact reference scores.
+# With a PolarityCache only reviews not scored before are passed to the analyzer.
+@profiled
+def analyze_sentiment_textblob(reviews, method='batch', cache=None):
+    if cache is not None:
+        reviews['Polarity'] = cached_scores(reviews['Content'], partial(score_chunk, method=method), cache)
+        reviews['Sentiment_Type'] = classify(reviews['Polarity'])
+    elif method == 'textblob':
+        from textblob import TextBlob
+        reviews['Polarity'] = reviews['Content'].apply(lambda review: TextBlob(review).sentiment.polarity)
+        reviews['Sentiment_Type'] = classify(reviews['Polarity'])
+    else:
+        get_engine().analyze(reviews)
     return reviews
 
 # Function to visualize sentiment analysis
-def visualize_sentiment_analysis(results, title):
+@profiled
+def visualize_sentiment_analysis(results, title, suffix=''):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
     # Sentiment Distribution (with custom colors)
     plt.figure(figsize=(10, 5))
 
@@ -34,7 +54,7 @@ def visualize_sentiment_analysis(results, title):
         plt.gca().text(p.get_x() + p.get_width() / 2., height + 2, f'{height}\n({percentage})', ha="center",
                        va="bottom")
 
-    plt.show()
+    show_figure(f'sentiment{suffix}')
 
     # Print sentiment type counts
     sentiment_counts = results['Sentiment_Type'].value_counts(normalize=True) * 100
@@ -43,14 +63,18 @@ def visualize_sentiment_analysis(results, title):
 
     # Sentiment Score Distribution
     plt.figure(figsize=(10, 5))
-    sns.histplot(results['Polarity'], kde=True, bins=30)
+    # Drawn from a binned summary: the KDE is an FFT convolution of the grid counts, not a kernel per review
+    plot_histogram(Distribution.of(results['Polarity'], name='Polarity'), bins=30)
     plt.title(f'Distribution of Sentiment Scores for {title}')
     plt.xlabel('Polarity Score')
     plt.ylabel('Frequency')
-    plt.show()
+    show_figure(f'sentimentscore{suffix}')
 
 # Function to plot sentiment vs ratings
-def plot_sentiment_vs_ratings(reviews, title):
+@profiled
+def plot_sentiment_vs_ratings(reviews, title, suffix=''):
+    import matplotlib.pyplot as plt
+    import seaborn as sns
     average_sentiment = reviews['Polarity'].mean()
     average_rating = reviews['Rating'].mean()
 
@@ -60,19 +84,53 @@ def plot_sentiment_vs_ratings(reviews, title):
     plt.xlabel('Average Sentiment Score')
     plt.ylabel('Average Movie Rating')
     plt.grid(True)
-    plt.show()
+    show_figure(f'sentimentvsrating{suffix}')
 
     # Print average sentiment and rating
     print(f"\nAverage Sentiment Score for {title}: {average_sentiment:.2f}")
     print(f"Average Rating for {title}: {average_rating:.2f}")
 
+# Function to read a cleaned review file, in whichever storage format it was written
+@profiled
+def read_review_file(data_dir, filename):
+    return read_table(find_table(data_dir, os.path.splitext(filename)[0]))
+
 # Function to process movie reviews
-def process_movie_reviews(data_dir, filename, title):
-    file_path = os.path.join(data_dir, filename)
-    reviews = pd.read_csv(file_path)
-    sentiment_reviews = analyze_sentiment_textblob(reviews)
-    visualize_sentiment_analysis(sentiment_reviews, title)
-    plot_sentiment_vs_ratings(sentiment_reviews, title)
+@profiled
+def process_movie_reviews(data_dir, filename, title, cache=None):
+    reviews = read_review_file(data_dir, filename)
+    sentiment_reviews = analyze_sentiment_textblob(reviews, cache=cache)
+    suffix = figure_suffixes.get(filename, '')
+    visualize_sentiment_analysis(sentiment_reviews, title, suffix)
+    plot_sentiment_vs_ratings(sentiment_reviews, title, suffix)
+
+# Function to score all review files together in a process pool
+# Reviews of every file are pooled, split into chunks of chunk_size and scored by `workers` processes.
+# Polarity and Sentiment_Type are merged back in the original order, matching the serial path.
+@profiled
+def analyze_reviews_parallel(data_dir, filenames, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, method='batch',
+                             cache=None):
+    frames = [read_review_file(data_dir, filename) for filename in filenames]
+    contents = [review for reviews in frames for review in reviews['Content']]
+    score = partial(score_in_parallel, workers=workers, chunk_size=chunk_size, method=method)
+    polarity = cached_scores(contents, score, cache) if cache is not None else score(contents)
+    offsets = np.cumsum([0] + [len(reviews) for reviews in frames])
+    for reviews, start, end in zip(frames, offsets[:-1], offsets[1:]):
+        reviews['Polarity'] = polarity[start:end]
+        reviews['Sentiment_Type'] = classify(reviews['Polarity'])
+    return frames
+
+# Function to update the review store with newly scraped reviews and plot from it
+# Only reviews appended to the raw file since the last run are cleaned and scored; the summary
+# comes from the store's running aggregates and the figures from its stored scores.
+def process_movie_reviews_incremental(store, data_dir, filename, title):
+    added = store.ingest(os.path.join(data_dir, filename.replace('cleaned_', '', 1)))
+    print(f"\n{title}: {added} new reviews scored")
+    print_store_summary(store.summary(movie_key(filename)))
+    reviews = store.reviews(movie_key(filename))
+    suffix = figure_suffixes.get(filename, '')
+    visualize_sentiment_analysis(reviews, title, suffix)
+    plot_sentiment_vs_ratings(reviews, title, suffix)
 
 # Define the data directory relative to the script location
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -85,6 +143,49 @@ file_paths_and_titles = [
     ('cleaned_imdbreviews_3idiots2009.csv', '3 Idiots (2009)')
 ]
 
-# Process each movie review dataset
-for filename, title in file_paths_and_titles:
-    process_movie_reviews(data_dir, filename, title)
+# Suffixes of the saved figure names, e.g. plots/sentimentlk.png
+figure_suffixes = {
+    'cleaned_imdbreviews_thelionking1994.csv': 'lk',
+    'cleaned_imdbreviews_saw2004.csv': 'saw',
+    'cleaned_imdbreviews_3idiots2009.csv': '3i',
+}
+
+def main():
+    parser = argparse.ArgumentParser(description='Sentiment analysis of IMDb user reviews.')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='worker processes for scoring (1 = serial, 0 = one per CPU core)')
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE,
+                        help='reviews per chunk in parallel mode')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='rescore every review instead of reusing cached polarity scores')
+    parser.add_argument('--incremental', action='store_true',
+                        help='score only reviews appended to the raw files since the last run (see review_store.py)')
+    args = parser.parse_args()
+
+    if args.incremental:
+        store = ReviewStore(default_store_path(data_dir))
+        for filename, title in file_paths_and_titles:
+            process_movie_reviews_incremental(store, data_dir, filename, title)
+        store.close()
+        return
+    cache = None if args.no_cache else PolarityCache(default_cache_path(data_dir), analyzer_version())
+
+    # Process each movie review dataset
+    if args.workers == 1:
+        for filename, title in file_paths_and_titles:
+            process_movie_reviews(data_dir, filename, title, cache=cache)
+    else:
+        filenames = [filename for filename, _ in file_paths_and_titles]
+        scored = analyze_reviews_parallel(data_dir, filenames, workers=args.workers or None,
+                                          chunk_size=args.chunk_size, cache=cache)
+        for reviews, (filename, title) in zip(scored, file_paths_and_titles):
+            visualize_sentiment_analysis(reviews, title, figure_suffixes.get(filename, ''))
+            plot_sentiment_vs_ratings(reviews, title, figure_suffixes.get(filename, ''))
+
+    if cache is not None:
+        stats = cache.stats()
+        print(f"\nPolarity cache: {stats['hits']} hits, {stats['misses']} misses, {stats['entries']} entries")
+        cache.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+import hashlib
+import os
+import sys
+import pandas as pd
+from profiling import profiled
+
+# Storage backend for the intermediate datasets written by data_cleaning.py,
+# data_cleaning_reviews.py and data_prepration.py. CSV stays the default; set the
+# MOVIE_DATA_FORMAT environment variable to 'parquet' or 'feather' (the Arrow IPC
+# file format) to write typed columnar files instead. Those need pyarrow, which is
+# an optional dependency: CSV works without it.
+FORMATS = {'csv': '.csv', 'parquet': '.parquet', 'feather': '.feather'}
+STORAGE_FORMAT = os.environ.get('MOVIE_DATA_FORMAT', 'csv')
+
+# Explicit column types per dataset. Columns not listed keep their inferred type.
+# Released_Year is stored as a nullable integer, so non-numeric years ('PG') become missing.
+SCHEMAS = {
+    'imdb_top_1000': {
+        'Poster_Link': 'string', 'Series_Title': 'string', 'Released_Year': 'Int16',
+        'Certificate': 'string', 'Runtime': 'string', 'Genre': 'string', 'IMDB_Rating': 'float64',
+        'Overview': 'string', 'Meta_score': 'float64', 'Director': 'string', 'Star1': 'string',
+        'Star2': 'string', 'Star3': 'string', 'Star4': 'string', 'No_of_Votes': 'int64', 'Gross': 'float64',
+    },
+    'rotten_tomatoes_movies_1': {
+        'movie_title': 'string', 'tomatometer_rating': 'float64', 'audience_rating': 'float64',
+        'original_release_date': 'datetime64[ns]', 'streaming_release_date': 'datetime64[ns]',
+        'actors': 'string',
+    },
+    'combined_data': {
+        'movie_title_imdb': 'string', 'Released_Year': 'Int16', 'Genre': 'string',
+        'IMDB_Rating': 'float64', 'Meta_score': 'float64', 'platform_imdb': 'string',
+        'movie_title_rt': 'string', 'tomatometer_rating': 'float64', 'audience_rating': 'float64',
+        'platform_rt': 'string', 'Gross_imdb': 'float64', 'title_match_score': 'float64',
+    },
+    'imdbreviews': {
+        'Title': 'string', 'Date': 'string', 'Rating': 'float64', 'Content': 'string',
+    },
+}
+
+
+def schema_for(name):
+    """Schema of a dataset from its file or stem name, e.g. 'cleaned_imdbreviews_saw2004.csv'."""
+    stem = os.path.splitext(os.path.basename(name))[0]
+    for dataset, schema in SCHEMAS.items():
+        if dataset in stem:
+            return schema
+    return {}
+
+
+def apply_schema(data, schema):
+    """Cast the columns of data to the types given in schema."""
+    for column, dtype in schema.items():
+        if column not in data:
+            continue
+        if dtype.startswith('datetime'):
+            data[column] = pd.to_datetime(data[column], errors='coerce')
+        elif dtype != 'string':
+            data[column] = pd.to_numeric(data[column], errors='coerce').astype(dtype)
+        else:
+            data[column] = data[column].astype(dtype)
+    return data
+
+
+def arrow_schema(schema, data):
+    """Explicit pyarrow schema for a frame, typed by schema where it lists a column."""
+    pa = _pyarrow()
+    inferred = pa.Schema.from_pandas(apply_schema(data.copy(), schema), preserve_index=False)
+    return pa.schema([field.with_type(pa.string()) if schema.get(field.name) == 'string' else field
+                      for field in inferred], metadata=inferred.metadata)
+
+
+def table_path(data_dir, stem, fmt=None):
+    """Path of a dataset in the given (or configured) storage format."""
+    return os.path.join(data_dir, stem + FORMATS[fmt or STORAGE_FORMAT])
+
+
+def find_table(data_dir, stem):
+    """Path of an existing dataset, preferring the configured format and falling back to CSV."""
+    for fmt in dict.fromkeys([STORAGE_FORMAT, 'parquet', 'feather', 'csv']):
+        path = table_path(data_dir, stem, fmt)
+        if os.path.exists(path):
+            return path
+    return table_path(data_dir, stem, 'csv')
+
+
+def table_filename(stem, data_dir=None):
+    """File name of an existing dataset in the data directory (see find_table)."""
+    if data_dir is None:
+        data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), '../data')
+    return os.path.basename(find_table(data_dir, stem))
+
+
+@profiled
+def read_table(path, columns=None):
+    """Read a dataset, loading only the requested columns.
+
+    Columnar files are memory-mapped, so only the projected columns are read from disk.
+    """
+    ext = os.path.splitext(path)[1]
+    if ext == '.parquet':
+        import pyarrow.parquet as pq
+        return pq.read_table(path, columns=columns, memory_map=True).to_pandas()
+    if ext == '.feather':
+        import pyarrow.feather as feather
+        return feather.read_table(path, columns=columns, memory_map=True).to_pandas()
+    return pd.read_csv(path, usecols=columns)
+
+
+def read_table_chunks(path, columns=None, chunk_size=100000):
+    """Read a dataset as a sequence of DataFrames of at most chunk_size rows."""
+    ext = os.path.splitext(path)[1]
+    if ext == '.parquet':
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path, memory_map=True).iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+    elif ext == '.feather':
+        import pyarrow.feather as feather
+        table = feather.read_table(path, columns=columns, memory_map=True)
+        for batch in table.to_batches(max_chunksize=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, usecols=columns, chunksize=chunk_size)
+
+
+@profiled
+def write_table(data, data_dir, stem, fmt=None, export_csv=False):
+    """Write a dataset with its explicit schema; optionally export a CSV copy too."""
+    fmt = fmt or STORAGE_FORMAT
+    path = table_path(data_dir, stem, fmt)
+    if fmt == 'csv':
+        data.to_csv(path, index=False)
+        return path
+    with TableWriter(path, schema_for(stem)) as writer:
+        writer.write(data)
+    if export_csv:
+        data.to_csv(table_path(data_dir, stem, 'csv'), index=False)
+    return path
+
+
+def file_digest(path):
+    """Content hash of a file, used to detect changed inputs and outputs."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            h.update(block)
+    return h.hexdigest()
+
+
+def export_csv(path):
+    """Export a columnar dataset to a CSV file next to it."""
+    csv_path = os.path.splitext(path)[0] + '.csv'
+    read_table(path).to_csv(csv_path, index=False)
+    return csv_path
+
+
+class TableWriter:
+    """Incremental writer: appends DataFrame chunks to a CSV, Parquet or Arrow IPC file."""
+
+    def __init__(self, path, schema=None):
+        self.path = path
+        self.schema = schema or {}
+        self.fmt = next(fmt for fmt, ext in FORMATS.items() if path.endswith(ext))
+        self.writer = None
+        self.rows = 0
+        self.header_written = False
+        # Write to a temporary file first so a failed run never leaves a half-written output behind
+        self.temp_path = path + '.tmp'
+
+    def __enter__(self):
+        if self.fmt == 'csv':
+            self.writer = open(self.temp_path, 'w', newline='', encoding='utf-8')
+        return self
+
+    def write(self, chunk):
+        if self.fmt == 'csv':
+            # The header goes out with the first chunk, even an empty one, and only once
+            chunk.to_csv(self.writer, header=not self.header_written, index=False)
+            self.header_written = True
+        else:
+            pa = _pyarrow()
+            chunk = apply_schema(chunk.copy(), self.schema)
+            if self.writer is None:
+                # The first chunk fixes the file schema; later chunks are cast to it
+                self.arrow_schema = arrow_schema(self.schema, chunk)
+                if self.fmt == 'parquet':
+                    import pyarrow.parquet as pq
+                    self.writer = pq.ParquetWriter(self.temp_path, self.arrow_schema)
+                else:
+                    self.writer = pa.ipc.new_file(self.temp_path, self.arrow_schema)
+            self.writer.write_table(pa.Table.from_pandas(chunk, schema=self.arrow_schema, preserve_index=False))
+        self.rows += len(chunk)
+
+    def __exit__(self, exc_type, exc, traceback):
+        # A CSV writer opens its file up front, so a missing header is what shows no chunk came
+        nothing_written = not self.header_written if self.fmt == 'csv' else self.writer is None
+        if exc_type is None and nothing_written:
+            # No chunks at all: still write an empty file with the schema's columns
+            self.write(pd.DataFrame(columns=list(self.schema)))
+        if self.writer is not None:
+            self.writer.close()
+        if exc_type is not None:
+            if os.path.exists(self.temp_path):
+                os.remove(self.temp_path)
+            return False
+        os.replace(self.temp_path, self.path)
+        return False
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc  # noqa: F401
+    except ImportError:
+        raise ImportError("pyarrow is required for the 'parquet' and 'feather' storage formats. "
+                          "Install it with 'pip install pyarrow' or set MOVIE_DATA_FORMAT=csv.")
+    return pyarrow
+
+
+def main():
+    """Export columnar datasets to CSV: python storage.py FILE [FILE ...]"""
+    for path in sys.argv[1:]:
+        print(f"Exported {path} to {export_csv(path)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import os
+import re
+import argparse
+import numpy as np
+import pandas as pd
+
+# Synthetic stand-ins for the raw datasets, with the same file names and columns, at any
+# size. Words, names and review sentences are sampled from the bundled files so text
+# processing sees realistic input. Rows are generated and written in chunks, so memory
+# stays flat from 1k to 10M rows, and every chunk has its own seed so output is repeatable.
+script_dir = os.path.dirname(os.path.abspath(__file__))
+DATA_DIR = os.path.normpath(os.path.join(script_dir, '../data'))
+
+CHUNK_ROWS = 100000
+GENRES = ['Action', 'Adventure', 'Animation', 'Biography', 'Comedy', 'Crime', 'Drama', 'Family', 'Fantasy',
+          'Film-Noir', 'History', 'Horror', 'Music', 'Musical', 'Mystery', 'Romance', 'Sci-Fi', 'Sport',
+          'Thriller', 'War', 'Western']
+CERTIFICATES = ['U', 'A', 'UA', 'R', 'PG-13', 'PG', 'Passed', 'G', 'Approved']
+CERTIFICATE_SHARES = [0.26, 0.22, 0.195, 0.165, 0.05, 0.045, 0.04, 0.013, 0.012]
+MONTHS = ['January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October',
+          'November', 'December']
+# Share of Rotten Tomatoes rows that are (slightly altered) copies of an IMDb title
+RT_OVERLAP = 0.5
+# Streams of per-chunk seeds; titles and years use their own so both catalogs can share them
+TITLE_STREAM, IMDB_STREAM, RT_STREAM, REVIEW_STREAM = range(4)
+
+
+def _join(columns, counts, sep=' '):
+    """Join the first counts[i] strings of each row of a (n, k) string array."""
+    joined = pd.Series(columns[:, 0], dtype=object)
+    for j in range(1, columns.shape[1]):
+        joined = joined.where(counts <= j, joined + sep + columns[:, j])
+    return joined
+
+
+def _with_missing(rng, values, share):
+    """Object Series of values with about `share` of them replaced by NaN."""
+    values = pd.Series(values, dtype=object)
+    return values.mask(rng.random(len(values)) < share)
+
+
+class SyntheticCorpus:
+    """Vocabulary sampled by the generators, taken from the bundled IMDb and review files."""
+
+    def __init__(self, data_dir=DATA_DIR):
+        imdb = pd.read_csv(os.path.join(data_dir, 'imdb_top_1000.csv'))
+        words = imdb['Overview'].str.findall(r'[A-Za-z]{3,}').explode().dropna().str.capitalize()
+        self.words = words.drop_duplicates().to_numpy(dtype=object)
+        people = pd.concat([imdb[column] for column in ['Director', 'Star1', 'Star2', 'Star3', 'Star4']])
+        self.names = people.dropna().drop_duplicates().to_numpy(dtype=object)
+        self.overviews = imdb['Overview'].dropna().to_numpy(dtype=object)
+        reviews = pd.concat([pd.read_csv(os.path.join(data_dir, name)) for name in sorted(os.listdir(data_dir))
+                             if re.fullmatch(r'imdbreviews_.*\.csv', name)])
+        sentences = reviews['Content'].dropna().str.split(r'(?<=[.!?])\s+', regex=True).explode()
+        self.sentences = sentences[sentences.str.len() > 20].to_numpy(dtype=object)
+        self.headlines = reviews['Title'].dropna().to_numpy(dtype=object)
+
+    def titles(self, rng, n):
+        counts = rng.choice([1, 2, 3, 4], size=n, p=[0.2, 0.4, 0.25, 0.15])
+        return _join(rng.choice(self.words, size=(n, 4)), counts)
+
+    def people(self, rng, n, k):
+        return rng.choice(self.names, size=(n, k))
+
+
+def movie_keys(corpus, seed, chunk, n):
+    """Titles and release years of a chunk of movies, shared by the IMDb and RT generators."""
+    rng = np.random.default_rng([seed, TITLE_STREAM, chunk])
+    return corpus.titles(rng, n), rng.integers(1920, 2021, size=n)
+
+
+def imdb_chunk(corpus, seed, chunk, n):
+    """Rows shaped like imdb_top_1000.csv."""
+    titles, years = movie_keys(corpus, seed, chunk, n)
+    rng = np.random.default_rng([seed, IMDB_STREAM, chunk])
+    ids = pd.Series(rng.integers(0, 16 ** 12, size=n)).map('{:012x}'.format)
+    genre_counts = rng.choice([1, 2, 3], size=n, p=[0.2, 0.3, 0.5])
+    cast = corpus.people(rng, n, 5)
+    gross = pd.Series(np.round(rng.lognormal(17, 1.8, size=n)).astype(np.int64)).map('{:,}'.format)
+    return pd.DataFrame({
+        'Poster_Link': 'https://m.media-amazon.com/images/M/MV5B' + ids + '._V1_UX67_CR0,0,67,98_AL_.jpg',
+        'Series_Title': titles,
+        'Released_Year': years.astype(str),
+        'Certificate': _with_missing(rng, rng.choice(CERTIFICATES, size=n, p=CERTIFICATE_SHARES), 0.1),
+        'Runtime': pd.Series(rng.integers(45, 240, size=n)).astype(str) + ' min',
+        'Genre': _join(rng.choice(GENRES, size=(n, 3)), genre_counts, ', '),
+        'IMDB_Rating': np.round(np.clip(rng.normal(7.9, 0.27, size=n), 7.6, 9.3), 1),
+        'Overview': rng.choice(corpus.overviews, size=n),
+        'Meta_score': pd.Series(np.clip(np.round(rng.normal(78, 12, size=n)), 28, 100)).mask(rng.random(n) < 0.16),
+        'Director': cast[:, 0], 'Star1': cast[:, 1], 'Star2': cast[:, 2], 'Star3': cast[:, 3], 'Star4': cast[:, 4],
+        'No_of_Votes': np.round(rng.lognormal(11.9, 1.0, size=n)).astype(np.int64) + 25000,
+        'Gross': _with_missing(rng, gross, 0.17),
+    })
+
+
+def rt_chunk(corpus, seed, chunk, n, overlap=RT_OVERLAP):
+    """Rows shaped like rotten_tomatoes_movies_1.csv; about `overlap` of them are IMDb movies."""
+    rng = np.random.default_rng([seed, RT_STREAM, chunk])
+    imdb_titles, imdb_years = movie_keys(corpus, seed, chunk, n)
+    shared = rng.random(n) < overlap
+    # Shared titles get the variations fuzzy matching has to see through
+    variant = rng.integers(0, 4, size=n)
+    varied = imdb_titles.where(variant != 1, imdb_titles.str.lower())
+    varied = varied.where(variant != 2, 'The ' + imdb_titles)
+    varied = varied.where(variant != 3, imdb_titles + '!')
+    titles = varied.where(shared, corpus.titles(rng, n))
+    years = np.where(shared, imdb_years + rng.choice([-1, 0, 0, 0, 1], size=n), rng.integers(1920, 2021, size=n))
+    released = pd.to_datetime(pd.DataFrame({'year': years, 'month': rng.integers(1, 13, size=n),
+                                            'day': rng.integers(1, 29, size=n)}))
+    streaming = released + pd.to_timedelta(rng.integers(30, 3650, size=n), unit='D')
+    tomatometer = np.clip(np.round(rng.normal(60, 28, size=n)), 0, 100)
+    audience = np.clip(np.round(0.5 * tomatometer + rng.normal(30, 15, size=n)), 0, 100)
+    return pd.DataFrame({
+        'movie_title': titles,
+        'tomatometer_rating': pd.Series(tomatometer).mask(rng.random(n) < 0.01),
+        'audience_rating': pd.Series(audience).mask(rng.random(n) < 0.02),
+        'original_release_date': _with_missing(rng, released.dt.strftime('%Y-%m-%d'), 0.07),
+        'streaming_release_date': _with_missing(rng, streaming.dt.strftime('%Y-%m-%d'), 0.02),
+        'actors': _join(corpus.people(rng, n, 4), np.full(n, 4), ', '),
+    })
+
+
+def review_chunk(corpus, seed, chunk, n):
+    """Rows shaped like the imdbreviews_*.csv files (reviews of about 1,500 characters)."""
+    rng = np.random.default_rng([seed, REVIEW_STREAM, chunk])
+    dates = pd.Timestamp('2000-01-01') + pd.to_timedelta(rng.integers(0, 8400, size=n), unit='D')
+    dates = pd.Series(dates.day.astype(str)) + ' ' + np.array(MONTHS, dtype=object)[dates.month - 1] + ' ' + \
+        dates.year.astype(str)
+    ratings = pd.Series(rng.choice(np.arange(1, 11), size=n, p=np.array([3, 1, 1, 1, 2, 4, 10, 9, 8, 11]) / 50))
+    return pd.DataFrame({
+        'Title': rng.choice(corpus.headlines, size=n),
+        'Date': dates,
+        'Rating': ratings.astype(float).mask(rng.random(n) < 0.08),
+        'Content': _join(rng.choice(corpus.sentences, size=(n, 24)), rng.integers(2, 25, size=n)),
+    })
+
+
+def write_rows(path, rows, make_chunk, corpus, seed=0, chunk_rows=CHUNK_ROWS):
+    """Write `rows` generated rows to a CSV file chunk by chunk; returns the path."""
+    for chunk, start in enumerate(range(0, rows, chunk_rows)):
+        data = make_chunk(corpus, seed, chunk, min(chunk_rows, rows - start))
+        data.to_csv(path, mode='w' if chunk == 0 else 'a', header=chunk == 0, index=False)
+    return path
+
+
+def generate_datasets(output_dir, rows, seed=0, review_rows=None, corpus=None):
+    """Write imdb_top_1000.csv, rotten_tomatoes_movies_1.csv and imdbreviews_synthetic.csv.
+
+    Both catalogs get `rows` movies and the review file `review_rows` reviews (default: rows).
+    Returns the paths of the written files.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    corpus = corpus or SyntheticCorpus()
+    review_rows = rows if review_rows is None else review_rows
+    return [
+        write_rows(os.path.join(output_dir, 'imdb_top_1000.csv'), rows, imdb_chunk, corpus, seed),
+        write_rows(os.path.join(output_dir, 'rotten_tomatoes_movies_1.csv'), rows, rt_chunk, corpus, seed),
+        write_rows(os.path.join(output_dir, 'imdbreviews_synthetic.csv'), review_rows, review_chunk, corpus, seed),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate synthetic raw datasets shaped like the bundled ones.')
+    parser.add_argument('output_dir', help='directory for the generated CSV files')
+    parser.add_argument('--rows', type=int, default=100000, help='movies in each catalog')
+    parser.add_argument('--review-rows', type=int, default=None, help='reviews to generate (default: --rows)')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    for path in generate_datasets(args.output_dir, args.rows, args.seed, args.review_rows):
+        print(f"Wrote {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+import re
+import time
+import numpy as np
+import pandas as pd
+
+# Minimum trigram similarity (Jaccard) for a fuzzy title match.
+DEFAULT_THRESHOLD = 0.8
+# Release years may differ by this much between catalogs (festival vs. theatrical release).
+YEAR_TOLERANCE = 1
+
+ARTICLES = re.compile(r'^(?:the|a|an) | (?:the|a|an)$')
+
+
+def normalize_titles(titles):
+    """Canonical form of titles: lowercase ASCII, no punctuation, no leading or trailing article."""
+    titles = pd.Series(titles, dtype=object).fillna('').astype(str)
+    titles = titles.str.normalize('NFKD').str.encode('ascii', 'ignore').str.decode('ascii').str.lower()
+    titles = titles.str.replace('&', ' and ', regex=False).str.replace(r"['’]", '', regex=True)
+    titles = titles.str.replace(r'[^a-z0-9]+', ' ', regex=True).str.strip()
+    return titles.str.replace(ARTICLES, '', regex=True).str.strip()
+
+
+def trigram_codes(titles):
+    """Distinct character trigrams of normalized titles as (row, code) arrays.
+
+    Titles are padded so short titles still have some; each ASCII trigram is packed
+    into one integer, so the whole catalog is processed with array operations.
+    """
+    padded = ['  ' + title + ' ' for title in titles]
+    lengths = np.array([len(title) for title in padded], dtype=np.int64)
+    text = np.frombuffer(''.join(padded).encode('ascii'), dtype=np.uint8).astype(np.int64)
+    counts = lengths - 2
+    rows = np.repeat(np.arange(len(padded)), counts)
+    # A title's trigrams start at its offset in the text; each title skips 2 positions more
+    positions = np.arange(counts.sum()) + 2 * rows
+    codes = (text[positions] << 16) | (text[positions + 1] << 8) | text[positions + 2]
+    # Sort and drop repeats (much faster than np.unique on millions of values)
+    pairs = np.sort((rows << 24) | codes)
+    pairs = pairs[np.append(True, pairs[1:] != pairs[:-1])]
+    return pairs >> 24, pairs & 0xFFFFFF
+
+
+def release_years(values):
+    """Release years as floats (NaN when unknown) from years, dates or date strings."""
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        # Typed storage keeps dates as datetime64; their numeric value is nanoseconds
+        return values.dt.year.astype(float).to_numpy()
+    years = pd.to_numeric(values, errors='coerce')
+    if years.isna().all() and values.notna().any():
+        years = pd.to_datetime(values, errors='coerce').dt.year
+    return years.astype(float).to_numpy()
+
+
+class TitleMatcher:
+    """Index of a title catalog for exact, normalized and fuzzy matching with year blocking.
+
+    Fuzzy candidates come from an inverted index of character trigrams, so each query
+    only compares against catalog titles sharing at least one trigram with it.
+    """
+
+    def __init__(self, titles, years=None, threshold=DEFAULT_THRESHOLD, year_tolerance=YEAR_TOLERANCE):
+        start = time.perf_counter()
+        self.threshold = threshold
+        self.year_tolerance = year_tolerance
+        self.titles = pd.Series(titles, dtype=object).reset_index(drop=True)
+        self.lower = self.titles.str.lower().to_numpy()
+        self.normalized = normalize_titles(self.titles).to_numpy()
+        self.years = release_years(years) if years is not None else np.full(len(self.titles), np.nan)
+        self.build_trigram_index()
+        self.build_seconds = time.perf_counter() - start
+
+    def build_trigram_index(self):
+        """Postings list per trigram: catalog rows sorted by trigram code, with offsets into them."""
+        rows, codes = trigram_codes(self.normalized)
+        self.gram_counts = np.bincount(rows, minlength=len(self.normalized))
+        # Sorting by (code, row) groups the postings per trigram, each list sorted by row
+        keys = np.sort((codes << 24) | rows)
+        self.postings, codes = keys & 0xFFFFFF, keys >> 24
+        self.offsets = np.flatnonzero(np.append(True, codes[1:] != codes[:-1]))
+        self.vocabulary = codes[self.offsets]
+        self.offsets = np.append(self.offsets, len(codes))
+
+    def year_compatible(self, query_year, candidate_years):
+        """Year blocking: unknown years are compatible with anything."""
+        return np.isnan(candidate_years) | np.isnan(query_year) | (np.abs(candidate_years - query_year) <= self.year_tolerance)
+
+    def match_exact(self, queries):
+        """Match queries whose normalized titles are identical to a catalog title of a compatible year."""
+        catalog = pd.DataFrame({'right': np.arange(len(self.normalized)), 'key': self.normalized, 'right_year': self.years})
+        pairs = queries.merge(catalog[catalog['key'] != ''], on='key')
+        pairs = pairs[self.year_compatible(pairs['year'].to_numpy(), pairs['right_year'].to_numpy())]
+        pairs = pairs.assign(distance=(pairs['year'] - pairs['right_year']).abs().fillna(0),
+                             method=np.where(pairs['lower'].to_numpy() == self.lower[pairs['right']], 'exact', 'normalized'),
+                             score=1.0)
+        # Prefer the closest release year, then a literal title match
+        pairs = pairs.sort_values(['left', 'distance', 'method'])
+        return pairs.drop_duplicates('left')[['left', 'right', 'score', 'method']]
+
+    def query_grams(self, key):
+        """Indexed trigram codes of a query, rarest first."""
+        codes = trigram_codes([key])[1]
+        position = np.searchsorted(self.vocabulary, codes).clip(max=len(self.vocabulary) - 1)
+        found = position[self.vocabulary[position] == codes]
+        frequency = self.offsets[found + 1] - self.offsets[found]
+        return found[np.argsort(frequency, kind='stable')], len(codes)
+
+    def match_fuzzy(self, queries):
+        """Best trigram-similarity candidate for each query, above the threshold.
+
+        Prefix filtering keeps this sub-quadratic: a title with Jaccard similarity >= threshold
+        must share one of the query's rarest n - ceil(threshold * n) + 1 trigrams, so only
+        those postings lists are scanned for candidates. The remaining trigrams are then
+        counted by binary search in their (row-sorted) postings.
+        """
+        matches = []
+        self.candidates_compared = 0
+        for left, key, year in zip(queries['left'], queries['key'], queries['year']):
+            grams, size = self.query_grams(key)
+            required = int(np.ceil(self.threshold * size))
+            # Trigrams missing from the index are the rarest of all, but share nothing
+            prefix = size - required + 1 - (size - len(grams))
+            if prefix < 1:
+                continue
+            candidates = np.unique(np.concatenate(
+                [self.postings[self.offsets[g]:self.offsets[g + 1]] for g in grams[:prefix]]))
+            # Length filter: Jaccard >= t needs t * n <= |candidate| <= n / t
+            lengths = self.gram_counts[candidates]
+            keep = (lengths >= required) & (lengths <= size / self.threshold)
+            keep &= self.year_compatible(year, self.years[candidates])
+            candidates = candidates[keep]
+            self.candidates_compared += len(candidates)
+            if not len(candidates):
+                continue
+            shared = np.zeros(len(candidates), dtype=np.int64)
+            for g in grams:
+                postings = self.postings[self.offsets[g]:self.offsets[g + 1]]
+                position = np.searchsorted(postings, candidates).clip(max=len(postings) - 1)
+                shared += postings[position] == candidates
+            # Jaccard similarity of the two trigram sets
+            scores = shared / (size + self.gram_counts[candidates] - shared)
+            best = np.argmax(scores)
+            if scores[best] >= self.threshold:
+                matches.append((left, candidates[best], scores[best], 'fuzzy'))
+        return pd.DataFrame(matches, columns=['left', 'right', 'score', 'method'])
+
+    def match(self, titles, years=None):
+        """Match titles against the catalog; returns one row per query with the catalog row and score.
+
+        Each catalog title is used at most once: when several queries pick the same one,
+        the highest-scoring query keeps it.
+        """
+        start = time.perf_counter()
+        titles = pd.Series(titles, dtype=object).reset_index(drop=True)
+        queries = pd.DataFrame({'left': np.arange(len(titles)), 'key': normalize_titles(titles),
+                                'lower': titles.str.lower(),
+                                'year': release_years(years) if years is not None else np.nan})
+        exact = self.match_exact(queries[queries['key'] != ''])
+        fuzzy = self.match_fuzzy(queries[(queries['key'] != '') & ~queries['left'].isin(exact['left'])])
+        matched = pd.concat([exact, fuzzy], ignore_index=True).sort_values('score', ascending=False, kind='stable')
+        matched = matched.drop_duplicates('right').set_index('left')
+        result = pd.DataFrame(index=queries['left'])
+        result['right'] = matched['right'].astype('Int64')
+        result['score'] = matched['score']
+        result['method'] = matched['method']
+        self.stats = self.match_stats(result, time.perf_counter() - start)
+        return result.reset_index(drop=True)
+
+    def match_stats(self, result, seconds):
+        counts = result['method'].value_counts()
+        return {
+            'queries': len(result), 'catalog': len(self.titles),
+            'exact': int(counts.get('exact', 0)), 'normalized': int(counts.get('normalized', 0)),
+            'fuzzy': int(counts.get('fuzzy', 0)), 'unmatched': int(result['right'].isna().sum()),
+            'mean_fuzzy_score': float(result.loc[result['method'] == 'fuzzy', 'score'].mean()) if counts.get('fuzzy') else None,
+            'candidates_compared': self.candidates_compared,
+            'index_seconds': self.build_seconds, 'match_seconds': seconds,
+        }
+
+    def report(self):
+        """Print match-quality and runtime statistics of the last match()."""
+        s = self.stats
+        matched = s['queries'] - s['unmatched']
+        print(f"Matched {matched} of {s['queries']} titles against {s['catalog']} "
+              f"({s['exact']} exact, {s['normalized']} normalized, {s['fuzzy']} fuzzy, {s['unmatched']} unmatched).")
+        if s['mean_fuzzy_score'] is not None:
+            print(f"Mean fuzzy match score: {s['mean_fuzzy_score']:.3f}")
+        print(f"Index built in {s['index_seconds']:.2f}s, matched in {s['match_seconds']:.2f}s "
+              f"({s['candidates_compared']} fuzzy candidates compared).")